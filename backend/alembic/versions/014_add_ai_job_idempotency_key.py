@@ -0,0 +1,35 @@
+"""add_ai_job_idempotency_key
+
+Revision ID: 014_add_ai_job_idempotency_key
+Revises: 013_add_ai_job_metadata
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014_add_ai_job_idempotency_key'
+down_revision = '013_add_ai_job_metadata'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('ai_jobs', sa.Column('idempotency_key', sa.String(), nullable=True))
+    op.create_index(op.f('ix_ai_jobs_idempotency_key'), 'ai_jobs', ['idempotency_key'], unique=False)
+    # At most one pending/running job per key; completed and failed jobs may share it.
+    op.create_index(
+        'uq_ai_jobs_active_idempotency_key',
+        'ai_jobs',
+        ['idempotency_key'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('PENDING', 'PROCESSING')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_ai_jobs_active_idempotency_key', table_name='ai_jobs')
+    op.drop_index(op.f('ix_ai_jobs_idempotency_key'), table_name='ai_jobs')
+    op.drop_column('ai_jobs', 'idempotency_key')
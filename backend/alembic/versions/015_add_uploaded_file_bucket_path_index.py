@@ -0,0 +1,26 @@
+"""add_uploaded_file_bucket_path_index
+
+Revision ID: 015_add_uploaded_file_bucket_path_index
+Revises: 014_add_ai_job_idempotency_key
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015_add_uploaded_file_bucket_path_index'
+down_revision = '014_add_ai_job_idempotency_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Blobs are content-addressed and shared; their reference count is the
+    # number of uploaded_files rows with the same bucket_path.
+    op.create_index(op.f('ix_uploaded_files_bucket_path'), 'uploaded_files', ['bucket_path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_uploaded_files_bucket_path'), table_name='uploaded_files')
@@ -0,0 +1,27 @@
+"""add_job_embeddings
+
+Revision ID: 016_add_job_embeddings
+Revises: 015_add_uploaded_file_bucket_path_index
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '016_add_job_embeddings'
+down_revision = '015_add_uploaded_file_bucket_path_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing jobs are embedded by the first index refresh (backfill)
+    op.add_column('jobs', sa.Column('embedding', sa.LargeBinary(), nullable=True))
+    op.add_column('jobs', sa.Column('embedding_model', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'embedding_model')
+    op.drop_column('jobs', 'embedding')
@@ -0,0 +1,35 @@
+"""add_application_rank_index
+
+Revision ID: 017_add_application_rank_index
+Revises: 016_add_job_embeddings
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '017_add_application_rank_index'
+down_revision = '016_add_job_embeddings'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_applications_job_id_match_score', 'applications', ['job_id', 'match_score'], unique=False)
+    # Replace the old "101 - score" placeholder ranks with real per-job ranks
+    op.execute("""
+        UPDATE applications AS a
+        SET rank = r.rank
+        FROM (
+            SELECT id, RANK() OVER (PARTITION BY job_id ORDER BY match_score DESC) AS rank
+            FROM applications
+            WHERE match_score IS NOT NULL
+        ) AS r
+        WHERE a.id = r.id AND a.rank IS DISTINCT FROM r.rank
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_applications_job_id_match_score', table_name='applications')
@@ -0,0 +1,33 @@
+"""add_job_posted_by
+
+Revision ID: 018_add_job_posted_by
+Revises: 017_add_application_rank_index
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '018_add_job_posted_by'
+down_revision = '017_add_application_rank_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing jobs have no owner; only admins may run bulk scoring on them
+    op.add_column('jobs', sa.Column('posted_by_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key('fk_jobs_posted_by_id_users', 'jobs', 'users', ['posted_by_id'], ['id'])
+    op.create_index(op.f('ix_jobs_posted_by_id'), 'jobs', ['posted_by_id'], unique=False)
+    # apply_to_job checks whether a job is already bulk-scored
+    op.create_index('ix_ai_jobs_job_type_input_ref', 'ai_jobs', ['job_type', 'input_ref'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_jobs_job_type_input_ref', table_name='ai_jobs')
+    op.drop_index(op.f('ix_jobs_posted_by_id'), table_name='jobs')
+    op.drop_constraint('fk_jobs_posted_by_id_users', 'jobs', type_='foreignkey')
+    op.drop_column('jobs', 'posted_by_id')
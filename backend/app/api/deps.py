@@ -1,4 +1,5 @@
-from typing import Annotated
+import uuid
+from typing import Annotated, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -11,22 +12,33 @@ from sqlalchemy import select
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: Annotated[AsyncSession, Depends(get_db)]
-) -> User:
-    credentials_exception = HTTPException(
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _user_id_from_token(token: Optional[str]) -> str:
+    if not token:
+        raise _credentials_exception()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user_id
+
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)]
+) -> User:
+    credentials_exception = _credentials_exception()
+    user_id = _user_id_from_token(token)
     
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalars().first()
@@ -35,6 +47,19 @@ async def get_current_user(
         raise credentials_exception
     return user
 
+async def get_current_user_id(
+    token: Annotated[Optional[str], Depends(oauth2_scheme_optional)],
+    access_token: Optional[str] = None,
+) -> uuid.UUID:
+    """
+    Token-only authentication (no User lookup) for the high-frequency job status
+    endpoints. EventSource cannot send headers, so ?access_token= is accepted too.
+    """
+    try:
+        return uuid.UUID(_user_id_from_token(token or access_token))
+    except ValueError:
+        raise _credentials_exception()
+
 async def require_admin(
     current_user: Annotated[User, Depends(get_current_user)]
 ) -> User:
@@ -56,3 +81,14 @@ async def require_super_admin(
             detail="The user doesn't have enough privileges. Super Admin required.",
         )
     return current_user
+
+async def require_organisation(
+    current_user: Annotated[User, Depends(get_current_user)]
+) -> User:
+    from app.models.user import UserRole
+    if current_user.role not in [UserRole.ORGANISATION, UserRole.ADMIN, UserRole.SUPER_ADMIN]:
+        raise HTTPException(
+            status_code=403,
+            detail="The user doesn't have enough privileges. Organisation account required.",
+        )
+    return current_user
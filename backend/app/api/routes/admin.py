@@ -1,15 +1,20 @@
-from typing import Any, Annotated, List
+from typing import Any, Annotated, List, Dict
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
 from app.api import deps
 from app.core.database import get_db
 from app.models.user import User, UserRole
 from app.models.payment import Order, UserEntitlement
-from app.models.ai_job import AIJob
+from app.models.ai_job import AIJob, JobStatus
 from app.models.file import UploadedFile
 from app.services.audit import audit_service
 from app.services.excel import excel_service
+from app.services.ai_queue import queue_service
+from app.services.job_events import job_event_service, ai_job_event
+from app.services.llm.cache import llm_cache, PROMPT_VERSIONS
+from app.services.blob_cache import blob_cache
 from pydantic import BaseModel
 import uuid
 from datetime import datetime
@@ -37,6 +42,13 @@ class AdminOrderList(BaseModel):
     class Config:
         from_attributes = True
 
+class DeadLetterEntry(BaseModel):
+    job_data: Dict[str, Any]
+    error: str
+    reason: str
+    attempts: int
+    failed_at: float
+
 # --- Endpoints ---
 
 @router.get("/users", response_model=List[AdminUserList])
@@ -144,3 +156,114 @@ async def export_users_excel(
         })
         
     return excel_service.export_to_csv(user_data, "users_export")
+
+@router.get("/ai-jobs/queues")
+async def get_queue_stats(
+    current_user: Annotated[User, Depends(deps.require_admin)],
+) -> Any:
+    """
+    Admin: Depth and wait time per AI job priority lane.
+    """
+    return await queue_service.get_lane_stats()
+
+@router.get("/ai-jobs/dead-letter", response_model=List[DeadLetterEntry])
+async def list_dead_letter_jobs(
+    current_user: Annotated[User, Depends(deps.require_admin)],
+    skip: int = 0,
+    limit: int = Query(100, le=500)
+) -> Any:
+    """
+    Admin: AI jobs that failed permanently, most recent first.
+    """
+    return await queue_service.list_dead_letters(offset=skip, limit=limit)
+
+@router.post("/ai-jobs/dead-letter/{job_id}/replay")
+async def replay_dead_letter_job(
+    job_id: uuid.UUID,
+    current_user: Annotated[User, Depends(deps.require_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> Any:
+    """
+    Admin: Reset a dead-lettered AI job to PENDING and enqueue it again.
+    The dead-letter entry is removed only once the job is back on the queue.
+    """
+    entry = await queue_service.get_dead_letter(str(job_id))
+    if not entry:
+        raise HTTPException(status_code=404, detail="Dead-lettered job not found")
+
+    result = await db.execute(select(AIJob).where(AIJob.id == job_id))
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JobStatus.FAILED:
+        raise HTTPException(status_code=409, detail="Job is not in a failed state")
+
+    job.status = JobStatus.PENDING
+    job.error = None
+    job.result_json = None
+    job.started_at = None
+    job.finished_at = None
+    job.version += 1
+
+    await audit_service.log_action(
+        db=db,
+        user_id=current_user.id,
+        action="ADMIN_REPLAY_AI_JOB",
+        entity_type="ai_job",
+        entity_id=str(job.id),
+        metadata={"reason": entry.get("reason"), "attempts": entry.get("attempts"), "error": entry.get("error")}
+    )
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        # An identical job (same idempotency key) is already pending or running.
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="An identical job is already pending or running")
+
+    try:
+        await queue_service.enqueue_job({**entry["job_data"], "attempt": 1})
+    except Exception:
+        # Not requeued: put the job back to FAILED; its dead-letter entry is still there
+        job.status = JobStatus.FAILED
+        job.error = entry.get("error")
+        job.finished_at = func.now()
+        job.version += 1
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Could not requeue the job")
+
+    await queue_service.pop_dead_letter(str(job_id))
+    await job_event_service.publish(ai_job_event(job))
+    return {"status": "success", "job_id": job_id}
+
+@router.get("/llm-cache/stats")
+async def get_llm_cache_stats(
+    current_user: Annotated[User, Depends(deps.require_admin)],
+) -> Any:
+    """
+    Admin: LLM result cache hits, misses and tokens saved per operation.
+    """
+    return {"prompt_versions": PROMPT_VERSIONS, "operations": await llm_cache.stats()}
+
+@router.get("/blob-cache/stats")
+async def get_blob_cache_stats(
+    current_user: Annotated[User, Depends(deps.require_admin)],
+) -> Any:
+    """
+    Admin: Worker blob cache hits, misses and bytes saved.
+    """
+    return await blob_cache.stats()
+
+@router.delete("/llm-cache/{operation}")
+async def invalidate_llm_cache(
+    operation: str,
+    current_user: Annotated[User, Depends(deps.require_admin)],
+    prompt_version: str | None = Query(None),
+) -> Any:
+    """
+    Admin: Drop cached LLM results for an operation (e.g. after a prompt change).
+    """
+    if operation not in PROMPT_VERSIONS:
+        raise HTTPException(status_code=404, detail="Unknown cache operation")
+    deleted = await llm_cache.invalidate(operation, prompt_version)
+    return {"status": "success", "operation": operation, "deleted": deleted}
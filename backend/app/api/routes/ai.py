@@ -1,25 +1,33 @@
 from typing import Any, Annotated, List, Dict
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from app.api import deps
 from app.models.job import Job
 from app.models.user import User
 from app.schemas.ai import ResumeAnalysisOut, JobMatchOut
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
 import random
 import time
-import hashlib
 from datetime import datetime
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from app.core.config import settings
 
 from app.models.file import UploadedFile
-from app.services.storage import storage_service
+from app.services.file_blobs import file_blob_service
+from app.services.upload_ingest import ingest_upload, UploadTooLarge
+from app.services.document_text import document_text_service
 from app.models.ai_job import AIJob, JobStatus
-from app.schemas.ai_job import AIJobOut
-from app.services.ai_queue import queue_service
+from app.schemas.ai_job import AIJobOut, AIJobStatusEvent, AIJobStatusBatchRequest, AIJobStatusBatchOut
+from app.services.status_batch import fetch_status_batch
+from app.services.job_events import job_event_service, ai_job_event, KIND_AI_JOB
+from app.services.ai_jobs import ai_job_service, content_hash_of
+from app.services.llm.factory import get_groq_provider
+import openai
+from app.services.llm.rate_limiter import LLMRateLimitTimeout
+from app.services.llm.json_stream import stream_json_fields, SSE_HEADERS
+from fastapi.responses import StreamingResponse
 from app.services.audit import audit_service
 import uuid
 
@@ -28,24 +36,19 @@ from fastapi import Request
 
 router = APIRouter()
 
-import io
 import json as _json
 import re as _re
 
-def _extract_text_from_upload(file_bytes: bytes, content_type: str, filename: str) -> str:
-    """Extract plain text from a PDF, DOCX, or TXT upload."""
+async def _extract_text_from_upload(file_bytes: bytes, content_type: str, filename: str) -> str:
+    """Extract plain text from a PDF, DOCX, or TXT upload (off the event loop)."""
     name_lower = filename.lower()
+    if "pdf" in (content_type or "") and not name_lower.endswith(".pdf"):
+        name_lower += ".pdf"
+    if not name_lower.endswith((".pdf", ".docx")):
+        return file_bytes.decode("utf-8", errors="ignore")
     try:
-        if name_lower.endswith(".pdf") or "pdf" in (content_type or ""):
-            import pdfplumber
-            with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-                return "\n".join(page.extract_text() or "" for page in pdf.pages)
-        elif name_lower.endswith(".docx"):
-            import docx
-            doc = docx.Document(io.BytesIO(file_bytes))
-            return "\n".join(p.text for p in doc.paragraphs)
-        else:
-            return file_bytes.decode("utf-8", errors="ignore")
+        # The quick prompts use at most the first 4k characters
+        return await document_text_service.get_text_for_bytes(file_bytes, name_lower, max_chars=4000)
     except Exception as e:
         logger.warning("Text extraction error: %s", e)
         return file_bytes.decode("utf-8", errors="ignore")
@@ -72,12 +75,10 @@ def _coerce_to_string(value: Any) -> str:
     return str(value)
 
 
-def _groq_client():
-    from groq import Groq
-    key = settings.GROQ_API_KEY if hasattr(settings, "GROQ_API_KEY") else ""
-    if not key:
+def _groq_provider():
+    if not settings.GROQ_API_KEY:
         raise HTTPException(status_code=503, detail="AI service not configured.")
-    return Groq(api_key=key)
+    return get_groq_provider()
 
 def _parse_groq_json(raw: str) -> dict:
     raw = raw.strip()
@@ -86,23 +87,8 @@ def _parse_groq_json(raw: str) -> dict:
     return _json.loads(raw)
 
 
-@router.post("/analyze-resume-quick")
-async def analyze_resume_quick(
-    resume: Annotated[UploadFile, File()],
-    jd_text: Annotated[str, Form()],
-) -> Any:
-    """
-    Public FAANG-level ATS resume analysis. No auth/DB/GCS.
-    First validates the upload is actually a resume, then returns deep analysis.
-    """
-    file_bytes = await resume.read()
-    resume_text = _extract_text_from_upload(file_bytes, resume.content_type or "", resume.filename or "")
-    if not resume_text.strip():
-        raise HTTPException(status_code=400, detail="Could not extract text. Please upload a valid PDF, DOCX, or TXT resume.")
-
-    client = _groq_client()
-
-    prompt = f"""You are an elite FAANG-level ATS resume analyst and career coach with 20 years of experience.
+def _quick_analysis_prompt(jd_text: str, resume_text: str) -> str:
+    return f"""You are an elite FAANG-level ATS resume analyst and career coach with 20 years of experience.
 
 TASK: Analyze the document text against the job description.
 
@@ -144,58 +130,26 @@ If it IS a resume:
   ]
 }}"""
 
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=1200,
-        )
-        result = _parse_groq_json(response.choices[0].message.content)
-
-        if not result.get("is_resume", True):
-            return {"is_resume": False}
-
-        return {
-            "is_resume": True,
-            "score": int(result.get("score", 50)),
-            "grade": result.get("grade", "C"),
-            "missingKeywords": result.get("missingKeywords", []),
-            "foundKeywords": result.get("foundKeywords", []),
-            "structureScore": int(result.get("structureScore", 50)),
-            "impactScore": int(result.get("impactScore", 50)),
-            "criticalGaps": result.get("criticalGaps", []),
-            "strengths": result.get("strengths", []),
-            "atsRecommendations": result.get("atsRecommendations", []),
-            "resume_text": resume_text
-        }
-
-    except _json.JSONDecodeError as e:
-        logger.error("Groq returned invalid JSON: %s", e)
-        raise HTTPException(status_code=500, detail="AI returned an invalid response. Please try again.")
-    except Exception as e:
-        logger.error("Groq analysis error: %s", e)
-        raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
-
-
-@router.post("/tailor-resume-quick")
-async def tailor_resume_quick(
-    resume: Annotated[UploadFile, File()],
-    jd_text: Annotated[str, Form()],
-) -> Any:
-    """
-    Public resume tailoring endpoint. No auth/DB/GCS.
-    Anti-hallucination: only uses information explicitly present in the resume.
-    Returns tailored sections or gap questions if resume is too sparse.
-    """
-    file_bytes = await resume.read()
-    resume_text = _extract_text_from_upload(file_bytes, resume.content_type or "", resume.filename or "")
-    if not resume_text.strip():
-        raise HTTPException(status_code=400, detail="Could not extract text from resume.")
+def _shape_quick_analysis(result: dict, resume_text: str) -> dict:
+    if not result.get("is_resume", True):
+        return {"is_resume": False}
 
-    client = _groq_client()
+    return {
+        "is_resume": True,
+        "score": int(result.get("score", 50)),
+        "grade": result.get("grade", "C"),
+        "missingKeywords": result.get("missingKeywords", []),
+        "foundKeywords": result.get("foundKeywords", []),
+        "structureScore": int(result.get("structureScore", 50)),
+        "impactScore": int(result.get("impactScore", 50)),
+        "criticalGaps": result.get("criticalGaps", []),
+        "strengths": result.get("strengths", []),
+        "atsRecommendations": result.get("atsRecommendations", []),
+        "resume_text": resume_text
+    }
 
-    prompt = f"""You are an expert resume writer. Your STRICT rule: you may ONLY use information explicitly stated in the resume text. Never invent, assume, or hallucinate any skill, company, role, achievement, date, or metric not present in the resume.
+def _quick_tailor_prompt(jd_text: str, resume_text: str) -> str:
+    return f"""You are an expert resume writer. Your STRICT rule: you may ONLY use information explicitly stated in the resume text. Never invent, assume, or hallucinate any skill, company, role, achievement, date, or metric not present in the resume.
 
 JOB DESCRIPTION:
 {jd_text[:2500]}
@@ -227,35 +181,162 @@ Respond ONLY with valid JSON, no markdown:
   ]
 }}"""
 
+def _shape_quick_tailor(result: dict) -> dict:
+    # Sanitize tailored_sections to ensure they are strings
+    sections = result.get("tailored_sections", {})
+    sanitized_sections = {
+        k: _coerce_to_string(sections.get(k, ""))
+        for k in ["summary", "skills", "experience", "education"]
+    }
+
+    return {
+        "sufficient": result.get("sufficient", True),
+        "tailored_sections": sanitized_sections,
+        "gaps": result.get("gaps", []),
+    }
+
+
+
+@router.post("/analyze-resume-quick")
+async def analyze_resume_quick(
+    resume: Annotated[UploadFile, File()],
+    jd_text: Annotated[str, Form()],
+) -> Any:
+    """
+    Public FAANG-level ATS resume analysis. No auth/DB/GCS.
+    First validates the upload is actually a resume, then returns deep analysis.
+    """
+    file_bytes = await resume.read()
+    resume_text = await _extract_text_from_upload(file_bytes, resume.content_type or "", resume.filename or "")
+    if not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text. Please upload a valid PDF, DOCX, or TXT resume.")
+
+    provider = _groq_provider()
+
+    prompt = _quick_analysis_prompt(jd_text, resume_text)
+
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
+        response = await provider.complete(
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=1200,
+            timeout=settings.QUICK_AI_TIMEOUT_SECONDS,
+        )
+        result = _parse_groq_json(response.choices[0].message.content)
+        return _shape_quick_analysis(result, resume_text)
+
+    except _json.JSONDecodeError as e:
+        logger.error("Groq returned invalid JSON: %s", e)
+        raise HTTPException(status_code=500, detail="AI returned an invalid response. Please try again.")
+    except LLMRateLimitTimeout:
+        logger.warning("LLM budget exhausted")
+        raise HTTPException(status_code=429, detail="The AI service is busy. Please try again shortly.")
+    except openai.APITimeoutError:
+        logger.error("Groq analysis timed out")
+        raise HTTPException(status_code=504, detail="AI analysis timed out. Please try again.")
+    except Exception as e:
+        logger.error("Groq analysis error: %s", e)
+        raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
+
+
+@router.post("/tailor-resume-quick")
+async def tailor_resume_quick(
+    resume: Annotated[UploadFile, File()],
+    jd_text: Annotated[str, Form()],
+) -> Any:
+    """
+    Public resume tailoring endpoint. No auth/DB/GCS.
+    Anti-hallucination: only uses information explicitly present in the resume.
+    Returns tailored sections or gap questions if resume is too sparse.
+    """
+    file_bytes = await resume.read()
+    resume_text = await _extract_text_from_upload(file_bytes, resume.content_type or "", resume.filename or "")
+    if not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text from resume.")
+
+    provider = _groq_provider()
+
+    prompt = _quick_tailor_prompt(jd_text, resume_text)
+
+    try:
+        response = await provider.complete(
             messages=[{"role": "user", "content": prompt}],
             temperature=0.15,
             max_tokens=1500,
+            timeout=settings.QUICK_AI_TIMEOUT_SECONDS,
         )
         result = _parse_groq_json(response.choices[0].message.content)
-        
-        # Sanitize tailored_sections to ensure they are strings
-        sections = result.get("tailored_sections", {})
-        sanitized_sections = {
-            k: _coerce_to_string(sections.get(k, ""))
-            for k in ["summary", "skills", "experience", "education"]
-        }
-
-        return {
-            "sufficient": result.get("sufficient", True),
-            "tailored_sections": sanitized_sections,
-            "gaps": result.get("gaps", []),
-        }
+        return _shape_quick_tailor(result)
     except _json.JSONDecodeError as e:
         logger.error("Groq tailor invalid JSON: %s", e)
         raise HTTPException(status_code=500, detail="AI returned an invalid response.")
+    except LLMRateLimitTimeout:
+        logger.warning("LLM budget exhausted")
+        raise HTTPException(status_code=429, detail="The AI service is busy. Please try again shortly.")
+    except openai.APITimeoutError:
+        logger.error("Groq tailor timed out")
+        raise HTTPException(status_code=504, detail="Resume tailoring timed out. Please try again.")
     except Exception as e:
         logger.error("Groq tailor error: %s", e)
         raise HTTPException(status_code=500, detail=f"Resume tailoring failed: {str(e)}")
 
 
+@router.post("/analyze-resume-quick/stream")
+async def analyze_resume_quick_stream(
+    resume: Annotated[UploadFile, File()],
+    jd_text: Annotated[str, Form()],
+) -> StreamingResponse:
+    """
+    SSE variant of /analyze-resume-quick: emits a `field` event per top-level
+    field (score, keywords, ...) as soon as it is generated, then `done` with
+    the same payload the non-streaming endpoint returns.
+    """
+    file_bytes = await resume.read()
+    resume_text = await _extract_text_from_upload(file_bytes, resume.content_type or "", resume.filename or "")
+    if not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text. Please upload a valid PDF, DOCX, or TXT resume.")
+
+    provider = _groq_provider()
+    tokens = provider.stream_complete(
+        messages=[{"role": "user", "content": _quick_analysis_prompt(jd_text, resume_text)}],
+        temperature=0.1,
+        max_tokens=1200,
+        timeout=settings.QUICK_AI_TIMEOUT_SECONDS,
+    )
+    return StreamingResponse(
+        stream_json_fields(tokens, finalize=lambda result: _shape_quick_analysis(result, resume_text)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.post("/tailor-resume-quick/stream")
+async def tailor_resume_quick_stream(
+    resume: Annotated[UploadFile, File()],
+    jd_text: Annotated[str, Form()],
+) -> StreamingResponse:
+    """
+    SSE variant of /tailor-resume-quick.
+    """
+    file_bytes = await resume.read()
+    resume_text = await _extract_text_from_upload(file_bytes, resume.content_type or "", resume.filename or "")
+    if not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text from resume.")
+
+    provider = _groq_provider()
+    tokens = provider.stream_complete(
+        messages=[{"role": "user", "content": _quick_tailor_prompt(jd_text, resume_text)}],
+        temperature=0.15,
+        max_tokens=1500,
+        timeout=settings.QUICK_AI_TIMEOUT_SECONDS,
+    )
+    return StreamingResponse(
+        stream_json_fields(tokens, finalize=_shape_quick_tailor),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 
 @router.post("/analyze-resume", response_model=AIJobOut)
 @limiter.limit("3/minute")
@@ -285,17 +366,6 @@ async def analyze_resume(
             detail=f"File too large. Max size is {settings.MAX_UPLOAD_MB}MB.",
         )
 
-    # Read content
-    file_content = await resume.read()
-    file_size = len(file_content)
-    
-    # Strict Size Check after reading
-    if file_size > settings.MAX_UPLOAD_MB * 1024 * 1024:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Max size is {settings.MAX_UPLOAD_MB}MB.",
-        )
-        
     # 3. Daily Limit Check
     today = datetime.now().date()
     # Count files uploaded by user today
@@ -314,39 +384,51 @@ async def analyze_resume(
             detail=f"Daily upload limit reached ({settings.MAX_FILES_PER_DAY} files/day).",
         )
 
+    # Read content: UploadSizeLimitMiddleware already refused oversized bodies by
+    # Content-Length; this pass hashes the spooled upload and enforces the exact size
+    try:
+        upload = await ingest_upload(resume, settings.MAX_UPLOAD_MB * 1024 * 1024)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    file_size = upload.size
+
     # 4. Content Hash Deduplication
-    content_hash = hashlib.sha256(file_content).hexdigest()
+    content_hash = upload.sha256
     
     # Check if user already uploaded this exact file
-    existing_scan = await db.execute(
-        select(UploadedFile).where(
-            UploadedFile.user_id == current_user.id,
-            UploadedFile.content_hash == content_hash
+    try:
+        existing_scan = await db.execute(
+            select(UploadedFile).where(
+                UploadedFile.user_id == current_user.id,
+                UploadedFile.content_hash == content_hash
+            )
         )
-    )
-    existing_file = existing_scan.scalars().first()
+        existing_file = existing_scan.scalars().first()
+        if not existing_file:
+            # 5. Stream the content-addressed blob into storage (skipped if any user already uploaded it)
+            try:
+                 bucket_path = await file_blob_service.attach(
+                     db,
+                     content_hash=content_hash,
+                     source=upload.file,
+                     content_type=resume.content_type or "application/octet-stream"
+                 )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+    finally:
+        upload.close()
     
     if existing_file:
         # Reuse existing file
         db_file = existing_file
     else:
-        # 5. Upload to GCS
-        try:
-             upload_result = await storage_service.upload_file(
-                 file_bytes=file_content,
-                 filename=resume.filename,
-                 content_type=resume.content_type or "application/octet-stream"
-             )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
-
         # 6. Create DB Record
         db_file = UploadedFile(
             user_id=current_user.id,
             original_filename=resume.filename,
             content_type=resume.content_type or "application/octet-stream",
             size_bytes=file_size,
-            bucket_path=upload_result["bucket_path"],
+            bucket_path=bucket_path,
             public_url=None,
             content_hash=content_hash
         )
@@ -367,33 +449,18 @@ async def analyze_resume(
             if not db_file:
                 raise HTTPException(status_code=500, detail="Database integrity error.")
     
-    # 3. Create Async Job
-    job = AIJob(
+    # 3. Create Async Job (or reuse an identical pending/recent one) and enqueue it
+    job = await ai_job_service.submit(
+        db,
         user_id=current_user.id,
         job_type="resume_analysis",
-        status=JobStatus.PENDING,
-        input_ref=str(db_file.id)
+        input_ref=str(db_file.id),
+        content_hash=content_hash,
+        priority="interactive"
     )
-    db.add(job)
-    await db.commit()
-    await db.refresh(job)
-    
-    # 4. Enqueue Job
-    queue_service.enqueue_job({
-        "job_id": str(job.id),
-        "job_type": "resume_analysis",
-        "input_ref": str(db_file.id)
-    })
-    
-    # Return PENDING status immediately
-    return {
-        "id": job.id,
-        "user_id": job.user_id,
-        "job_type": job.job_type,
-        "status": job.status,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at
-    }
+
+    # PENDING immediately, or the reused job with its result_json
+    return job
 
 @router.post("/match-jobs", response_model=AIJobOut)
 @limiter.limit("5/minute")
@@ -406,32 +473,78 @@ async def match_jobs(
     """
     Simulates AI Job Matching.
     """
-    # Create Async Job
-    job = AIJob(
+    # Create Async Job (or reuse an identical pending/recent one) and enqueue it
+    job = await ai_job_service.submit(
+        db,
         user_id=current_user.id,
         job_type="job_matching",
-        status=JobStatus.PENDING,
-        input_ref="resume_data_json" # Or store payload somewhere
+        input_ref="resume_data_json", # Or store payload somewhere
+        content_hash=content_hash_of(resume_data),
+        priority="interactive"
     )
-    db.add(job)
-    await db.commit()
-    await db.refresh(job)
-    
-    # Enqueue
-    queue_service.enqueue_job({
-        "job_id": str(job.id),
-        "job_type": "job_matching",
-        "input_ref": "resume_data"
-    })
-    
-    return {
-        "id": job.id,
-        "user_id": job.user_id,
-        "job_type": job.job_type,
-        "status": job.status,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at
-    }
+
+    return job
+
+@router.get("/jobs/events")
+async def stream_job_events(
+    request: Request,
+    user_id: Annotated[uuid.UUID, Depends(deps.get_current_user_id)],
+) -> StreamingResponse:
+    """
+    Server-Sent Events for all of the user's AI jobs and applications,
+    pushed by the worker on every state change. Replaces polling.
+    """
+    if not job_event_service.available:
+        raise HTTPException(status_code=503, detail="Live job updates are unavailable. Poll /ai/jobs/{job_id} instead.")
+    return StreamingResponse(
+        job_event_service.stream(user_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@router.post("/jobs/status:batch", response_model=AIJobStatusBatchOut)
+async def get_job_statuses(
+    body: AIJobStatusBatchRequest,
+    user_id: Annotated[uuid.UUID, Depends(deps.get_current_user_id)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> Any:
+    """
+    Status of up to 500 jobs in one query. Only jobs changed since the
+    supplied versions (or, for ids without one, updated_after) are returned.
+    """
+    changed, missing = await fetch_status_batch(
+        db, AIJob, [AIJob.status, AIJob.version, AIJob.error], user_id,
+        body.ids, body.versions, body.updated_after,
+        changed_only_columns=[AIJob.result_json] if body.include_result else (),
+    )
+    return {"changed": changed, "missing": missing}
+
+@router.get("/jobs/{job_id}/wait", response_model=AIJobStatusEvent)
+async def wait_for_job_status(
+    job_id: uuid.UUID,
+    user_id: Annotated[uuid.UUID, Depends(deps.get_current_user_id)],
+    since_version: int = 0,
+    timeout: float = Query(25, gt=0),
+) -> Any:
+    """
+    Long-poll: returns as soon as the job's version exceeds since_version,
+    or with changed=false after timeout seconds.
+    """
+    async def load_state():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(AIJob).where(AIJob.id == job_id))
+            job = result.scalars().first()
+            return ai_job_event(job) if job else None
+
+    state = await job_event_service.wait(
+        KIND_AI_JOB, job_id, user_id, since_version,
+        min(timeout, settings.JOB_EVENTS_LONG_POLL_MAX_SECONDS), load_state
+    )
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if state["user_id"] != str(user_id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return state
 
 @router.get("/jobs/{job_id}", response_model=AIJobOut)
 async def get_job_status(
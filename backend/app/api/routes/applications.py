@@ -1,12 +1,18 @@
 from typing import Any, Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from app.api import deps
 from app.models.application import Application
 from app.models.user import User
-from app.schemas.application import ApplicationOut, ApplicationStatusOut
+from app.schemas.application import (
+    ApplicationOut, ApplicationStatusOut, ApplicationStatusEvent,
+    ApplicationStatusBatchRequest, ApplicationStatusBatchOut,
+)
+from app.services.status_batch import fetch_status_batch
 from app.core.database import get_db, AsyncSessionLocal
+from app.core.config import settings
+from app.services.job_events import job_event_service, application_event, KIND_APPLICATION
 import uuid
 import random
 import asyncio
@@ -32,36 +38,37 @@ async def recompute_application_score_task(application_id: uuid.UUID):
             if not application:
                 return
 
-            # Create Async AI Job for scoring
-            from app.models.ai_job import AIJob, JobStatus
-            from app.services.ai_queue import queue_service
+            # Create Async AI Job for scoring (or reuse an identical pending/recent one)
+            from app.models.ai_job import JobStatus
+            from app.models.resume import Resume
+            from app.services.ai_jobs import ai_job_service, content_hash_of
 
-            # Create Job Record
-            job = AIJob(
+            resume_result = await db.execute(select(Resume).where(Resume.id == application.resume_id))
+            resume = resume_result.scalars().first()
+
+            job = await ai_job_service.submit(
+                db,
                 user_id=application.user_id,
                 job_type="application_scoring", # Specialized job type for applications
-                status=JobStatus.PENDING,
-                input_ref=str(application.id) # Reference the application ID
+                input_ref=str(application.id), # Reference the application ID
+                content_hash=content_hash_of(resume.content if resume else None),
+                priority="bulk"
             )
-            db.add(job)
-            await db.commit()
-            await db.refresh(job)
-
-            # Enqueue to Redis
-            queue_service.enqueue_job({
-                "job_id": str(job.id),
-                "job_type": "application_scoring",
-                "input_ref": str(application.id)
-            })
             
             # Update application state
-            application.processing_state = "processing"
+            if job.status == JobStatus.COMPLETED:
+                # Same resume already scored recently; the stored score still stands.
+                application.processing_state = "scored"
+            else:
+                application.processing_state = "processing"
             # application.rank = new_rank # Will be set by worker
             # application.match_score = new_score # Will be set by worker
             application.updated_at = datetime.now(timezone.utc)
+            application.version += 1
             
             db.add(application)
             await db.commit()
+            await job_event_service.publish(application_event(application))
             
         except Exception as e:
             # Handle failure
@@ -72,8 +79,10 @@ async def recompute_application_score_task(application_id: uuid.UUID):
                 application.processing_state = "failed"
                 application.last_error = str(e)
                 application.updated_at = datetime.now(timezone.utc)
+                application.version += 1
                 db.add(application)
                 await db.commit()
+                await job_event_service.publish(application_event(application))
 
 # --- Routes ---
 
@@ -117,6 +126,51 @@ async def get_application_status(
         
     return application
 
+@router.post("/status:batch", response_model=ApplicationStatusBatchOut)
+async def get_application_statuses(
+    body: ApplicationStatusBatchRequest,
+    user_id: Annotated[uuid.UUID, Depends(deps.get_current_user_id)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> Any:
+    """
+    Status of up to 500 applications in one query. Only applications changed
+    since the supplied versions (or, for ids without one, updated_after) are returned.
+    """
+    changed, missing = await fetch_status_batch(
+        db, Application,
+        [Application.status, Application.processing_state, Application.rank,
+         Application.match_score, Application.last_error, Application.version],
+        user_id, body.ids, body.versions, body.updated_after,
+    )
+    return {"changed": changed, "missing": missing}
+
+@router.get("/{id}/status/wait", response_model=ApplicationStatusEvent)
+async def wait_for_application_status(
+    id: uuid.UUID,
+    user_id: Annotated[uuid.UUID, Depends(deps.get_current_user_id)],
+    since_version: int = 0,
+    timeout: float = Query(25, gt=0),
+) -> Any:
+    """
+    Long-poll: returns as soon as the application's version exceeds
+    since_version, or with changed=false after timeout seconds.
+    """
+    async def load_state():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Application).where(Application.id == id))
+            application = result.scalars().first()
+            return application_event(application) if application else None
+
+    state = await job_event_service.wait(
+        KIND_APPLICATION, id, user_id, since_version,
+        min(timeout, settings.JOB_EVENTS_LONG_POLL_MAX_SECONDS), load_state
+    )
+    if state is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if state["user_id"] != str(user_id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return state
+
 @router.post("/{id}/recompute", response_model=ApplicationStatusOut)
 async def recompute_application(
     id: uuid.UUID,
@@ -144,10 +198,12 @@ async def recompute_application(
     application.processing_state = "processing"
     application.last_error = None
     application.updated_at = datetime.now(timezone.utc)
+    application.version += 1
     
     db.add(application)
     await db.commit()
     await db.refresh(application)
+    await job_event_service.publish(application_event(application))
     
     # Enqueue background task
     background_tasks.add_task(recompute_application_score_task, application.id)
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, status
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+import asyncio
 import json
 import logging
 import httpx
-import io
-import pypdf
 from app.core.config import settings
-from groq import Groq
+import openai
+from app.services.llm.rate_limiter import LLMRateLimitTimeout
+from app.services.llm.factory import get_groq_provider
+from app.services.document_text import document_text_service
+from app.services.llm.json_stream import stream_json_fields, SSE_HEADERS
+from fastapi.responses import StreamingResponse
 from supabase import create_client, Client
 
 router = APIRouter()
@@ -18,10 +22,10 @@ def get_supabase() -> Client:
         raise HTTPException(status_code=500, detail="Supabase credentials not configured")
     return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
 
-def get_groq() -> Groq:
+def get_groq():
     if not settings.GROQ_API_KEY:
         raise HTTPException(status_code=500, detail="Groq API Key not configured")
-    return Groq(api_key=settings.GROQ_API_KEY)
+    return get_groq_provider()
 
 # ─── MODELS ─────────────────────────────────────────────────────────────
 
@@ -100,17 +104,14 @@ async def upload_resume(
         
         # 2. Extract Text
         content = await resume.read()
-        pdf_file = io.BytesIO(content)
-        reader = pypdf.PdfReader(pdf_file)
-        resume_text = ""
-        for page in reader.pages:
-            resume_text += page.extract_text() + "\n"
+        filename = resume.filename or "resume.pdf"
+        if not filename.lower().endswith((".pdf", ".docx")):
+            filename += ".pdf"
+        resume_text = await document_text_service.get_text_for_bytes(content, filename)
             
         # 3. Upload to Storage
         file_path = f"{user_id}/{resume.filename}"
         # Supabase storage upload requires bytes or file object. 
-        # reset cursor
-        pdf_file.seek(0)
         # Note: supabase-py storage upload might verify mime type
         res = supabase.storage.from_("resumes").upload(
             file_path, 
@@ -143,11 +144,7 @@ async def upload_resume(
         logging.error(f"Upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/analyze")
-async def analyze_resume(req: AnalyzeRequest):
-    groq = get_groq()
-    supabase = get_supabase()
-    
+def build_analysis_messages(req: AnalyzeRequest) -> List[Dict[str, str]]:
     # Construct Prompt (Simplified version of original Mega-Prompt)
     roles_text = "\n".join([f"{i+1}. {r.role} (JD: {r.job_description[:500] if r.job_description else 'N/A'})" for i, r in enumerate(req.roles)])
     
@@ -180,46 +177,87 @@ async def analyze_resume(req: AnalyzeRequest):
       "summary": "..."
     }}
     """
+    return [
+        {"role": "system", "content": "You output ONLY valid raw JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+def save_analysis(supabase: Client, req: AnalyzeRequest, analysis: Dict[str, Any]):
+    # Save to Supabase
+    # Flatten roles for storage
+    role_str = ", ".join([r.role for r in req.roles])
+    jd_str = req.roles[0].job_description if req.roles else None
+    
+    save_data = {
+        "user_id": req.user_id,
+        "resume_id": req.resume_id,
+        "role": role_str,
+        "job_description": jd_str,
+        "score": analysis.get("ats_score", {}).get("overall", 0),
+        "strengths": analysis.get("strengths", []),
+        "gaps": analysis.get("gaps", []),
+        "better_roles": analysis.get("recommendations", [])
+    }
+    
+    # Use upsert or insert
+    supabase.table("analyses").insert(save_data).execute()
+
+# Default to the fast model for the synchronous analysis
+ANALYSIS_MODEL = settings.LLM_MODEL if "llama" in settings.LLM_MODEL else "llama-3.1-8b-instant"
+
+@router.post("/analyze")
+async def analyze_resume(req: AnalyzeRequest):
+    groq = get_groq()
+    supabase = get_supabase()
     
     try:
-        completion = groq.chat.completions.create(
-            model=settings.LLM_MODEL if "llama" in settings.LLM_MODEL else "llama-3.1-8b-instant", # Default to fast model
-            messages=[
-                {"role": "system", "content": "You output ONLY valid raw JSON."},
-                {"role": "user", "content": prompt}
-            ],
+        completion = await groq.complete(
+            model=ANALYSIS_MODEL,
+            messages=build_analysis_messages(req),
             temperature=0.1,
-            max_tokens=4000
+            max_tokens=4000,
+            timeout=settings.QUICK_AI_TIMEOUT_SECONDS
         )
         
         ai_text = completion.choices[0].message.content
         analysis = parse_json_from_response(ai_text)
         
-        # Save to Supabase
-        # Flatten roles for storage
-        role_str = ", ".join([r.role for r in req.roles])
-        jd_str = req.roles[0].job_description if req.roles else None
-        
-        save_data = {
-            "user_id": req.user_id,
-            "resume_id": req.resume_id,
-            "role": role_str,
-            "job_description": jd_str,
-            "score": analysis.get("ats_score", {}).get("overall", 0),
-            "strengths": analysis.get("strengths", []),
-            "gaps": analysis.get("gaps", []),
-            "better_roles": analysis.get("recommendations", [])
-        }
-        
-        # Use upsert or insert
-        res = supabase.table("analyses").insert(save_data).execute()
+        await asyncio.to_thread(save_analysis, supabase, req, analysis)
         
         return analysis
         
+    except LLMRateLimitTimeout:
+        logging.warning("LLM budget exhausted")
+        raise HTTPException(status_code=429, detail="The AI service is busy. Please try again shortly.")
+    except openai.APITimeoutError:
+        logging.error("Analysis timed out")
+        raise HTTPException(status_code=504, detail="Analysis timed out. Please try again.")
     except Exception as e:
         logging.error(f"Analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@router.post("/analyze/stream")
+async def analyze_resume_stream(req: AnalyzeRequest):
+    """
+    SSE variant of /analyze: streams top-level fields (ats_score, role_matches, ...)
+    as they are generated, saves the analysis, then sends `done` with the full object.
+    """
+    groq = get_groq()
+    supabase = get_supabase()
+
+    async def finalize(analysis: Dict[str, Any]) -> Dict[str, Any]:
+        await asyncio.to_thread(save_analysis, supabase, req, analysis)
+        return analysis
+
+    tokens = groq.stream_complete(
+        model=ANALYSIS_MODEL,
+        messages=build_analysis_messages(req),
+        temperature=0.1,
+        max_tokens=4000,
+        timeout=settings.QUICK_AI_TIMEOUT_SECONDS
+    )
+    return StreamingResponse(stream_json_fields(tokens, finalize=finalize), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/jobs")
 async def find_jobs(role: str, location: str = "Remote", num_pages: int = 1):
     """
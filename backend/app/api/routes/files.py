@@ -1,10 +1,11 @@
-from typing import Any, Annotated, List
+from typing import Any, Annotated, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from app.api import deps
 from app.services.storage import storage_service
+from app.services.file_blobs import file_blob_service
 from app.models.file import UploadedFile
 from app.models.user import User
 from app.schemas.file import UploadedFileOut
@@ -37,7 +38,7 @@ async def list_files(
     for file in files:
         # Create a copy or dict to populate signed_url
         # Since we are returning Pydantic models, we can construct them
-        url = storage_service.generate_signed_url(file.bucket_path)
+        url = storage_service.generate_signed_url(file.bucket_path, filename=file.original_filename)
         
         file_responses.append(UploadedFileOut(
             id=file.id,
@@ -69,7 +70,7 @@ async def get_file(
         raise HTTPException(status_code=403, detail="Not authorized")
         
     # Generate signed URL
-    url = storage_service.generate_signed_url(file.bucket_path)
+    url = storage_service.generate_signed_url(file.bucket_path, filename=file.original_filename)
     
     return UploadedFileOut(
         id=file.id,
@@ -98,15 +99,8 @@ async def delete_file(
     if file.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    # Delete from GCS
-    success = await storage_service.delete_file(file.bucket_path)
-    if not success:
-         # Depending on strictness, we might still delete DB record or raise error. 
-         # For now, we'll log (print) and proceed to delete DB record to avoid orphans.
-         print(f"Failed to delete file from GCS: {file.bucket_path}")
-
-    # Delete from DB
-    await db.delete(file)
+    # Delete the DB record; the blob goes only with its last reference
+    await file_blob_service.release(db, file)
     await db.commit()
     
     # For delete response, we can return null signed_url
@@ -119,20 +113,52 @@ async def delete_file(
         created_at=file.created_at
     )
 
-@router.get("/download/{bucket_path}")
+@router.get("/download/{bucket_path:path}")
 async def download_file_locally(
     bucket_path: str,
-    # In a real app, we might want auth here, but for demonstration we'll make it simple
-    # current_user: Annotated[User, Depends(deps.get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    token: Annotated[Optional[str], Depends(deps.oauth2_scheme_optional)],
+    access_token: Optional[str] = None,
 ):
     """
-    Serve local files from storage.
+    Serve files from storage: local disk, the GCS emulator in dev/tests, or
+    (authenticated, own files only) a real GCS bucket.
     """
     from app.core.config import settings
     import os
-    
-    file_path = os.path.join(settings.LOCAL_STORAGE_PATH, bucket_path)
-    if not os.path.exists(file_path):
+
+    if storage_service.storage_type == "gcs" and storage_service.client is not None:
+        if not settings.STORAGE_EMULATOR_HOST:
+            # Real bucket: only stream objects the caller has uploaded
+            user_id = await deps.get_current_user_id(token, access_token)
+            owned = await db.execute(
+                select(UploadedFile.id)
+                .where(UploadedFile.bucket_path == bucket_path, UploadedFile.user_id == user_id)
+                .limit(1)
+            )
+            if owned.scalar() is None:
+                raise HTTPException(status_code=404, detail="File not found")
+
+        chunks = storage_service.download_stream(bucket_path)
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = b""
+        except Exception:
+            raise HTTPException(status_code=404, detail="File not found")
+
+        async def body():
+            yield first
+            async for chunk in chunks:
+                yield chunk
+
+        return StreamingResponse(body(), media_type="application/octet-stream")
+
+    root = os.path.realpath(settings.LOCAL_STORAGE_PATH)
+    file_path = os.path.realpath(os.path.join(root, bucket_path))
+    # bucket_path may contain "/" (blobs/ab/<sha256>); never leave the storage root
+    if not file_path.startswith(root + os.sep) or not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-        
+
+    # FileResponse streams from disk on a worker thread
     return FileResponse(file_path)
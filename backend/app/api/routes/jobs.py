@@ -1,15 +1,19 @@
-from typing import Any, Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, Annotated, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, func
 from app.api import deps
 from app.models.job import Job
 from app.models.application import Application
 from app.models.resume import Resume
-from app.models.user import User
+from app.models.user import User, UserRole
+from app.models.ai_job import AIJob, JobStatus
 from app.schemas.job import JobOut, JobCreate
 from app.schemas.application import ApplicationOut, ApplicationCreate
+from app.schemas.ai_job import AIJobOut
 from app.core.database import get_db
+from app.services.skills_index import skills_index
+from app.services.job_vectors import job_vector_index
 import uuid
 import random
 
@@ -20,10 +24,22 @@ async def read_jobs(
     db: Annotated[AsyncSession, Depends(get_db)],
     skip: int = 0,
     limit: int = 100,
+    skills: Optional[str] = Query(None, description="Comma-separated; aliases like JS/JavaScript match"),
 ) -> Any:
     """
-    Retrieve all jobs (public).
+    Retrieve all jobs (public), optionally only those requiring any of the
+    given skills, most overlapping first.
     """
+    if skills:
+        await skills_index.ensure_loaded(db)
+        overlap = skills_index.overlap(s for s in skills.split(",") if s.strip())
+        if not overlap:
+            return []
+        ranked = sorted(overlap, key=lambda job_id: (-overlap[job_id], str(job_id)))[skip:skip + limit]
+        result = await db.execute(select(Job).where(Job.id.in_(ranked)))
+        by_id = {job.id: job for job in result.scalars().all()}
+        return [by_id[job_id] for job_id in ranked if job_id in by_id]
+
     result = await db.execute(
         select(Job)
         .order_by(desc(Job.created_at))
@@ -47,6 +63,26 @@ async def read_job(
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
+@router.get("/{id}/similar", response_model=List[JobOut])
+async def read_similar_jobs(
+    id: uuid.UUID,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    limit: int = Query(10, ge=1, le=50),
+) -> Any:
+    """
+    Jobs semantically closest to this one (cosine similarity of embeddings).
+    """
+    result = await db.execute(select(Job.id).where(Job.id == id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    ranked = [job_id for job_id, _ in await job_vector_index.similar_jobs(id, limit)]
+    if not ranked:
+        return []
+    result = await db.execute(select(Job).where(Job.id.in_(ranked)))
+    by_id = {job.id: job for job in result.scalars().all()}
+    return [by_id[job_id] for job_id in ranked if job_id in by_id]
+
 @router.post("/{id}/apply", response_model=ApplicationOut)
 async def apply_to_job(
     id: uuid.UUID,
@@ -96,27 +132,66 @@ async def apply_to_job(
     await db.refresh(application)
 
     # --- Trigger AI Scoring ---
-    from app.models.ai_job import AIJob, JobStatus
-    from app.services.ai_queue import queue_service
+    from app.services.ai_jobs import ai_job_service, content_hash_of
+
+    # A bulk run that is queued or running will pick this application up; the
+    # worker also skips applications a bulk run has already scored
+    result = await db.execute(
+        select(AIJob.id)
+        .where(AIJob.job_type == "bulk_application_scoring", AIJob.input_ref == str(id))
+        .where(AIJob.status == JobStatus.PENDING)
+        .limit(1)
+    )
+    if result.scalar() is not None:
+        return application
 
-    ai_job = AIJob(
+    await ai_job_service.submit(
+        db,
         user_id=current_user.id,
         job_type="application_scoring",
-        status=JobStatus.PENDING,
-        input_ref=str(application.id)
+        input_ref=str(application.id),
+        content_hash=content_hash_of(resume.content),
+        priority="bulk"
     )
-    db.add(ai_job)
-    await db.commit()
-    await db.refresh(ai_job)
-
-    queue_service.enqueue_job({
-        "job_id": str(ai_job.id),
-        "job_type": "application_scoring",
-        "input_ref": str(application.id)
-    })
     
     return application
 
+@router.post("/{id}/score-applications", response_model=AIJobOut)
+async def score_applications(
+    id: uuid.UUID,
+    current_user: Annotated[User, Depends(deps.require_organisation)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> Any:
+    """
+    Scores all pending applications for a job in one bulk AI job
+    (the organisation that posted it, or an admin).
+    """
+    from app.services.ai_jobs import ai_job_service, content_hash_of
+
+    result = await db.execute(select(Job.posted_by_id).where(Job.id == id))
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if row.posted_by_id != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
+        raise HTTPException(status_code=403, detail="Only the organisation that posted this job can score its applications")
+
+    # The pending set identifies the work, so a repeat call with no new applicants reuses the job
+    pending, latest = (await db.execute(
+        select(func.count(Application.id), func.max(Application.updated_at))
+        .where(Application.job_id == id, Application.processing_state == "pending")
+    )).one()
+    if not pending:
+        raise HTTPException(status_code=400, detail="No pending applications to score")
+
+    return await ai_job_service.submit(
+        db,
+        user_id=current_user.id,
+        job_type="bulk_application_scoring",
+        input_ref=str(id),
+        content_hash=content_hash_of({"pending": pending, "latest": latest}),
+        priority="bulk"
+    )
+
 # Admin route to seed jobs (temporary)
 @router.post("/seed", status_code=201)
 async def seed_jobs(
@@ -153,9 +228,12 @@ async def seed_jobs(
         }
     ]
     
-    for job_data in jobs_data:
-        job = Job(**job_data)
-        db.add(job)
+    jobs = [Job(**job_data, posted_by_id=current_user.id) for job_data in jobs_data]
+    # Embedded once here, not per matching request
+    await job_vector_index.embed_jobs(jobs)
+    db.add_all(jobs)
     
     await db.commit()
+    # Update the skills index here and in every other API/worker process
+    await skills_index.publish_upsert(jobs)
     return {"message": "Jobs seeded successfully"}
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from app.services.resume_tailor import resume_tailor_service
+from app.services.llm.json_stream import stream_json_fields, SSE_HEADERS
 import logging
 
 router = APIRouter()
@@ -46,3 +48,15 @@ async def tailor_resume(request: ResumeRewriteRequest):
     except Exception as e:
         logger.error(f"Error in tailor-resume: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/tailor-resume/stream")
+async def tailor_resume_stream(request: ResumeRewriteRequest):
+    """
+    SSE variant of /tailor-resume: streams each top-level field
+    (tailored_summary, tailored_experience, ...) as it is generated.
+    """
+    if not request.resume_text or len(request.resume_text) < 50:
+        raise HTTPException(status_code=400, detail="Resume text too short.")
+
+    tokens = resume_tailor_service.tailor_resume_stream(request.resume_text, request.jd_analysis)
+    return StreamingResponse(stream_json_fields(tokens), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,6 +1,6 @@
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Koutuhal Pathways API"
@@ -16,12 +16,23 @@ class Settings(BaseSettings):
 
     # SQLALCHEMY_DATABASE_URI will be assembled or can be overridden
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    # Connections per process. API processes keep SQLAlchemy's default pool; each
+    # worker job holds a session for its whole run, so the worker's pool defaults
+    # to WORKER_MAX_CONCURRENCY plus the background loops.
+    DB_POOL_SIZE: int = 5
+    WORKER_DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30
 
     # Storage
     STORAGE_TYPE: str = "local" # options: local, gcs
     LOCAL_STORAGE_PATH: str = ".storage"
     GCS_BUCKET_NAME: Optional[str] = None
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None
+    # e.g. http://localhost:4443 for fake-gcs-server; no credentials needed
+    STORAGE_EMULATOR_HOST: Optional[str] = None
+    STORAGE_IO_THREADS: int = 8
+    STORAGE_CHUNK_SIZE: int = 256 * 1024
 
     # Security
     SECRET_KEY: str = "temp-secret-key-change-in-production"
@@ -38,18 +49,118 @@ class Settings(BaseSettings):
     # File Upload Limits
     MAX_UPLOAD_MB: int = 5
     MAX_FILES_PER_DAY: int = 20
+    # Uploads are read in chunks and spooled to disk past UPLOAD_SPOOL_MAX_BYTES
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    UPLOAD_SPOOL_MAX_BYTES: int = 1024 * 1024
+    # Allowed on top of MAX_UPLOAD_MB in Content-Length (other form fields, multipart framing)
+    UPLOAD_FORM_OVERHEAD_BYTES: int = 256 * 1024
+    # Text extraction runs in a pool of worker processes (per API/worker process)
+    EXTRACTION_POOL_WORKERS: int = 2
+    EXTRACTION_TIMEOUT_SECONDS: float = 20.0
+    EXTRACTION_MEMORY_LIMIT_MB: int = 1024
+    EXTRACTION_MAX_TASKS_PER_CHILD: int = 200
+    # Extraction stops at the caller's char budget (this is the default) and never
+    # reads past EXTRACTION_MAX_PAGES; longer PDFs are split across workers.
+    EXTRACTION_MAX_CHARS: int = 50000
+    EXTRACTION_MAX_PAGES: int = 60
+    EXTRACTION_PAGES_PER_TASK: int = 8
+    # Extracted text is cached by file content hash and shared across processes
+    DOCUMENT_TEXT_TTL_SECONDS: int = 30 * 24 * 3600
+    DOCUMENT_TEXT_LOCAL_MAX_ENTRIES: int = 256
+    # Job matching: local BM25 + skill-overlap retrieval picks the LLM's shortlist
+    JOB_MATCH_CANDIDATES: int = 20
+    JOB_INDEX_REFRESH_SECONDS: int = 60
+    # Semantic matching: "hashing" (deterministic, no model) or "sentence-transformers"
+    EMBEDDING_BACKEND: str = "hashing"
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_DIM: int = 384
+    EMBEDDING_INDEX_DIR: str = ".embedding_index"
+    EMBEDDING_BACKFILL_BATCH: int = 256
+    # Hybrid lexical/semantic scores decide the matches; the LLM only re-ranks them
+    JOB_MATCH_LLM_RERANK: bool = True
+    JOB_MATCH_SEMANTIC_WEIGHT: float = 0.5
+    # Bulk applicant scoring: LLM re-score on/off, resumes per call, how many get an LLM score, parallel calls
+    BULK_SCORING_LLM_RERANK: bool = True
+    BULK_SCORING_BATCH_SIZE: int = 8
+    BULK_SCORING_LLM_TOP_N: int = 200
+    BULK_SCORING_LLM_CONCURRENCY: int = 4
+    # Application ranks: Redis sorted set per job, copied to applications.rank in batches
+    APPLICATION_RANK_MATERIALIZE_SECONDS: float = 5.0
+    APPLICATION_RANK_BATCH_JOBS: int = 100
+    # Worker-side LRU disk cache of downloaded files (0 disables it)
+    BLOB_CACHE_DIR: str = ".blob_cache"
+    BLOB_CACHE_MAX_MB: int = 512
     
     # Rate Limiting
     REDIS_URL: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT_SECONDS: int = 10
+
+    # AI Worker
+    # Global cap on jobs a single worker process runs concurrently, plus a
+    # per-job_type cap so one job type cannot take every slot.
+    WORKER_MAX_CONCURRENCY: int = 32
+    WORKER_JOB_CONCURRENCY: Dict[str, int] = {
+        "resume_analysis": 16,
+        "application_scoring": 8,
+        "job_matching": 8,
+        "bulk_application_scoring": 2,
+    }
+    # Priority lanes: dequeue is weighted-fair across lanes by these weights.
+    AI_QUEUE_LANE_WEIGHTS: Dict[str, int] = {"interactive": 4, "bulk": 1}
+    AI_JOB_DEFAULT_LANES: Dict[str, str] = {
+        "resume_analysis": "interactive",
+        "job_matching": "interactive",
+        "application_scoring": "bulk",
+        "bulk_application_scoring": "bulk",
+    }
+    # Completed jobs with the same idempotency key are reused for this long.
+    AI_JOB_RESULT_REUSE_SECONDS: int = 3600
+    # Reliable delivery: leases on dequeued jobs are renewed by the worker's
+    # heartbeat; the reaper re-delivers jobs whose lease expired and resets
+    # ai_jobs rows stuck in PROCESSING for longer than AI_JOB_STALE_AFTER_SECONDS.
+    QUEUE_VISIBILITY_TIMEOUT_SECONDS: int = 120
+    QUEUE_REAPER_INTERVAL_SECONDS: int = 30
+    AI_JOB_STALE_AFTER_SECONDS: int = 900
+    # Push-based job status (Redis pub/sub fan-out, SSE and long-poll)
+    JOB_EVENTS_STATE_TTL_SECONDS: int = 24 * 3600
+    JOB_EVENTS_QUEUE_SIZE: int = 100
+    JOB_EVENTS_LONG_POLL_MAX_SECONDS: int = 30
+    JOB_EVENTS_KEEPALIVE_SECONDS: int = 15
     
     # LLM
     # OPENAI_API_KEY / GEMINI_API_KEY can still be used, but we prefer a generic LLM_API_KEY + LLM_BASE_URL
     LLM_API_KEY: Optional[str] = None 
     LLM_BASE_URL: str = "https://api.openai.com/v1" # Default to OpenAI
     LLM_MODEL: str = "llama-3.1-8b-instant" 
+    # Pooled LLM HTTP clients (one long-lived client per upstream)
+    LLM_HTTP2: bool = True
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    # Shared LLM result cache (in-process LRU + Redis)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_CACHE_LOCAL_MAX_ENTRIES: int = 1024
+    # Client-side rate limiting per provider/model, e.g. {"llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000}}
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {}
+    LLM_DEFAULT_RPM: int = 500
+    LLM_DEFAULT_TPM: int = 200000
+    LLM_DEFAULT_COMPLETION_TOKENS: int = 1024
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS: float = 60.0
+    # Adaptive (AIMD) concurrency bounds and the latency above which it backs off
+    LLM_MIN_CONCURRENCY: int = 2
+    LLM_MAX_CONCURRENCY: int = 64
+    LLM_LATENCY_TARGET_SECONDS: float = 20.0
 
     # Career Readiness Integration
     GROQ_API_KEY: Optional[str] = None
+    GROQ_BASE_URL: str = "https://api.groq.com/openai/v1"
+    GROQ_MODEL: str = "llama-3.1-8b-instant"
+    # Upper bound for the synchronous (request/response) quick-analysis endpoints
+    QUICK_AI_TIMEOUT_SECONDS: float = 30.0
     SUPABASE_URL: Optional[str] = None
     SUPABASE_SERVICE_KEY: Optional[str] = None
     SEARCHAPI_KEY: Optional[str] = None
@@ -2,8 +2,31 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
 
-engine = create_async_engine(settings.SQLALCHEMY_DATABASE_URI, echo=True)
+def _create_engine(pool_size: int):
+    return create_async_engine(
+        settings.SQLALCHEMY_DATABASE_URI,
+        echo=True,
+        pool_size=pool_size,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=True,
+    )
+
+engine = _create_engine(settings.DB_POOL_SIZE)
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+SessionLocal = AsyncSessionLocal
+
+# Headroom for the reaper, rank materializer and index refresh sessions
+_WORKER_BACKGROUND_SESSIONS = 4
+
+def use_worker_pool():
+    """
+    Rebinds all sessions to an engine sized for the AI worker's concurrency.
+    Call once at worker startup, before any session is opened.
+    """
+    global engine
+    engine = _create_engine(settings.WORKER_DB_POOL_SIZE or settings.WORKER_MAX_CONCURRENCY + _WORKER_BACKGROUND_SESSIONS)
+    AsyncSessionLocal.configure(bind=engine)
 
 class Base(DeclarativeBase):
     pass
@@ -0,0 +1,42 @@
+import logging
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[aioredis.BlockingConnectionPool] = None
+_client: Optional[aioredis.Redis] = None
+
+def redis_configured() -> bool:
+    return bool(settings.REDIS_URL) and not settings.REDIS_URL.startswith("memory://")
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """
+    Returns the process-wide asyncio Redis client.
+    All callers share one blocking connection pool, so bursts wait for a free
+    connection instead of opening new sockets. Returns None if Redis is not configured.
+    """
+    global _pool, _client
+    if _client is None and redis_configured():
+        _pool = aioredis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+            health_check_interval=30,
+        )
+        _client = aioredis.Redis(connection_pool=_pool)
+    return _client
+
+async def close_redis():
+    global _pool, _client
+    if _client is not None:
+        try:
+            await _client.aclose()
+            await _pool.disconnect()
+        except Exception as e:
+            logger.warning("Redis: error while closing pool: %s", e)
+    _pool = None
+    _client = None
@@ -16,6 +16,15 @@ from app.core.limiter import limiter
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Oversized resume uploads are refused before their body is read
+# (added first, so the CORS middleware below still wraps the 413)
+from app.services.upload_ingest import UploadSizeLimitMiddleware
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={f"{settings.API_V1_STR}/ai/analyze-resume": settings.MAX_UPLOAD_MB * 1024 * 1024},
+)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -28,6 +37,37 @@ if settings.BACKEND_CORS_ORIGINS:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+from app.core.redis import close_redis
+from app.services.llm.factory import close_llm_providers
+from app.services.job_events import job_event_service
+from app.services.extraction_pool import extraction_pool
+from app.services.storage import storage_service
+from app.services.skills_index import skills_index
+from app.services.llm.cache import llm_cache
+from app.core.database import AsyncSessionLocal
+import logging
+
+@app.on_event("startup")
+async def startup():
+    await extraction_pool.warm_up()
+    llm_cache.start()
+    try:
+        async with AsyncSessionLocal() as db:
+            await skills_index.start(db)
+    except Exception as e:
+        # Not fatal: the index loads lazily on first use
+        logging.getLogger(__name__).error(f"Skills index build failed: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    extraction_pool.shutdown()
+    storage_service.shutdown()
+    await skills_index.close()
+    await llm_cache.close()
+    await job_event_service.close()
+    await close_llm_providers()
+    await close_redis()
+
 @app.get("/")
 def root():
     return {"message": "Welcome to Koutuhal Pathways API"}
@@ -1,7 +1,7 @@
 import uuid
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Integer, Enum, DateTime, func, ForeignKey, Text
+from sqlalchemy import String, Integer, Enum, DateTime, func, ForeignKey, Text, Index, text
 from app.core.database import Base
 import enum
 
@@ -21,6 +21,7 @@ class AIJob(Base):
     status: Mapped[JobStatus] = mapped_column(Enum(JobStatus), default=JobStatus.PENDING)
     
     input_ref: Mapped[str] = mapped_column(String, nullable=True) # file_id or resume_id
+    idempotency_key: Mapped[str | None] = mapped_column(String, nullable=True, index=True) # user + job_type + input_ref + content hash + model
     result_json: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
     
@@ -33,3 +34,14 @@ class AIJob(Base):
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+
+    # Constraints
+    __table_args__ = (
+        Index(
+            "uq_ai_jobs_active_idempotency_key",
+            "idempotency_key",
+            unique=True,
+            postgresql_where=text("status IN ('PENDING', 'PROCESSING')"),
+        ),
+        Index("ix_ai_jobs_job_type_input_ref", "job_type", "input_ref"),
+    )
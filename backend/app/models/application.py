@@ -1,7 +1,7 @@
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, DateTime, func, UniqueConstraint
+from sqlalchemy import String, Integer, ForeignKey, DateTime, func, UniqueConstraint, Index
 from app.core.database import Base
 from app.models.job import Job  # For relationship if needed, though usually just ID for now
 
@@ -27,4 +27,6 @@ class Application(Base):
     # Constraints
     __table_args__ = (
         UniqueConstraint('user_id', 'job_id', name='uq_user_job_application'),
+        # Per-job rank materialization (RANK() OVER (PARTITION BY job_id ORDER BY match_score DESC))
+        Index('ix_applications_job_id_match_score', 'job_id', 'match_score'),
     )
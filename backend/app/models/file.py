@@ -1,7 +1,7 @@
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Integer, ForeignKey, DateTime, func
+from sqlalchemy import String, Integer, ForeignKey, DateTime, func, UniqueConstraint
 from app.core.database import Base
 
 class UploadedFile(Base):
@@ -12,8 +12,14 @@ class UploadedFile(Base):
     original_filename: Mapped[str] = mapped_column(String, nullable=False)
     content_type: Mapped[str] = mapped_column(String, nullable=False)
     size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
-    bucket_path: Mapped[str] = mapped_column(String, nullable=False)
+    bucket_path: Mapped[str] = mapped_column(String, nullable=False, index=True) # shared by every row with the same content_hash
     public_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True, index=True) # sha256 of file bytes
     
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
     version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('user_id', 'content_hash', name='uq_user_content_hash'),
+    )
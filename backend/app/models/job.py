@@ -1,7 +1,7 @@
 import uuid
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Text, DateTime, func
+from sqlalchemy import String, Text, DateTime, LargeBinary, ForeignKey, func
 from app.core.database import Base
 from typing import List, Any
 
@@ -15,6 +15,11 @@ class Job(Base):
     skills: Mapped[List[str]] = mapped_column(JSONB, nullable=False)
     location: Mapped[str] = mapped_column(String, nullable=False)
     job_type: Mapped[str] = mapped_column(String, nullable=False)
+    # The organisation account that posted the job; may bulk-score its applicants
+    posted_by_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id"), index=True, nullable=True)
+    # float32 vector from embedding_model (see services/job_vectors.py); deferred, only the index reads it
+    embedding: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True, deferred=True)
+    embedding_model: Mapped[str | None] = mapped_column(String, nullable=True)
     
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from app.models.ai_job import JobStatus
 
@@ -25,3 +25,31 @@ class AIJobOut(BaseModel):
 class AIJobStatus(BaseModel):
     id: UUID
     status: JobStatus
+
+class AIJobStatusEvent(BaseModel):
+    id: UUID
+    status: JobStatus
+    version: int
+    error: Optional[str] = None
+    changed: bool = True
+
+class AIJobStatusBatchRequest(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=500)
+    # Only jobs changed since the client's last view are returned: pass back
+    # each item's version; updated_after only filters ids without one
+    versions: Dict[UUID, int] = Field(default_factory=dict)
+    updated_after: Optional[datetime] = None
+    include_result: bool = False
+
+class AIJobStatusItem(BaseModel):
+    id: UUID
+    status: JobStatus
+    version: int
+    error: Optional[str] = None
+    updated_at: datetime
+    result_json: Optional[Dict[str, Any]] = None
+
+class AIJobStatusBatchOut(BaseModel):
+    changed: List[AIJobStatusItem]
+    # Ids that do not exist or belong to another user
+    missing: List[UUID]
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
-from typing import Optional
+from typing import Optional, Dict, List
 from datetime import datetime
 
 class ApplicationCreate(BaseModel):
@@ -31,3 +31,25 @@ class ApplicationStatusOut(BaseModel):
     
     class Config:
         from_attributes = True
+
+class ApplicationStatusEvent(BaseModel):
+    id: UUID
+    status: str
+    processing_state: str
+    rank: Optional[int]
+    match_score: Optional[int]
+    last_error: Optional[str]
+    version: int
+    changed: bool = True
+
+class ApplicationStatusBatchRequest(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=500)
+    versions: Dict[UUID, int] = Field(default_factory=dict)
+    updated_after: Optional[datetime] = None
+
+class ApplicationStatusItem(ApplicationStatusOut):
+    version: int
+
+class ApplicationStatusBatchOut(BaseModel):
+    changed: List[ApplicationStatusItem]
+    missing: List[UUID]
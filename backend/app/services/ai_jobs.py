@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from sqlalchemy import select, or_, and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.ai_job import AIJob, JobStatus
+from app.services.ai_queue import queue_service
+
+logger = logging.getLogger(__name__)
+
+def content_hash_of(value: Any) -> str:
+    """
+    Stable sha256 of JSON-like content (e.g. Resume.content or a request payload).
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+class AIJobService:
+    def idempotency_key(self, user_id: uuid.UUID, job_type: str, input_ref: str, content_hash: Optional[str], model: Optional[str] = None) -> str:
+        """
+        Identical inputs from the same user processed by the same model produce
+        the same key. The user is part of the key because the unique index on
+        active keys spans all users.
+        """
+        parts = [str(user_id), job_type, input_ref or "", content_hash or "", model or settings.LLM_MODEL]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    async def find_reusable(self, db: AsyncSession, user_id: uuid.UUID, key: str) -> Optional[AIJob]:
+        """
+        A pending/running job with this key, or one that completed within
+        AI_JOB_RESULT_REUSE_SECONDS.
+        """
+        reuse_after = datetime.now(timezone.utc) - timedelta(seconds=settings.AI_JOB_RESULT_REUSE_SECONDS)
+        result = await db.execute(
+            select(AIJob)
+            .where(AIJob.user_id == user_id)
+            .where(AIJob.idempotency_key == key)
+            .where(or_(
+                AIJob.status.in_([JobStatus.PENDING, JobStatus.PROCESSING]),
+                and_(AIJob.status == JobStatus.COMPLETED, AIJob.finished_at >= reuse_after),
+            ))
+            .order_by(AIJob.created_at.desc())
+            .limit(1)
+        )
+        return result.scalars().first()
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        job_type: str,
+        input_ref: str,
+        content_hash: Optional[str] = None,
+        priority: Optional[str] = None,
+    ) -> AIJob:
+        """
+        Creates and enqueues an AIJob unless an identical one is already pending,
+        running or recently completed, in which case that job is returned
+        (with its result_json if completed) and nothing is enqueued.
+        """
+        key = self.idempotency_key(user_id, job_type, input_ref, content_hash)
+
+        existing = await self.find_reusable(db, user_id, key)
+        if existing:
+            logger.info(f"Reusing AIJob {existing.id} ({existing.status.value}) for {job_type}", extra={"job_id": str(existing.id)})
+            return existing
+
+        job = AIJob(
+            user_id=user_id,
+            job_type=job_type,
+            status=JobStatus.PENDING,
+            input_ref=input_ref,
+            idempotency_key=key
+        )
+        try:
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+        except IntegrityError:
+            # Race condition: a concurrent request created the active job just now.
+            await db.rollback()
+            existing = await self.find_reusable(db, user_id, key)
+            if existing:
+                return existing
+            raise
+
+        try:
+            await queue_service.enqueue_job({
+                "job_id": str(job.id),
+                "job_type": job_type,
+                "input_ref": input_ref
+            }, priority=priority)
+        except Exception as e:
+            # Never leave a PENDING row that no worker will pick up: it would
+            # hold the key and be handed back to every identical submission.
+            job.status = JobStatus.FAILED
+            job.error = f"Enqueue failed: {e}"
+            job.version += 1
+            job.finished_at = func.now()
+            await db.commit()
+            raise
+        return job
+
+ai_job_service = AIJobService()
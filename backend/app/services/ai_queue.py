@@ -1,55 +1,376 @@
 import json
-import redis
+import os
+import socket
+import time
 import uuid
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from app.core.config import settings
+from app.core.redis import get_redis
 
 logger = logging.getLogger(__name__)
 
+QUEUE_KEY = "ai_jobs_queue"
+# Priority lanes. The interactive lane keeps the original key so payloads
+# enqueued before lanes existed are still consumed.
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANE_KEYS = {
+    LANE_INTERACTIVE: QUEUE_KEY,
+    LANE_BULK: f"{QUEUE_KEY}:bulk",
+}
+LANE_STATS_PREFIX = "ai_jobs_lane_stats:"
+# Reliable delivery: a dequeued job is moved (not popped) into the worker's own
+# processing list and leased. Leases live in a sorted set scored by expiry time;
+# the in-flight hash remembers which worker list holds each job's payload.
+PROCESSING_KEY_PREFIX = "ai_jobs_processing:"
+WORKER_HEARTBEAT_PREFIX = "ai_jobs_worker:"
+LEASES_KEY = "ai_jobs_leases"
+INFLIGHT_KEY = "ai_jobs_inflight"
+REAPER_LOCK_KEY = "ai_jobs_reaper_lock"
+# Retries wait in a sorted set scored by due time; exhausted or fatal jobs are
+# indexed by failure time with their details in a separate hash.
+DELAYED_KEY = "ai_jobs_delayed"
+DEAD_LETTER_KEY = "ai_jobs_dead_letter"
+DEAD_LETTER_ENTRIES_KEY = "ai_jobs_dead_letter_entries"
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
 class AIJobQueueService:
     def __init__(self):
-        self.redis_client = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processing_key = f"{PROCESSING_KEY_PREFIX}{self.worker_id}"
+        self.visibility_timeout = settings.QUEUE_VISIBILITY_TIMEOUT_SECONDS
+        # job_id -> raw payload for jobs this process currently holds a lease on
+        self._inflight: Dict[str, str] = {}
+        # Smooth weighted round-robin credit per lane
+        self.lane_weights = {lane: max(1, settings.AI_QUEUE_LANE_WEIGHTS.get(lane, 1)) for lane in LANE_KEYS}
+        self._lane_credit = {lane: 0 for lane in LANE_KEYS}
+
         if settings.REDIS_URL:
             if settings.REDIS_URL.startswith("memory://"):
                 logger.warning("Using memory:// for Redis. JOB QUEUE WILL NOT WORK ACROSS PROCESSES.")
-
-            try:
-                self.redis_client = redis.from_url(settings.REDIS_URL)
-                # Test connection
-                self.redis_client.ping()
-                logger.info("Redis: Connected successfully.")
-            except Exception as e:
-                logger.error("Redis Connection Failed: %s", e)
         else:
             logger.warning("REDIS_URL not set. Async jobs will use mock (no queue).")
 
-    def enqueue_job(self, job_data: Dict):
+    @property
+    def redis_client(self):
+        return get_redis()
+
+    async def ping(self) -> bool:
+        if not self.redis_client:
+            return False
+        try:
+            await self.redis_client.ping()
+            logger.info("Redis: Connected successfully.")
+            return True
+        except Exception as e:
+            logger.error("Redis Connection Failed: %s", e)
+            return False
+
+    def lane_for(self, job_data: Dict, priority: Optional[str] = None) -> str:
+        lane = priority or job_data.get("lane") or settings.AI_JOB_DEFAULT_LANES.get(job_data.get("job_type"))
+        return lane if lane in LANE_KEYS else LANE_INTERACTIVE
+
+    async def enqueue_job(self, job_data: Dict, priority: Optional[str] = None):
         """
-        Push job to Redis list 'ai_jobs_queue'.
+        Push job to its priority lane ('interactive' or 'bulk').
+        Without a priority the lane comes from the payload or the job type's default.
         job_data must include 'job_id'.
         """
+        lane = self.lane_for(job_data, priority)
+        job_data = {**job_data, "lane": lane, "enqueued_at": time.time()}
         if self.redis_client:
             try:
-                self.redis_client.lpush("ai_jobs_queue", json.dumps(job_data))
+                await self.redis_client.lpush(LANE_KEYS[lane], json.dumps(job_data))
             except Exception as e:
                 logger.error("Redis Enqueue Error: %s", e)
                 raise e
         else:
             logger.debug("Mock Enqueue: %s", str(job_data))
 
-    def dequeue_job(self) -> Optional[Dict]:
+    def _lane_order(self) -> List[str]:
         """
-        Blocking pop from Redis list.
+        Smooth weighted round-robin: every lane earns its weight in credit each
+        round, the richest lane goes first. Lower-weight lanes still get their
+        share, so neither lane starves.
+        """
+        for lane, weight in self.lane_weights.items():
+            self._lane_credit[lane] += weight
+        return sorted(self._lane_credit, key=self._lane_credit.get, reverse=True)
+
+    def _charge_lane(self, lane: str):
+        self._lane_credit[lane] -= sum(self.lane_weights.values())
+
+    async def dequeue_job(self, timeout: int = 5) -> Optional[Dict]:
+        """
+        Moves the next job from the lanes, in weighted-fair order, into this
+        worker's processing list.
+        The job is leased for the visibility timeout and stays in Redis until
+        ack_job() is called, so a worker crash cannot lose it.
         Returns job_data dict.
         """
+        if not self.redis_client:
+            return None
+        try:
+            raw = None
+            order = self._lane_order()
+            for lane in order:
+                raw = await self.redis_client.lmove(LANE_KEYS[lane], self.processing_key, "RIGHT", "LEFT")
+                if raw:
+                    self._charge_lane(lane)
+                    break
+                # An empty lane must not bank credit and then burst later.
+                self._lane_credit[lane] = 0
+
+            if not raw:
+                # Everything is empty: block on the top lane briefly, then re-check all lanes.
+                raw = await self.redis_client.blmove(LANE_KEYS[order[0]], self.processing_key, min(timeout, 1), "RIGHT", "LEFT")
+                if not raw:
+                    return None
+
+            raw = _decode(raw)
+            job_data = json.loads(raw)
+            job_id = str(job_data.get("job_id"))
+            lane = self.lane_for(job_data)
+            wait = max(0.0, time.time() - float(job_data.get("enqueued_at") or time.time()))
+
+            self._inflight[job_id] = raw
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.zadd(LEASES_KEY, {job_id: time.time() + self.visibility_timeout})
+                pipe.hset(INFLIGHT_KEY, job_id, json.dumps({"raw": raw, "worker": self.worker_id}))
+                pipe.hincrby(f"{LANE_STATS_PREFIX}{lane}", "dequeued", 1)
+                pipe.hincrbyfloat(f"{LANE_STATS_PREFIX}{lane}", "wait_seconds_total", wait)
+                pipe.hset(f"{LANE_STATS_PREFIX}{lane}", "last_wait_seconds", round(wait, 3))
+                await pipe.execute()
+            return job_data
+        except Exception as e:
+            logger.error("Redis Dequeue Error: %s", e)
+            raise e
+
+    async def get_lane_stats(self) -> Dict[str, Dict]:
+        """
+        Per-lane depth, age of the oldest waiting job, and wait time of dequeued jobs.
+        """
+        stats = {}
+        if not self.redis_client:
+            return stats
+        now = time.time()
+        for lane, key in LANE_KEYS.items():
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.llen(key)
+                pipe.lindex(key, -1)
+                pipe.hgetall(f"{LANE_STATS_PREFIX}{lane}")
+                depth, oldest, counters = await pipe.execute()
+
+            counters = {_decode(k): float(v) for k, v in counters.items()}
+            dequeued = int(counters.get("dequeued", 0))
+            oldest_enqueued_at = json.loads(oldest).get("enqueued_at") if oldest else None
+            stats[lane] = {
+                "weight": self.lane_weights[lane],
+                "depth": depth,
+                "oldest_wait_seconds": round(now - oldest_enqueued_at, 3) if oldest_enqueued_at else 0.0,
+                "dequeued": dequeued,
+                "avg_wait_seconds": round(counters.get("wait_seconds_total", 0) / dequeued, 3) if dequeued else 0.0,
+                "last_wait_seconds": counters.get("last_wait_seconds", 0.0),
+            }
+        return stats
+
+    async def ack_job(self, job_id: str):
+        """
+        Marks a delivered job as done and drops it from the processing list.
+        """
+        job_id = str(job_id)
+        raw = self._inflight.pop(job_id, None)
+        if not self.redis_client:
+            return
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            if raw is not None:
+                pipe.lrem(self.processing_key, 1, raw)
+            pipe.zrem(LEASES_KEY, job_id)
+            pipe.hdel(INFLIGHT_KEY, job_id)
+            await pipe.execute()
+
+    def release_job(self, job_id: str):
+        """
+        Stops renewing the lease without acking. The reaper re-delivers the
+        job once the lease expires.
+        """
+        self._inflight.pop(str(job_id), None)
+
+    async def heartbeat(self):
+        """
+        Keeps this worker registered and extends the leases it holds.
+        Call at a fraction of the visibility timeout.
+        """
+        if not self.redis_client:
+            return
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(f"{WORKER_HEARTBEAT_PREFIX}{self.worker_id}", int(time.time()), ex=self.visibility_timeout)
+            if self._inflight:
+                expiry = time.time() + self.visibility_timeout
+                pipe.zadd(LEASES_KEY, {job_id: expiry for job_id in self._inflight}, xx=True)
+            await pipe.execute()
+
+    async def is_in_flight(self, job_id: str) -> bool:
+        if not self.redis_client:
+            return False
+        return bool(await self.redis_client.hexists(INFLIGHT_KEY, str(job_id)))
+
+    async def acquire_reaper_lock(self, ttl: int) -> bool:
+        """
+        Only one worker process runs a reaper pass at a time.
+        """
+        if not self.redis_client:
+            return False
+        return bool(await self.redis_client.set(REAPER_LOCK_KEY, self.worker_id, nx=True, ex=ttl))
+
+    async def reclaim_expired(self) -> List[Dict]:
+        """
+        Takes ownership of jobs whose lease expired or whose worker is gone and
+        removes them from the processing lists.
+        Returns their job_data; the caller resets DB state and calls requeue_job().
+        """
+        if not self.redis_client:
+            return []
+        client = self.redis_client
+        reclaimed: List[Dict] = []
+
+        # 1. Leased jobs whose lease was not renewed in time
+        for job_id in await client.zrangebyscore(LEASES_KEY, 0, time.time()):
+            job_id = _decode(job_id)
+            if not await client.zrem(LEASES_KEY, job_id):
+                continue  # another reaper got it
+            entry = await client.hget(INFLIGHT_KEY, job_id)
+            await client.hdel(INFLIGHT_KEY, job_id)
+            if not entry:
+                continue
+            entry = json.loads(entry)
+            removed = await client.lrem(f"{PROCESSING_KEY_PREFIX}{entry['worker']}", 1, entry["raw"])
+            if removed:
+                reclaimed.append(json.loads(entry["raw"]))
+
+        # 2. Payloads left in a dead worker's list without a lease (crash between move and lease)
+        async for key in client.scan_iter(match=f"{PROCESSING_KEY_PREFIX}*", count=100):
+            key = _decode(key)
+            worker_id = key[len(PROCESSING_KEY_PREFIX):]
+            if await client.exists(f"{WORKER_HEARTBEAT_PREFIX}{worker_id}"):
+                continue
+            for raw in await client.lrange(key, 0, -1):
+                raw = _decode(raw)
+                job_data = json.loads(raw)
+                if await client.hexists(INFLIGHT_KEY, str(job_data.get("job_id"))):
+                    continue  # leased; handled by step 1 once the lease expires
+                if await client.lrem(key, 1, raw):
+                    reclaimed.append(job_data)
+
+        return reclaimed
+
+    async def requeue_job(self, job_data: Dict):
+        """
+        Puts a reclaimed job at the consuming end of its lane so it is picked next.
+        enqueued_at restarts, so queue-wait metrics count only this delivery.
+        """
         if self.redis_client:
-            try:
-                result = self.redis_client.brpop("ai_jobs_queue", timeout=5)
-                if result:
-                    return json.loads(result[1])
-            except Exception as e:
-                pass
-        return None
+            lane = self.lane_for(job_data)
+            await self.redis_client.rpush(
+                LANE_KEYS[lane], json.dumps({**job_data, "lane": lane, "enqueued_at": time.time()})
+            )
+
+    async def defer_job(self, job_data: Dict):
+        """
+        Hands a dequeued, unstarted job back to the far end of its lane (e.g.
+        its job type is at its concurrency limit) so other jobs are picked
+        first. Not an attempt: the payload, including enqueued_at, is unchanged.
+        """
+        job_id = str(job_data.get("job_id"))
+        raw = self._inflight.pop(job_id, None)
+        if not self.redis_client or raw is None:
+            return
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, raw)
+            pipe.zrem(LEASES_KEY, job_id)
+            pipe.hdel(INFLIGHT_KEY, job_id)
+            pipe.lpush(LANE_KEYS[self.lane_for(job_data)], raw)
+            await pipe.execute()
+
+    async def schedule_retry(self, job_data: Dict, delay_seconds: float):
+        """
+        Parks a job in the delayed queue until its backoff has elapsed.
+        """
+        if self.redis_client:
+            await self.redis_client.zadd(DELAYED_KEY, {json.dumps(job_data): time.time() + delay_seconds})
+        else:
+            logger.debug("Mock Retry: %s", str(job_data))
+
+    async def promote_due_retries(self, batch_size: int = 100) -> int:
+        """
+        Moves retries whose backoff has elapsed back onto the queue.
+        """
+        if not self.redis_client:
+            return 0
+        promoted = 0
+        due = await self.redis_client.zrangebyscore(DELAYED_KEY, 0, time.time(), start=0, num=batch_size)
+        for raw in due:
+            raw = _decode(raw)
+            if await self.redis_client.zrem(DELAYED_KEY, raw):
+                await self.enqueue_job(json.loads(raw))
+                promoted += 1
+        return promoted
+
+    async def dead_letter(self, job_data: Dict, error: str, reason: str):
+        """
+        Records a job that failed permanently so an admin can inspect or replay it.
+        """
+        if not self.redis_client:
+            return
+        job_id = str(job_data.get("job_id"))
+        entry = {
+            "job_data": job_data,
+            "error": error,
+            "reason": reason,
+            "attempts": int(job_data.get("attempt", 1)),
+            "failed_at": time.time(),
+        }
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(DEAD_LETTER_ENTRIES_KEY, job_id, json.dumps(entry))
+            pipe.zadd(DEAD_LETTER_KEY, {job_id: entry["failed_at"]})
+            await pipe.execute()
+
+    async def list_dead_letters(self, offset: int = 0, limit: int = 100) -> List[Dict]:
+        """
+        Dead-lettered jobs, most recent failure first.
+        """
+        if not self.redis_client:
+            return []
+        job_ids = await self.redis_client.zrevrange(DEAD_LETTER_KEY, offset, offset + limit - 1)
+        if not job_ids:
+            return []
+        entries = await self.redis_client.hmget(DEAD_LETTER_ENTRIES_KEY, job_ids)
+        return [json.loads(e) for e in entries if e]
+
+    async def get_dead_letter(self, job_id: str) -> Optional[Dict]:
+        """
+        A dead-letter entry without removing it; None if it does not exist.
+        """
+        if not self.redis_client:
+            return None
+        entry = await self.redis_client.hget(DEAD_LETTER_ENTRIES_KEY, str(job_id))
+        return json.loads(entry) if entry else None
+
+    async def pop_dead_letter(self, job_id: str) -> Optional[Dict]:
+        """
+        Removes and returns a dead-letter entry; None if it does not exist
+        (or another caller already took it).
+        """
+        if not self.redis_client:
+            return None
+        job_id = str(job_id)
+        entry = await self.redis_client.hget(DEAD_LETTER_ENTRIES_KEY, job_id)
+        if not entry or not await self.redis_client.zrem(DEAD_LETTER_KEY, job_id):
+            return None
+        await self.redis_client.hdel(DEAD_LETTER_ENTRIES_KEY, job_id)
+        return json.loads(entry)
 
 queue_service = AIJobQueueService()
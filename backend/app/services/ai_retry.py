@@ -0,0 +1,54 @@
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from typing import Dict
+
+class RetryableJobError(Exception):
+    """Raise from a job handler to force a retry (e.g. upstream throttling)."""
+
+class FatalJobError(Exception):
+    """Raise from a job handler to fail the job immediately without retrying."""
+
+# Throttling, timeouts and upstream 5xx are worth retrying; anything else
+# (bad input, missing rows, unknown job type) will fail the same way again.
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    base_delay_seconds: float
+    max_delay_seconds: float
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Exponential backoff with equal jitter for the given (1-based) failed attempt.
+        """
+        delay = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    "resume_analysis": RetryPolicy(max_attempts=5, base_delay_seconds=5, max_delay_seconds=300),
+    "application_scoring": RetryPolicy(max_attempts=6, base_delay_seconds=15, max_delay_seconds=900),
+    "job_matching": RetryPolicy(max_attempts=4, base_delay_seconds=5, max_delay_seconds=300),
+}
+DEFAULT_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay_seconds=5, max_delay_seconds=120)
+
+def get_retry_policy(job_type: str) -> RetryPolicy:
+    return RETRY_POLICIES.get(job_type, DEFAULT_RETRY_POLICY)
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, FatalJobError):
+        return False
+    if isinstance(exc, (RetryableJobError, asyncio.TimeoutError, TimeoutError, ConnectionError, json.JSONDecodeError)):
+        return True
+
+    # openai / groq errors carry status_code; google.api_core errors carry an HTTP code
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None and isinstance(getattr(exc, "code", None), int):
+        status_code = exc.code
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    # Transport-level failures (openai.APIConnectionError / APITimeoutError, httpx.TransportError)
+    return type(exc).__name__ in {"APIConnectionError", "APITimeoutError", "TransportError", "ConnectError", "ReadTimeout"}
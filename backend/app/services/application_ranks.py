@@ -0,0 +1,136 @@
+import bisect
+import logging
+import uuid
+from typing import Any, Dict, Iterable, List
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.application import Application
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "app_rank:"
+DIRTY_KEY = "app_rank:dirty"
+
+# Standard competition ranking ("1224") within each job, written only where it changed.
+_MATERIALIZE = text("""
+    UPDATE applications AS a
+    SET rank = r.rank, updated_at = now(), version = a.version + 1
+    FROM (
+        SELECT id, RANK() OVER (PARTITION BY job_id ORDER BY match_score DESC) AS rank
+        FROM applications
+        WHERE job_id = ANY(CAST(:job_ids AS uuid[])) AND match_score IS NOT NULL
+    ) AS r
+    WHERE a.id = r.id AND a.rank IS DISTINCT FROM r.rank
+    RETURNING a.id, a.user_id, a.status, a.processing_state, a.match_score, a.rank, a.last_error, a.version
+""")
+
+class ApplicationRankService:
+    """
+    Peer-relative application ranks per job.
+
+    Each job's scores live in a Redis sorted set (app_rank:<job_id>), so
+    recording a score is ZADD and an application's rank is 1 + ZCOUNT of
+    strictly higher scores, both O(log n). A newly scored application gets
+    its exact rank immediately. The peers it overtook are fixed in batches:
+    the job is marked dirty and materialize() rewrites applications.rank
+    for many jobs with one RANK() window UPDATE, so reads (GET
+    /applications) stay a plain column lookup. Postgres remains the source
+    of truth; a missing sorted set is rebuilt from it.
+    """
+    def _key(self, job_id: uuid.UUID) -> str:
+        return f"{KEY_PREFIX}{job_id}"
+
+    async def _ensure_loaded(self, client, db: AsyncSession, job_id: uuid.UUID):
+        key = self._key(job_id)
+        if await client.exists(key):
+            return
+        rows = (await db.execute(
+            select(Application.id, Application.match_score)
+            .where(Application.job_id == job_id, Application.match_score.is_not(None))
+        )).all()
+        if rows:
+            await client.zadd(key, {str(row.id): row.match_score for row in rows})
+
+    async def record(self, db: AsyncSession, job_id: uuid.UUID, scores: Dict[uuid.UUID, int]) -> Dict[uuid.UUID, int]:
+        """
+        Records new scores for applications of one job and returns their
+        ranks among all scored applicants. Call before writing the scores;
+        after the commit, mark_dirty() the job so its peers get re-ranked, or
+        invalidate() it if the transaction rolled back.
+        """
+        client = get_redis()
+        if not client:
+            return await self._ranks_from_db(db, job_id, scores)
+        try:
+            await self._ensure_loaded(client, db, job_id)
+            key = self._key(job_id)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zadd(key, {str(app_id): score for app_id, score in scores.items()})
+                for score in scores.values():
+                    pipe.zcount(key, f"({score}", "+inf")
+                results = await pipe.execute()
+            return {app_id: higher + 1 for app_id, higher in zip(scores, results[1:])}
+        except Exception as e:
+            logger.warning(f"Rank index unavailable for job {job_id}, using the database: {e}")
+            return await self._ranks_from_db(db, job_id, scores)
+
+    async def _ranks_from_db(self, db: AsyncSession, job_id: uuid.UUID, scores: Dict[uuid.UUID, int]) -> Dict[uuid.UUID, int]:
+        # Without Redis: rank against the committed peers (excluding the ones being scored)
+        others = (await db.execute(
+            select(Application.match_score)
+            .where(Application.job_id == job_id, Application.match_score.is_not(None))
+            .where(Application.id.not_in(list(scores)))
+        )).scalars().all()
+        pool = sorted(list(others) + list(scores.values()))
+        # rank = 1 + number of strictly higher scores
+        return {app_id: len(pool) - bisect.bisect_right(pool, score) + 1 for app_id, score in scores.items()}
+
+    async def invalidate(self, job_ids: Iterable[uuid.UUID]):
+        """
+        Drops the sorted sets (rebuilt from Postgres on next use), e.g. after
+        a rollback left scores in Redis that were never committed.
+        """
+        client = get_redis()
+        keys = [self._key(i) for i in job_ids]
+        if not client or not keys:
+            return
+        try:
+            await client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate rank index: {e}")
+
+    async def materialize(self, db: AsyncSession, job_ids: List[uuid.UUID]) -> List[Any]:
+        """
+        Rewrites applications.rank for these jobs with one window-function
+        UPDATE. Returns the changed rows; the caller commits.
+        """
+        if not job_ids:
+            return []
+        return (await db.execute(_MATERIALIZE, {"job_ids": job_ids})).all()
+
+    async def settle(self, db: AsyncSession, job_id: uuid.UUID) -> List[Any]:
+        """
+        Without Redis there is no batch materializer, so re-rank the job's
+        peers right away, in the caller's transaction.
+        """
+        if get_redis():
+            return []
+        await db.flush()
+        return await self.materialize(db, [job_id])
+
+    async def pop_dirty(self) -> List[uuid.UUID]:
+        client = get_redis()
+        if not client:
+            return []
+        members = await client.spop(DIRTY_KEY, settings.APPLICATION_RANK_BATCH_JOBS)
+        return [uuid.UUID(m.decode() if isinstance(m, bytes) else m) for m in members or []]
+
+    async def mark_dirty(self, job_ids: Iterable[uuid.UUID]):
+        client = get_redis()
+        ids = [str(i) for i in job_ids]
+        if client and ids:
+            await client.sadd(DIRTY_KEY, *ids)
+
+application_rank_service = ApplicationRankService()
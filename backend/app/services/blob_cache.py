@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "blob_cache_stats"
+
+class BlobCache:
+    """
+    Bounded on-disk LRU of downloaded storage objects for the worker, so a
+    resume fetched for analysis is not downloaded again for matching, scoring
+    or retries.
+
+    Entries are keyed by content hash when known (content-addressed, shared by
+    every upload of the same file), else by bucket path. Files are written to
+    a temp name and renamed, so a crash never leaves a truncated entry. The
+    LRU index lives in memory and is rebuilt from file mtimes on start.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # name -> size, oldest first
+        self._size = 0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def key_for(bucket_path: str, content_hash: Optional[str] = None) -> str:
+        if content_hash:
+            return f"sha256-{content_hash}"
+        return f"path-{hashlib.sha256(bucket_path.encode()).hexdigest()}"
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):
+                # Leftover from an interrupted write
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._size += size
+
+    async def _ensure_loaded(self):
+        if not self._loaded:
+            await asyncio.to_thread(self._scan)
+            self._loaded = True
+
+    def _read(self, name: str) -> Optional[bytes]:
+        path = self._path(name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # survives restarts as the LRU order
+            return data
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name: str, data: bytes):
+        path = self._path(name)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove(self, names):
+        for name in names:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    async def _record(self, hit: bool, size: int = 0):
+        client = get_redis()
+        if not client:
+            return
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hincrby(STATS_KEY, "hits" if hit else "misses", 1)
+                if hit:
+                    pipe.hincrby(STATS_KEY, "bytes_saved", size)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Blob cache stats update failed: %s", e)
+
+    async def get(self, name: str) -> Optional[bytes]:
+        async with self._lock:
+            await self._ensure_loaded()
+            if name not in self._index:
+                return None
+            self._index.move_to_end(name)
+        data = await asyncio.to_thread(self._read, name)
+        if data is None:
+            # Removed behind our back (e.g. by hand); forget it
+            async with self._lock:
+                self._size -= self._index.pop(name, 0)
+        return data
+
+    async def put(self, name: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        await asyncio.to_thread(self._write, name, data)
+        async with self._lock:
+            await self._ensure_loaded()
+            self._size += len(data) - self._index.pop(name, 0)
+            self._index[name] = len(data)
+            evicted = []
+            while self._size > self.max_bytes and self._index:
+                old, size = self._index.popitem(last=False)
+                self._size -= size
+                evicted.append(old)
+        if evicted:
+            await asyncio.to_thread(self._remove, evicted)
+
+    async def fetch(
+        self,
+        bucket_path: str,
+        download: Callable[[], Awaitable[bytes]],
+        content_hash: Optional[str] = None,
+    ) -> bytes:
+        """
+        Cached bytes for this object, calling download() only on a miss.
+        """
+        if not self.enabled:
+            return await download()
+        name = self.key_for(bucket_path, content_hash)
+        try:
+            data = await self.get(name)
+        except Exception as e:
+            logger.warning("Blob cache read failed: %s", e)
+            data = None
+        if data is not None:
+            await self._record(True, len(data))
+            return data
+
+        await self._record(False)
+        data = await download()
+        try:
+            await self.put(name, data)
+        except Exception as e:
+            logger.warning("Blob cache write failed: %s", e)
+        return data
+
+    async def stats(self) -> Dict[str, Any]:
+        """
+        Hits, misses and bytes saved across all workers.
+        """
+        client = get_redis()
+        if not client:
+            return {}
+        raw = await client.hgetall(STATS_KEY)
+        stats = {"hits": 0, "misses": 0, "bytes_saved": 0}
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            stats[field] = int(value)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+blob_cache = BlobCache(
+    directory=settings.BLOB_CACHE_DIR,
+    max_bytes=settings.BLOB_CACHE_MAX_MB * 1024 * 1024,
+)
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import logging
+import zlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.services.extraction_pool import extraction_pool
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "doc_text"
+# Bump when TextExtractor's output changes so stale text stops matching.
+EXTRACTOR_VERSION = "v2"
+
+class DocumentTextService:
+    """
+    The single entry point for resume/document text. Text is extracted once
+    per distinct file content (sha256, i.e. UploadedFile.content_hash) and
+    shared by every endpoint, the worker and all users through Redis, with a
+    small per-process LRU in front and single-flight for concurrent misses.
+
+    Extraction stops at the caller's character budget, so a cached entry may
+    be a prefix; it serves any budget it covers and is replaced by a longer
+    extraction when a caller needs more.
+    """
+    def __init__(self):
+        self.ttl = settings.DOCUMENT_TEXT_TTL_SECONDS
+        self.max_local_entries = settings.DOCUMENT_TEXT_LOCAL_MAX_ENTRIES
+        self._local: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    def _key(self, content_hash: str) -> str:
+        return f"{KEY_PREFIX}:{EXTRACTOR_VERSION}:{content_hash}"
+
+    def _remember(self, content_hash: str, text: str, complete: bool):
+        self._local[content_hash] = (text, complete)
+        self._local.move_to_end(content_hash)
+        while len(self._local) > self.max_local_entries:
+            self._local.popitem(last=False)
+
+    async def _cached(self, content_hash: str) -> Optional[Tuple[str, bool]]:
+        if content_hash in self._local:
+            self._local.move_to_end(content_hash)
+            return self._local[content_hash]
+        client = get_redis()
+        if client:
+            try:
+                raw = await client.get(self._key(content_hash))
+                if raw is not None:
+                    # First byte: 1 if the whole document was extracted
+                    complete = raw[:1] == b"1"
+                    text = zlib.decompress(raw[1:]).decode()
+                    self._remember(content_hash, text, complete)
+                    return text, complete
+            except Exception as e:
+                logger.warning(f"Document text cache read failed: {e}")
+        return None
+
+    async def _store(self, content_hash: str, text: str, complete: bool):
+        cached = self._local.get(content_hash)
+        if cached is not None and (cached[1] or len(cached[0]) >= len(text)):
+            return  # never replace a longer extraction with a shorter one
+        self._remember(content_hash, text, complete)
+        client = get_redis()
+        if client:
+            try:
+                value = (b"1" if complete else b"0") + zlib.compress(text.encode())
+                await client.set(self._key(content_hash), value, ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Document text cache write failed: {e}")
+
+    async def get_text(
+        self,
+        content_hash: str,
+        filename: str,
+        load_bytes: Callable[[], Awaitable[bytes]],
+        max_chars: Optional[int] = None,
+    ) -> str:
+        """
+        Cached text for this content, at most max_chars long. load_bytes
+        (e.g. a storage download) is only awaited on a miss.
+        """
+        max_chars = max_chars or settings.EXTRACTION_MAX_CHARS
+        cached = await self._cached(content_hash)
+        if cached is not None and (cached[1] or len(cached[0]) >= max_chars):
+            return cached[0][:max_chars]
+
+        flight = (content_hash, max_chars)
+        pending = self._pending.get(flight)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[flight] = future
+        try:
+            result = await extraction_pool.extract(await load_bytes(), filename, max_chars)
+            await self._store(content_hash, result.text, result.complete)
+            future.set_result(result.text)
+            return result.text
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._pending.pop(flight, None)
+
+    async def get_text_for_bytes(
+        self,
+        file_bytes: bytes,
+        filename: str,
+        content_hash: Optional[str] = None,
+        max_chars: Optional[int] = None,
+    ) -> str:
+        content_hash = content_hash or hashlib.sha256(file_bytes).hexdigest()
+
+        async def load() -> bytes:
+            return file_bytes
+
+        return await self.get_text(content_hash, filename, load, max_chars)
+
+document_text_service = DocumentTextService()
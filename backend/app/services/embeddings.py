@@ -0,0 +1,79 @@
+import hashlib
+import logging
+import math
+import re
+from typing import List, Sequence
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+class HashingEmbedder:
+    """
+    Deterministic, dependency-free embeddings: unigrams and bigrams are hashed
+    into `dim` signed buckets with sublinear tf, then L2-normalized. No model
+    download, so it is the default and what tests use.
+    """
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.model_id = f"hashing-{dim}"
+
+    def _bucket(self, feature: str):
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        return h % self.dim, 1.0 if (h >> 63) & 1 else -1.0
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_RE.findall(text.lower())
+        counts = {}
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            counts[feature] = counts.get(feature, 0) + 1
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in counts.items():
+            index, sign = self._bucket(feature)
+            vector[index] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._embed_one(t) for t in texts])
+
+class SentenceTransformerEmbedder:
+    """
+    Local CPU model via sentence-transformers (optional dependency).
+    """
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.model_id = f"st-{model_name.replace('/', '_')}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=32, normalize_embeddings=True, show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+_embedder = None
+
+def get_embedder():
+    """
+    Per-process embedder chosen by EMBEDDING_BACKEND ("hashing" or
+    "sentence-transformers"); falls back to hashing if the model cannot load.
+    """
+    global _embedder
+    if _embedder is None:
+        if settings.EMBEDDING_BACKEND == "sentence-transformers":
+            try:
+                _embedder = SentenceTransformerEmbedder(settings.EMBEDDING_MODEL)
+            except Exception as e:
+                logger.warning(f"Embedding model unavailable ({e}); using hashing embeddings")
+        if _embedder is None:
+            _embedder = HashingEmbedder(settings.EMBEDDING_DIM)
+    return _embedder
+
+def job_text(title: str, description: str, skills: List[str]) -> str:
+    return f"{title}. {title}. Skills: {', '.join(skills or [])}. {description}"
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from app.core.config import settings
+from app.services.text_extractor import ExtractionResult
+
+logger = logging.getLogger(__name__)
+
+class ExtractionError(ValueError):
+    """Text extraction failed, timed out or exceeded its memory limit."""
+
+def _init_worker(memory_limit_mb: int):
+    # Cap the address space so a decompression bomb raises MemoryError in the
+    # child instead of taking the host down. Not available on Windows.
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning(f"Extraction worker: memory limit not applied: {e}")
+    # Import the parsers once per worker, not per file
+    from app.services import text_extractor  # noqa: F401
+
+def _warm():
+    return True
+
+def _run_extraction(file_bytes: bytes, filename: str, max_chars: int, page_start: int, page_stop: Optional[int]):
+    from app.services.text_extractor import text_extractor
+    return text_extractor.extract(file_bytes, filename, max_chars, page_start, page_stop)
+
+class ExtractionPool:
+    """
+    Runs CPU-bound PDF/DOCX parsing in a bounded pool of warm worker processes
+    so it never blocks the event loop or holds the GIL of the API/worker process.
+
+    At most `max_workers` tasks are submitted at once, so the per-task timeout
+    measures parsing time, not queueing. A file that exceeds it leaves its
+    worker stuck in C code, so the pool is recycled; other files caught in the
+    recycle are retried once.
+    """
+    def __init__(self, max_workers: int, timeout: float, memory_limit_mb: int, max_tasks_per_child: int, pages_per_task: int, max_pages: int):
+        self.max_workers = max(1, max_workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+                max_tasks_per_child=self.max_tasks_per_child or None,
+            )
+        return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        if self._executor is not executor:
+            return  # already replaced by a concurrent caller
+        self._executor = None
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def warm_up(self):
+        """
+        Starts every worker process ahead of the first upload.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*[loop.run_in_executor(executor, _warm) for _ in range(self.max_workers)])
+        logger.info(f"Extraction pool ready ({self.max_workers} workers)")
+
+    async def _run(self, file_bytes: bytes, filename: str, max_chars: int, page_start: int, page_stop: Optional[int]) -> ExtractionResult:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            for attempt in (1, 2):
+                executor = self._get_executor()
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(executor, _run_extraction, file_bytes, filename, max_chars, page_start, page_stop),
+                        self.timeout,
+                    )
+                except asyncio.TimeoutError:
+                    logger.error(f"Extraction of {filename} timed out; recycling extraction pool")
+                    self._recycle(executor)
+                    raise ExtractionError("Text extraction timed out")
+                except MemoryError:
+                    raise ExtractionError("Text extraction exceeded its memory limit")
+                except BrokenProcessPool:
+                    self._recycle(executor)
+                    if attempt == 2:
+                        raise ExtractionError("Text extraction worker crashed")
+                    logger.warning(f"Extraction pool broke while parsing {filename}; retrying once")
+
+    async def extract(self, file_bytes: bytes, filename: str, max_chars: Optional[int] = None) -> ExtractionResult:
+        """
+        Extracts up to max_chars. The first pages are parsed in one task, which
+        is all a normal resume needs; if the budget is not met yet, the remaining
+        pages (up to EXTRACTION_MAX_PAGES) are parsed in parallel chunks.
+        """
+        max_chars = max_chars or settings.EXTRACTION_MAX_CHARS
+        chunk = self.pages_per_task
+        if not filename.lower().endswith(".pdf"):
+            return await self._run(file_bytes, filename, max_chars, 0, None)
+
+        first = await self._run(file_bytes, filename, max_chars, 0, chunk)
+        if len(first.text) >= max_chars or first.page_count <= chunk:
+            return first
+
+        stop = min(first.page_count, self.max_pages)
+        remaining = max_chars - len(first.text)
+        rest = await asyncio.gather(*[
+            self._run(file_bytes, filename, remaining, start, min(start + chunk, stop))
+            for start in range(chunk, stop, chunk)
+        ])
+        text = " ".join(part.text for part in [first, *rest] if part.text)
+        complete = len(text) <= max_chars and stop == first.page_count and all(part.complete for part in rest)
+        return ExtractionResult(text[:max_chars], complete=complete, page_count=first.page_count)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+extraction_pool = ExtractionPool(
+    max_workers=settings.EXTRACTION_POOL_WORKERS,
+    timeout=settings.EXTRACTION_TIMEOUT_SECONDS,
+    memory_limit_mb=settings.EXTRACTION_MEMORY_LIMIT_MB,
+    max_tasks_per_child=settings.EXTRACTION_MAX_TASKS_PER_CHILD,
+    pages_per_task=settings.EXTRACTION_PAGES_PER_TASK,
+    max_pages=settings.EXTRACTION_MAX_PAGES,
+)
@@ -0,0 +1,54 @@
+import logging
+from typing import IO
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.file import UploadedFile
+from app.services.storage import storage_service
+
+logger = logging.getLogger(__name__)
+
+class FileBlobService:
+    """
+    Reference counting for content-addressed blobs. A blob's references are
+    the UploadedFile rows pointing at its bucket_path, so there is no separate
+    counter to drift. Attaching and releasing a blob both take a transaction
+    advisory lock on its path, so a last-reference delete can never remove a
+    blob that a concurrent upload has just decided to reuse.
+    """
+    async def _lock(self, db: AsyncSession, bucket_path: str):
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(bucket_path))))
+
+    async def attach(self, db: AsyncSession, content_hash: str, source: IO[bytes], content_type: str) -> str:
+        """
+        Ensures the blob for this content exists (streaming it from source if
+        not) and returns its bucket_path.
+        The lock is held until the caller commits the new UploadedFile row.
+        """
+        bucket_path = storage_service.blob_path(content_hash)
+        await self._lock(db, bucket_path)
+        result = await storage_service.put_blob(content_hash, source, content_type)
+        if not result["uploaded"]:
+            logger.info(f"Reusing stored blob {bucket_path}")
+        return result["bucket_path"]
+
+    async def release(self, db: AsyncSession, file: UploadedFile) -> bool:
+        """
+        Deletes the row and, if it was the last reference, the blob. The blob
+        is removed before the commit, while the lock is still held.
+        Returns True if the blob was deleted.
+        """
+        await self._lock(db, file.bucket_path)
+        await db.delete(file)
+        await db.flush()
+        remaining = (await db.execute(
+            select(func.count()).select_from(UploadedFile).where(UploadedFile.bucket_path == file.bucket_path)
+        )).scalar_one()
+        if remaining:
+            return False
+        success = await storage_service.delete_file(file.bucket_path)
+        if not success:
+            # Proceed to delete the DB record anyway to avoid orphans
+            logger.warning(f"Failed to delete blob from storage: {file.bucket_path}")
+        return success
+
+file_blob_service = FileBlobService()
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "job_events"
+STATE_KEY_PREFIX = "job_state:"
+
+KIND_AI_JOB = "ai_job"
+KIND_APPLICATION = "application"
+
+# Store the latest state and publish it, unless a newer (or the same) version
+# was already recorded: keeps the snapshot monotonic when publishers race.
+# KEYS: state key. ARGV: payload, version, ttl, channel.
+_PUBLISH_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local recorded = cjson.decode(current)['version']
+    if recorded and tonumber(recorded) >= tonumber(ARGV[2]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+redis.call('PUBLISH', ARGV[4], ARGV[1])
+return 1
+"""
+
+def _value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+def ai_job_event(job: Any) -> Dict[str, Any]:
+    """
+    Event for an AIJob (or a RETURNING row with the same columns).
+    """
+    return {
+        "kind": KIND_AI_JOB,
+        "id": str(job.id),
+        "user_id": str(job.user_id),
+        "status": _value(job.status),
+        "version": job.version,
+        "error": job.error,
+        "at": time.time(),
+    }
+
+def application_event(application: Any) -> Dict[str, Any]:
+    return {
+        "kind": KIND_APPLICATION,
+        "id": str(application.id),
+        "user_id": str(application.user_id),
+        "status": application.status,
+        "processing_state": application.processing_state,
+        "match_score": application.match_score,
+        "rank": application.rank,
+        "last_error": application.last_error,
+        "version": application.version,
+        "at": time.time(),
+    }
+
+class JobEventService:
+    """
+    Publishes AI job / application state transitions over Redis pub/sub and
+    fans them out to the clients connected to this process.
+
+    Each API process holds a single subscription to CHANNEL and dispatches
+    events to per-user in-memory queues, so live clients cost no Redis or
+    database connections. The latest state of every entity is also kept
+    under job_state:<kind>:<id> so a long-poll can answer without Postgres.
+    """
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> bool:
+        return get_redis() is not None
+
+    async def publish(self, event: Dict[str, Any]):
+        client = get_redis()
+        if not client:
+            return
+        try:
+            await client.eval(
+                _PUBLISH_SCRIPT, 1,
+                f"{STATE_KEY_PREFIX}{event['kind']}:{event['id']}",
+                json.dumps(event, default=str), event["version"], settings.JOB_EVENTS_STATE_TTL_SECONDS, CHANNEL
+            )
+        except Exception as e:
+            # Clients fall back to polling; never fail the transition itself.
+            logger.warning(f"Failed to publish {event['kind']} event for {event['id']}: {e}")
+
+    async def publish_many(self, events: List[Dict[str, Any]]):
+        for event in events:
+            await self.publish(event)
+
+    async def get_state(self, kind: str, entity_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        client = get_redis()
+        if not client:
+            return None
+        try:
+            raw = await client.get(f"{STATE_KEY_PREFIX}{kind}:{entity_id}")
+        except Exception as e:
+            logger.warning(f"Failed to read {kind} state for {entity_id}: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def remember_state(self, event: Dict[str, Any]):
+        """
+        Seeds the snapshot (e.g. after a DB fallback read) without notifying anyone.
+        """
+        client = get_redis()
+        if not client:
+            return
+        try:
+            await client.set(
+                f"{STATE_KEY_PREFIX}{event['kind']}:{event['id']}",
+                json.dumps(event, default=str),
+                ex=settings.JOB_EVENTS_STATE_TTL_SECONDS,
+                nx=True
+            )
+        except Exception:
+            pass
+
+    async def _listen(self):
+        while True:
+            client = get_redis()
+            if not client:
+                return
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    for queue in list(self._subscribers.get(event.get("user_id"), ())):
+                        if queue.full():
+                            queue.get_nowait()  # slow consumer: drop the oldest event
+                        queue.put_nowait(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job event listener disconnected: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: uuid.UUID):
+        """
+        Yields a queue receiving every event for this user's jobs and applications.
+        """
+        if self.available and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.JOB_EVENTS_QUEUE_SIZE)
+        key = str(user_id)
+        self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    self._subscribers.pop(key, None)
+
+    async def _next_event(
+        self,
+        queue: asyncio.Queue,
+        kind: str,
+        entity_id: uuid.UUID,
+        since_version: int,
+        timeout: float,
+    ) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                event = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            if event["kind"] == kind and event["id"] == str(entity_id) and event["version"] > since_version:
+                return event
+
+    async def wait(
+        self,
+        kind: str,
+        entity_id: uuid.UUID,
+        user_id: uuid.UUID,
+        since_version: int,
+        timeout: float,
+        load_state: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll: returns the entity's state as soon as its version exceeds
+        since_version, or its unchanged state once timeout expires (`changed`
+        tells which). load_state is only called when no snapshot is cached.
+        Returns None if the entity does not exist; the caller checks ownership.
+        """
+        # Subscribe before reading the snapshot so a transition in between is not missed
+        async with self.subscribe(user_id) as queue:
+            state = await self.get_state(kind, entity_id)
+            if state is None:
+                state = await load_state()
+                if state is None:
+                    return None
+                await self.remember_state(state)
+            if state["user_id"] != str(user_id) or state["version"] > since_version or not self.available:
+                return {**state, "changed": state["version"] > since_version}
+            event = await self._next_event(queue, kind, entity_id, since_version, timeout)
+            if event is None:
+                # Re-read in case the change landed before this process' listener was subscribed
+                event = await self.get_state(kind, entity_id) or state
+            return {**event, "changed": event["version"] > since_version}
+
+    async def stream(self, user_id: uuid.UUID, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+        """
+        Server-Sent Events with every state change of the user's AI jobs
+        (`ai_job` events) and applications (`application` events).
+        """
+        async with self.subscribe(user_id) as queue:
+            yield ": connected\n\n"
+            while not await is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.JOB_EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield (
+                    f"id: {event['kind']}:{event['id']}:{event['version']}\n"
+                    f"event: {event['kind']}\n"
+                    f"data: {json.dumps(event, default=str)}\n\n"
+                )
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+job_event_service = JobEventService()
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.job import Job
+from app.services.skills_index import canonical_skill, mentioned_skills
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or our the to we will with you your".split()
+)
+
+# Field weights: a term in the title or skills says more than one in the description
+TITLE_WEIGHT = 2
+SKILLS_WEIGHT = 3
+
+def tokenize(text: str) -> List[str]:
+    return [t.rstrip(".") for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+@dataclass
+class _Snapshot:
+    job_ids: List[uuid.UUID]
+    vocabulary: Dict[str, int]
+    weights: sparse.csr_matrix  # docs x terms, BM25 term weights
+    skill_vocabulary: Dict[str, int]
+    skills: sparse.csr_matrix   # docs x skills, binary
+    skill_counts: np.ndarray
+    signature: Tuple[int, Any]
+
+def _build(rows: Sequence[Tuple[uuid.UUID, str, str, List[str]]], signature: Tuple[int, Any], k1: float, b: float) -> _Snapshot:
+    vocabulary: Dict[str, int] = {}
+    skill_vocabulary: Dict[str, int] = {}
+    t_rows, t_cols, s_rows, s_cols = [], [], [], []
+    for doc, (_, title, description, skills) in enumerate(rows):
+        tokens = tokenize(title) * TITLE_WEIGHT + tokenize(description)
+        for skill in skills or []:
+            tokens += tokenize(skill) * SKILLS_WEIGHT
+            name = canonical_skill(skill)
+            if name:
+                s_rows.append(doc)
+                s_cols.append(skill_vocabulary.setdefault(name, len(skill_vocabulary)))
+        t_rows.extend([doc] * len(tokens))
+        t_cols.extend(vocabulary.setdefault(t, len(vocabulary)) for t in tokens)
+
+    n_docs = len(rows)
+    # Duplicate (doc, term) entries are summed into term frequencies
+    tf = sparse.csr_matrix(
+        (np.ones(len(t_rows), dtype=np.float32), (t_rows, t_cols)),
+        shape=(n_docs, len(vocabulary)),
+    )
+    tf.sum_duplicates()
+    doc_len = np.asarray(tf.sum(axis=1)).ravel()
+    avg_len = doc_len.mean() if n_docs else 0.0
+    df = np.bincount(tf.indices, minlength=len(vocabulary))
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    # Precompute the BM25 weight of every (doc, term) so a query is one sparse product
+    weights = tf.copy()
+    length_norm = k1 * (1 - b + b * doc_len / max(avg_len, 1e-9))
+    row_of = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+    weights.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + length_norm[row_of])
+
+    skills = sparse.csr_matrix(
+        (np.ones(len(s_rows), dtype=np.float32), (s_rows, s_cols)),
+        shape=(n_docs, len(skill_vocabulary)),
+    )
+    skills.sum_duplicates()
+    skills.data[:] = 1.0  # a skill listed twice still counts once
+    return _Snapshot(
+        job_ids=[row[0] for row in rows],
+        vocabulary=vocabulary,
+        weights=weights,
+        skill_vocabulary=skill_vocabulary,
+        skills=skills,
+        skill_counts=np.asarray(skills.sum(axis=1)).ravel(),
+        signature=signature,
+    )
+
+class JobIndex:
+    """
+    In-process candidate retrieval over Job title, description and skills,
+    so the LLM only re-ranks a short relevant list instead of arbitrary rows.
+
+    Score = BM25 (max-normalized) blended with skill overlap: the share of a
+    job's listed skills that appear in the resume, compared as canonical
+    skills (aliases such as "JS"/"JavaScript" resolved). BM25 weights are
+    precomputed into a sparse docs x terms matrix, so a query is a single
+    sparse matrix-vector product. The index is rebuilt in a thread when the
+    jobs table's row count or latest updated_at changes, checked at most
+    every JOB_INDEX_REFRESH_SECONDS.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75, skill_weight: float = 0.35):
+        self.k1 = k1
+        self.b = b
+        self.skill_weight = skill_weight
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _signature(self, db: AsyncSession) -> Tuple[int, Any]:
+        row = (await db.execute(select(func.count(Job.id), func.max(Job.updated_at)))).one()
+        return int(row[0]), row[1]
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        async with self._lock:
+            if not force and self._snapshot is not None and time.monotonic() - self._checked_at < settings.JOB_INDEX_REFRESH_SECONDS:
+                return
+            signature = await self._signature(db)
+            self._checked_at = time.monotonic()
+            if not force and self._snapshot is not None and self._snapshot.signature == signature:
+                return
+            rows = (await db.execute(select(Job.id, Job.title, Job.description, Job.skills))).all()
+            started = time.perf_counter()
+            self._snapshot = await asyncio.to_thread(_build, [tuple(r) for r in rows], signature, self.k1, self.b)
+            logger.info(f"Job index built: {len(rows)} jobs in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def _score(self, snapshot: _Snapshot, text: str, k: int) -> List[Tuple[uuid.UUID, float]]:
+        n_docs = len(snapshot.job_ids)
+        if not n_docs:
+            return []
+        tokens = tokenize(text)
+        term_ids = [snapshot.vocabulary[t] for t in set(tokens) if t in snapshot.vocabulary]
+        query = np.zeros(len(snapshot.vocabulary), dtype=np.float32)
+        query[term_ids] = 1.0
+        bm25 = snapshot.weights @ query
+        top = bm25.max()
+        if top > 0:
+            bm25 = bm25 / top
+
+        # Skills are matched as aliased phrases over the raw words, stopwords included
+        skill_ids = [snapshot.skill_vocabulary[s] for s in mentioned_skills(text, snapshot.skill_vocabulary)]
+        skill_query = np.zeros(len(snapshot.skill_vocabulary), dtype=np.float32)
+        skill_query[skill_ids] = 1.0
+        overlap = (snapshot.skills @ skill_query) / np.maximum(snapshot.skill_counts, 1.0)
+
+        scores = (1 - self.skill_weight) * bm25 + self.skill_weight * overlap
+        k = min(k, n_docs)
+        top_k = np.argpartition(-scores, k - 1)[:k]
+        top_k = top_k[np.argsort(-scores[top_k])]
+        return [(snapshot.job_ids[i], float(scores[i])) for i in top_k if scores[i] > 0]
+
+    async def search(self, db: AsyncSession, text: str, k: int) -> List[Tuple[uuid.UUID, float]]:
+        """
+        Top-k (job_id, score) for the text, best first. Jobs scoring 0 are dropped.
+        """
+        await self.refresh(db)
+        return self._score(self._snapshot, text, k)
+
+job_index = JobIndex()
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select, update, func
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.job import Job
+from app.services.embeddings import get_embedder, job_text
+
+logger = logging.getLogger(__name__)
+
+class JobVectorIndex:
+    """
+    Dense-embedding index of jobs for semantic (cosine) top-k search.
+
+    Each job's float32 embedding is computed once, when the job is inserted
+    (embed_jobs), and stored on the row with the model that produced it;
+    rows from before that, or from another model, are backfilled by the AI
+    worker (backfill()), never inside a request. Each process keeps the
+    vectors as one normalized n x dim matrix saved to EMBEDDING_INDEX_DIR
+    and memory-mapped, so a restart with an unchanged jobs table reads no
+    embeddings from Postgres and a query is a single matrix-vector product.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._ids: List[uuid.UUID] = []
+        self._row: Dict[uuid.UUID, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._signature: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _paths(self, model_id: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, model_id)
+        return f"{base}.npy", f"{base}.json"
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        embedder = get_embedder()
+        return await asyncio.to_thread(embedder.embed, texts)
+
+    async def embed_jobs(self, jobs: Iterable[Job]):
+        """
+        Sets embedding/embedding_model on new or changed jobs before they are committed.
+        """
+        jobs = list(jobs)
+        vectors = await self.embed_texts([job_text(j.title, j.description, j.skills) for j in jobs])
+        model_id = get_embedder().model_id
+        for job, vector in zip(jobs, vectors):
+            job.embedding = vector.astype(np.float32).tobytes()
+            job.embedding_model = model_id
+
+    async def _backfill(self, db, model_id: str) -> int:
+        stale_jobs = (
+            select(Job.id, Job.title, Job.description, Job.skills)
+            .where((Job.embedding_model.is_(None)) | (Job.embedding_model != model_id))
+            .limit(settings.EMBEDDING_BACKFILL_BATCH)
+        )
+        stale = (await db.execute(stale_jobs)).all()
+        total = 0
+        while stale:
+            vectors = await self.embed_texts([job_text(r.title, r.description, r.skills) for r in stale])
+            # One executemany UPDATE by primary key for the whole batch
+            await db.execute(update(Job), [
+                {"id": row.id, "embedding": vector.astype(np.float32).tobytes(), "embedding_model": model_id}
+                for row, vector in zip(stale, vectors)
+            ])
+            await db.commit()
+            logger.info(f"Backfilled {len(stale)} job embeddings ({model_id})")
+            total += len(stale)
+            stale = (await db.execute(stale_jobs)).all()
+        return total
+
+    async def backfill(self) -> int:
+        """
+        Embeds jobs stored without an embedding from the current model.
+        Returns how many were embedded.
+        """
+        async with AsyncSessionLocal() as db:
+            total = await self._backfill(db, get_embedder().model_id)
+        if total:
+            self.invalidate()
+        return total
+
+    def _save(self, model_id: str, ids: List[uuid.UUID], matrix: np.ndarray, signature: str):
+        os.makedirs(self.directory, exist_ok=True)
+        npy_path, meta_path = self._paths(model_id)
+        for path, write in (
+            (npy_path, lambda f: np.save(f, matrix)),
+            (meta_path, lambda f: f.write(json.dumps({"signature": signature, "ids": [str(i) for i in ids]}).encode())),
+        ):
+            tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+
+    def _load(self, model_id: str, signature: str) -> Optional[Tuple[List[uuid.UUID], np.ndarray]]:
+        npy_path, meta_path = self._paths(model_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["signature"] != signature:
+                return None
+            return [uuid.UUID(i) for i in meta["ids"]], np.load(npy_path, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _use(self, ids: List[uuid.UUID], matrix: np.ndarray, signature: str):
+        self._ids = ids
+        self._row = {job_id: i for i, job_id in enumerate(ids)}
+        self._matrix = matrix
+        self._signature = signature
+
+    async def refresh(self, force: bool = False):
+        async with self._lock:
+            if not force and self._matrix is not None and time.monotonic() - self._checked_at < settings.JOB_INDEX_REFRESH_SECONDS:
+                return
+            model_id = get_embedder().model_id
+            async with AsyncSessionLocal() as db:
+                count, latest = (await db.execute(select(func.count(Job.id), func.max(Job.updated_at)))).one()
+                signature = f"{count}|{latest}"
+                self._checked_at = time.monotonic()
+                if not force and signature == self._signature:
+                    return
+                persisted = await asyncio.to_thread(self._load, model_id, signature)
+                if persisted is not None:
+                    self._use(*persisted, signature)
+                    return
+                rows = (await db.execute(select(Job.id, Job.embedding).where(Job.embedding_model == model_id))).all()
+
+            dim = get_embedder().dim
+            ids = [row.id for row in rows]
+            matrix = (
+                np.frombuffer(b"".join(row.embedding for row in rows), dtype=np.float32).reshape(len(rows), dim)
+                if rows else np.zeros((0, dim), dtype=np.float32)
+            )
+            await asyncio.to_thread(self._save, model_id, ids, matrix, signature)
+            persisted = await asyncio.to_thread(self._load, model_id, signature)
+            self._use(*(persisted or (ids, matrix)), signature)
+            logger.info(f"Job vector index ready: {len(ids)} jobs ({model_id})")
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def _top_k(self, query: np.ndarray, k: int, exclude: Optional[uuid.UUID] = None) -> List[Tuple[uuid.UUID, float]]:
+        if self._matrix is None or not len(self._ids):
+            return []
+        scores = np.asarray(self._matrix @ query, dtype=np.float32)
+        if exclude is not None and exclude in self._row:
+            scores[self._row[exclude]] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    async def search_text(self, text: str, k: int) -> List[Tuple[uuid.UUID, float]]:
+        """
+        Top-k (job_id, cosine similarity) for free text such as a resume.
+        """
+        await self.refresh()
+        query = (await self.embed_texts([text]))[0]
+        return self._top_k(query, k)
+
+    async def similar_jobs(self, job_id: uuid.UUID, k: int) -> List[Tuple[uuid.UUID, float]]:
+        await self.refresh()
+        if job_id not in self._row:
+            return []
+        return self._top_k(np.asarray(self._matrix[self._row[job_id]]), k, exclude=job_id)
+
+job_vector_index = JobVectorIndex(directory=settings.EMBEDDING_INDEX_DIR)
@@ -9,3 +9,7 @@ class LLMProvider(ABC):
     @abstractmethod
     async def match_jobs(self, resume_text: str, jobs_data: List[Dict]) -> List[Dict]:
         pass
+
+    @abstractmethod
+    async def score_candidates(self, job_description: str, candidates: List[Dict]) -> List[Dict]:
+        pass
@@ -0,0 +1,222 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm_cache"
+STATS_KEY = "llm_cache_stats"
+# invalidate() broadcasts the dropped key prefix so every process clears its local tier
+INVALIDATE_CHANNEL = "llm_cache_invalidate"
+
+# Bump a version whenever its prompt template changes: the old entries stop
+# matching immediately and can be dropped with invalidate().
+PROMPT_VERSIONS = {
+    "analyze_resume": "v1",
+    "match_jobs": "v2",
+    "analyze_job_description": "v1",
+    "score_candidates": "v1",
+}
+
+# Count a hit on the entry itself without recreating an entry that already expired
+_INCR_ENTRY_HITS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('HINCRBY', KEYS[1], 'hits', 1)
+end
+return 0
+"""
+
+def _normalize(text: Any) -> str:
+    return " ".join(str(text).split())
+
+class LLMResultCache:
+    """
+    Two-tier cache for LLM results: a per-process LRU in front of Redis.
+    Entries are keyed on the operation, prompt version, model, temperature and
+    the whitespace-normalized prompt inputs. Each Redis entry remembers the
+    tokens it cost, so every hit can be credited as tokens saved.
+    invalidate() is broadcast on the llm_cache_invalidate Redis channel, so
+    other API/worker processes drop the entries from their local tier too.
+    """
+    def __init__(self):
+        self.enabled = settings.LLM_CACHE_ENABLED
+        self.ttl = settings.LLM_CACHE_TTL_SECONDS
+        self.max_local_entries = settings.LLM_CACHE_LOCAL_MAX_ENTRIES
+        # key -> (expires_at, value, tokens)
+        self._local: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+
+    def make_key(self, operation: str, model: str, temperature: float, *inputs: Any) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{model}|{temperature}".encode())
+        for value in inputs:
+            digest.update(b"\x1f")
+            digest.update(_normalize(value).encode())
+        return f"{KEY_PREFIX}:{operation}:{PROMPT_VERSIONS.get(operation, 'v1')}:{digest.hexdigest()}"
+
+    def _local_get(self, key: str) -> Optional[Tuple[Any, int]]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value, tokens = entry
+        if expires_at < time.time():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return value, tokens
+
+    def _local_set(self, key: str, value: Any, tokens: int):
+        self._local[key] = (time.time() + self.ttl, value, tokens)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local_entries:
+            self._local.popitem(last=False)
+
+    async def _record(self, operation: str, hit: bool, key: Optional[str] = None, tokens: int = 0):
+        client = get_redis()
+        if not client:
+            return
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hincrby(STATS_KEY, f"{operation}:{'hits' if hit else 'misses'}", 1)
+                if hit:
+                    pipe.hincrby(STATS_KEY, f"{operation}:tokens_saved", tokens)
+                    if key:
+                        pipe.eval(_INCR_ENTRY_HITS, 1, key)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("LLM cache stats update failed: %s", e)
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        operation = key.split(":")[1]
+
+        local = self._local_get(key)
+        if local is not None:
+            value, tokens = local
+            await self._record(operation, True, key, tokens)
+            return copy.deepcopy(value)
+
+        client = get_redis()
+        if client:
+            try:
+                entry = await client.hgetall(key)
+                entry = {k.decode() if isinstance(k, bytes) else k: v for k, v in entry.items()}
+                if "value" in entry:
+                    value = json.loads(entry["value"])
+                    tokens = int(entry.get("tokens", 0))
+                    self._local_set(key, value, tokens)
+                    await self._record(operation, True, key, tokens)
+                    return copy.deepcopy(value)
+            except Exception as e:
+                logger.warning("LLM cache read failed: %s", e)
+
+        await self._record(operation, False)
+        return None
+
+    async def set(self, key: str, value: Any, tokens: int = 0):
+        if not self.enabled:
+            return
+        self._local_set(key, copy.deepcopy(value), tokens)
+        client = get_redis()
+        if not client:
+            return
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping={"value": json.dumps(value), "tokens": tokens, "hits": 0, "created_at": int(time.time())})
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+
+    async def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Hits, misses and tokens saved per operation, across all processes.
+        """
+        client = get_redis()
+        if not client:
+            return {}
+        raw = await client.hgetall(STATS_KEY)
+        stats: Dict[str, Dict[str, int]] = {}
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            operation, metric = field.rsplit(":", 1)
+            stats.setdefault(operation, {"hits": 0, "misses": 0, "tokens_saved": 0})[metric] = int(value)
+        for operation, values in stats.items():
+            lookups = values["hits"] + values["misses"]
+            values["hit_rate"] = round(values["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    async def invalidate(self, operation: str, prompt_version: Optional[str] = None) -> int:
+        """
+        Drops cached entries for an operation (optionally one prompt version only).
+        """
+        prefix = f"{KEY_PREFIX}:{operation}:" + (f"{prompt_version}:" if prompt_version else "")
+        self._drop_local(prefix)
+
+        client = get_redis()
+        if not client:
+            return 0
+        deleted = 0
+        async for key in client.scan_iter(match=f"{prefix}*", count=500):
+            deleted += await client.delete(key)
+        try:
+            await client.publish(INVALIDATE_CHANNEL, prefix)
+        except Exception as e:
+            logger.warning("LLM cache invalidation broadcast failed: %s", e)
+        return deleted
+
+    def _drop_local(self, prefix: str):
+        for key in [k for k in self._local if k.startswith(prefix)]:
+            self._local.pop(key, None)
+
+    async def _listen(self):
+        while True:
+            client = get_redis()
+            if not client:
+                return
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    self._drop_local(data.decode() if isinstance(data, bytes) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("LLM cache invalidation listener disconnected: %s", e)
+                # Invalidations may have been missed while disconnected
+                self._local.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def start(self):
+        """
+        Subscribes to invalidations from other processes.
+        """
+        if self.enabled and get_redis() is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+llm_cache = LLMResultCache()
@@ -0,0 +1,51 @@
+import logging
+from typing import Dict, Tuple
+import httpx
+import openai
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# (base_url, api_key) -> long-lived client; one connection pool per upstream
+_clients: Dict[Tuple[str, str], openai.AsyncOpenAI] = {}
+
+def get_async_openai_client(base_url: str, api_key: str) -> openai.AsyncOpenAI:
+    """
+    Returns the shared AsyncOpenAI client for an upstream, creating it on first use.
+    Connections are kept alive and reused across jobs and requests.
+    """
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            http2=settings.LLM_HTTP2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS),
+        )
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+        )
+        _clients[key] = client
+        logger.info(f"LLM: created pooled client for {base_url} (http2={settings.LLM_HTTP2 and HTTP2_AVAILABLE})")
+    return client
+
+async def close_async_openai_clients():
+    for client in list(_clients.values()):
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning("LLM: error while closing client: %s", e)
+    _clients.clear()
@@ -1,9 +1,34 @@
+from typing import Dict, Optional, Tuple
 from .universal_provider import UniversalLLMProvider
+from .clients import close_async_openai_clients
+from app.core.config import settings
 
-def get_llm_provider():
+# (base_url, api_key, model) -> provider; providers are stateless apart from their client
+_providers: Dict[Tuple[str, Optional[str], str], UniversalLLMProvider] = {}
+
+def get_llm_provider(base_url: Optional[str] = None, api_key: Optional[str] = None, model: Optional[str] = None):
     """
     Returns the configured LLM provider.
     Currently defaults to UniversalLLMProvider which handles all OpenAI-compatible APIs 
     (OpenAI, Grok, Perplexity, etc.) based on env config.
+    Providers are cached per process, so every caller shares one pooled client.
+    """
+    key = (base_url or settings.LLM_BASE_URL, api_key or settings.LLM_API_KEY, model or settings.LLM_MODEL)
+    provider = _providers.get(key)
+    if provider is None:
+        provider = UniversalLLMProvider(base_url=key[0], api_key=key[1], model=key[2])
+        _providers[key] = provider
+    return provider
+
+def get_groq_provider(model: Optional[str] = None):
+    """
+    Provider for Groq's OpenAI-compatible endpoint (used by the public quick-analysis routes).
+    """
+    return get_llm_provider(base_url=settings.GROQ_BASE_URL, api_key=settings.GROQ_API_KEY, model=model or settings.GROQ_MODEL)
+
+async def close_llm_providers():
+    """
+    Closes the pooled HTTP clients. Call on process shutdown.
     """
-    return UniversalLLMProvider()
+    _providers.clear()
+    await close_async_openai_clients()
@@ -0,0 +1,131 @@
+import inspect
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from .rate_limiter import LLMRateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+class IncrementalJSONObjectParser:
+    """
+    Parses a JSON object as it streams in and reports each top-level
+    member as soon as its value closes, e.g. '"score": 82' before the
+    model has started on the next field. Text before the opening brace
+    (markdown fences, chatter) is skipped.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.result: Dict[str, Any] = {}
+        self.closed = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start: Optional[int] = None
+        self._object_start = 0
+        self._object_end = 0
+
+    def _emit(self, end: int) -> List[Tuple[str, Any]]:
+        member = self.buffer[self._member_start:end].strip()
+        self._member_start = None
+        if not member:
+            return []
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            logger.warning("Skipping unparseable streamed member: %.80s", member)
+            return []
+        self.result.update(parsed)
+        return list(parsed.items())
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Appends a chunk and returns the (key, value) pairs completed by it.
+        """
+        self.buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        while self._pos < len(self.buffer) and not self.closed:
+            char = self.buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._depth > 0:
+                self._in_string = True
+            elif char == "{" and self._depth == 0:
+                self._depth = 1
+                self._object_start = self._pos
+                self._member_start = self._pos + 1
+            elif char in "{[" and self._depth > 0:
+                self._depth += 1
+            elif char in "}]" and self._depth > 0:
+                if self._depth == 1:
+                    completed.extend(self._emit(self._pos))
+                    self._object_end = self._pos + 1
+                    self.closed = True
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                completed.extend(self._emit(self._pos))
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return completed
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        The complete object. Falls back to parsing the whole buffer when the
+        stream was not a single well-formed object.
+        """
+        if self.closed:
+            try:
+                return json.loads(self.buffer[self._object_start:self._object_end])
+            except json.JSONDecodeError:
+                return self.result
+        raw = re.sub(r"^```[a-z]*\n?|\n?```$", "", self.buffer.strip())
+        start, end = raw.find("{"), raw.rfind("}")
+        if start == -1 or end == -1:
+            raise json.JSONDecodeError("No JSON object in stream", raw, 0)
+        return json.loads(raw[start:end + 1])
+
+# Keep proxies (nginx, Cloud Run) from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def stream_json_fields(
+    tokens: AsyncIterator[str],
+    finalize: Optional[Callable[[Dict[str, Any]], Any]] = None,  # may be async
+) -> AsyncIterator[str]:
+    """
+    Turns a token stream of a JSON object into Server-Sent Events:
+    one `field` event per completed top-level member, then a `done` event
+    with the (optionally post-processed) full object, or an `error` event.
+    """
+    parser = IncrementalJSONObjectParser()
+    try:
+        async for token in tokens:
+            for key, value in parser.feed(token):
+                yield sse_event("field", {"key": key, "value": value})
+        result = parser.finish()
+        if finalize is not None:
+            result = finalize(result)
+            if inspect.isawaitable(result):
+                result = await result
+        yield sse_event("done", result)
+    except json.JSONDecodeError as e:
+        logger.error("Streamed LLM response was not valid JSON: %s", e)
+        yield sse_event("error", {"status": 500, "detail": "AI returned an invalid response. Please try again."})
+    except LLMRateLimitTimeout:
+        logger.warning("LLM budget exhausted")
+        yield sse_event("error", {"status": 429, "detail": "The AI service is busy. Please try again shortly."})
+    except Exception as e:
+        if type(e).__name__ == "APITimeoutError":
+            logger.error("Streamed LLM response timed out")
+            yield sse_event("error", {"status": 504, "detail": "The AI response timed out. Please try again."})
+            return
+        logger.error("Streamed LLM response failed: %s", e)
+        yield sse_event("error", {"status": 500, "detail": str(e)})
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm_ratelimit"
+
+# Two token buckets (requests/min and tokens/min) checked and charged together.
+# KEYS: rpm bucket, tpm bucket. ARGV: rpm capacity, tpm capacity, token cost, now.
+# Returns seconds to wait; 0 means the request was admitted and charged.
+_ACQUIRE_SCRIPT = """
+local function level(key, capacity, now)
+    local state = redis.call('HMGET', key, 'level', 'ts')
+    local value = tonumber(state[1])
+    local ts = tonumber(state[2])
+    -- A hash without ts was not written by this script: treat it as full
+    if value == nil or ts == nil then return capacity end
+    return math.min(capacity, value + (now - ts) * capacity / 60.0)
+end
+local rpm_cap = tonumber(ARGV[1])
+local tpm_cap = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local rpm = level(KEYS[1], rpm_cap, now)
+local tpm = level(KEYS[2], tpm_cap, now)
+local wait = 0
+if rpm < 1 then wait = math.max(wait, (1 - rpm) * 60.0 / rpm_cap) end
+if tpm < cost then wait = math.max(wait, (cost - tpm) * 60.0 / tpm_cap) end
+if wait == 0 then
+    rpm = rpm - 1
+    tpm = tpm - cost
+end
+redis.call('HSET', KEYS[1], 'level', rpm, 'ts', now)
+redis.call('HSET', KEYS[2], 'level', tpm, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 120)
+redis.call('EXPIRE', KEYS[2], 120)
+return tostring(wait)
+"""
+
+# Reconciles a TPM bucket with the actual token usage. Skipped once the bucket
+# has expired (it is full again anyway), so it never recreates a hash without ts.
+# KEYS: tpm bucket. ARGV: delta. Returns 1 if applied.
+_RECONCILE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HINCRBYFLOAT', KEYS[1], 'level', ARGV[1])
+redis.call('EXPIRE', KEYS[1], 120)
+return 1
+"""
+
+# AIMD on the shared concurrency limit. ARGV: mode ('increase'|'decrease'), factor, min, max.
+_ADJUST_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or ARGV[4])
+local factor = tonumber(ARGV[2])
+if ARGV[1] == 'increase' then
+    current = current + factor / current
+else
+    current = current * factor
+end
+current = math.max(tonumber(ARGV[3]), math.min(tonumber(ARGV[4]), current))
+redis.call('SET', KEYS[1], tostring(current), 'EX', 3600)
+return tostring(current)
+"""
+
+class LLMRateLimitTimeout(Exception):
+    """The client-side budget or concurrency slot stayed unavailable for longer than the caller is willing to wait."""
+    status_code = 429
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int]) -> int:
+    """
+    Rough prompt size (~4 chars per token) plus the completion budget.
+    """
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + (max_tokens or settings.LLM_DEFAULT_COMPLETION_TOKENS)
+
+class _LocalBuckets:
+    """
+    In-process fallback with the same semantics as _ACQUIRE_SCRIPT, used when Redis is unavailable.
+    """
+    def __init__(self):
+        self._state: Dict[str, Tuple[float, float]] = {}
+
+    def _level(self, key: str, capacity: float, now: float) -> float:
+        if key not in self._state:
+            return capacity
+        value, ts = self._state[key]
+        return min(capacity, value + (now - ts) * capacity / 60.0)
+
+    def acquire(self, rpm_key: str, tpm_key: str, rpm_cap: int, tpm_cap: int, cost: int) -> float:
+        now = time.time()
+        rpm = self._level(rpm_key, rpm_cap, now)
+        tpm = self._level(tpm_key, tpm_cap, now)
+        wait = 0.0
+        if rpm < 1:
+            wait = max(wait, (1 - rpm) * 60.0 / rpm_cap)
+        if tpm < cost:
+            wait = max(wait, (cost - tpm) * 60.0 / tpm_cap)
+        if wait == 0:
+            rpm -= 1
+            tpm -= cost
+        self._state[rpm_key] = (rpm, now)
+        self._state[tpm_key] = (tpm, now)
+        return wait
+
+    def adjust(self, key: str, delta: float):
+        if key in self._state:
+            value, ts = self._state[key]
+            self._state[key] = (value + delta, ts)
+
+class LLMRateLimiter:
+    """
+    Client-side throttling per provider/model:
+    - RPM and TPM token buckets shared by all processes through Redis;
+      token cost is estimated up front and reconciled with actual usage.
+    - An AIMD concurrency limit on in-flight calls per process: halved on a
+      429, reduced when latency exceeds the target, grown additively on
+      success. The limit value is shared through Redis so every process
+      backs off together, but each process counts its own calls.
+    - A cooldown honouring the provider's Retry-After after a 429.
+    """
+    def __init__(self):
+        self._local = _LocalBuckets()
+        self._limits: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._conditions: Dict[str, asyncio.Condition] = {}
+
+    def budgets(self, model: str) -> Tuple[int, int]:
+        limits = settings.LLM_RATE_LIMITS.get(model, {})
+        return limits.get("rpm", settings.LLM_DEFAULT_RPM), limits.get("tpm", settings.LLM_DEFAULT_TPM)
+
+    async def _acquire_budget(self, key: str, model: str, cost: int) -> float:
+        rpm_cap, tpm_cap = self.budgets(model)
+        cost = min(cost, tpm_cap)  # a single oversized request must still be admissible
+        rpm_key, tpm_key = f"{KEY_PREFIX}:{key}:rpm", f"{KEY_PREFIX}:{key}:tpm"
+        client = get_redis()
+        if client:
+            try:
+                cooldown = await client.pttl(f"{KEY_PREFIX}:{key}:cooldown")
+                if cooldown and cooldown > 0:
+                    return cooldown / 1000
+                return float(await client.eval(_ACQUIRE_SCRIPT, 2, rpm_key, tpm_key, rpm_cap, tpm_cap, cost, time.time()))
+            except Exception as e:
+                logger.warning("LLM rate limiter: Redis unavailable, using local buckets: %s", e)
+        return self._local.acquire(rpm_key, tpm_key, rpm_cap, tpm_cap, cost)
+
+    async def _refresh_limit(self, key: str):
+        client = get_redis()
+        if client:
+            try:
+                shared = await client.get(f"{KEY_PREFIX}:{key}:concurrency")
+                if shared:
+                    self._limits[key] = float(shared)
+                    return
+            except Exception:
+                pass
+        self._limits.setdefault(key, float(settings.LLM_MAX_CONCURRENCY))
+
+    async def _adjust_limit(self, key: str, mode: str, factor: float):
+        low, high = settings.LLM_MIN_CONCURRENCY, settings.LLM_MAX_CONCURRENCY
+        client = get_redis()
+        if client:
+            try:
+                self._limits[key] = float(await client.eval(
+                    _ADJUST_SCRIPT, 1, f"{KEY_PREFIX}:{key}:concurrency", mode, factor, low, high
+                ))
+                return
+            except Exception:
+                pass
+        current = self._limits.get(key, float(high))
+        current = current + factor / current if mode == "increase" else current * factor
+        self._limits[key] = max(low, min(high, current))
+
+    async def _wait_for_slot(self, key: str, deadline: float):
+        condition = self._conditions.setdefault(key, asyncio.Condition())
+        await self._refresh_limit(key)
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self._in_flight.get(key, 0) < int(self._limits[key])),
+                    timeout=max(deadline - time.monotonic(), 0),
+                )
+            except asyncio.TimeoutError:
+                raise LLMRateLimitTimeout(f"No LLM concurrency slot for {key}")
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+
+    async def _release_slot(self, key: str):
+        condition = self._conditions[key]
+        async with condition:
+            self._in_flight[key] -= 1
+            condition.notify_all()
+
+    async def record_usage(self, key: str, estimated: int, actual: int):
+        """
+        Corrects the TPM bucket once the real token count is known.
+        """
+        delta = estimated - actual
+        if not delta:
+            return
+        tpm_key = f"{KEY_PREFIX}:{key}:tpm"
+        client = get_redis()
+        if client:
+            try:
+                await client.eval(_RECONCILE_SCRIPT, 1, tpm_key, delta)
+                return
+            except Exception:
+                pass
+        self._local.adjust(tpm_key, delta)
+
+    async def _on_throttled(self, key: str, error: Exception):
+        await self._adjust_limit(key, "decrease", 0.5)
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        client = get_redis()
+        if retry_after and client:
+            try:
+                await client.set(f"{KEY_PREFIX}:{key}:cooldown", 1, px=int(retry_after * 1000))
+            except Exception:
+                pass
+        logger.warning(f"LLM rate limited on {key}; concurrency limit now {self._limits.get(key):.1f}")
+
+    @asynccontextmanager
+    async def limit(self, key: str, model: str, estimated_tokens: int, max_wait: Optional[float] = None):
+        """
+        Waits for RPM/TPM budget and a concurrency slot, then runs the wrapped call.
+        Raises LLMRateLimitTimeout if the budget or a slot will not free up within max_wait.
+        """
+        deadline = time.monotonic() + (max_wait if max_wait is not None else settings.LLM_RATE_LIMIT_MAX_WAIT_SECONDS)
+        while True:
+            wait = await self._acquire_budget(key, model, estimated_tokens)
+            if wait <= 0:
+                break
+            if time.monotonic() + wait > deadline:
+                raise LLMRateLimitTimeout(f"LLM budget for {key} exhausted")
+            await asyncio.sleep(min(wait, 5.0) + random.uniform(0, 0.25))
+
+        await self._wait_for_slot(key, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:
+                await self._on_throttled(key, e)
+            raise
+        else:
+            latency = time.monotonic() - started
+            if latency > settings.LLM_LATENCY_TARGET_SECONDS:
+                await self._adjust_limit(key, "decrease", 0.9)
+            else:
+                await self._adjust_limit(key, "increase", 1.0)
+        finally:
+            await self._release_slot(key)
+
+llm_rate_limiter = LLMRateLimiter()
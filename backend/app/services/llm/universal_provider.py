@@ -1,9 +1,11 @@
 from .base import LLMProvider
-from typing import Dict, Any, List
-import openai
+from typing import AsyncIterator, Dict, Any, List, Optional
 import json
 import logging
 from app.core.config import settings
+from .cache import llm_cache
+from .clients import get_async_openai_client
+from .rate_limiter import llm_rate_limiter, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -12,21 +14,94 @@ class UniversalLLMProvider(LLMProvider):
     A universal provider that uses the OpenAI-compatible API standard.
     Works with: OpenAI, Perplexity, Grok, DeepSeek, LocalLLM (vLLM/Ollama), etc.
     """
-    def __init__(self):
-        self._client = None
-        self.model = settings.LLM_MODEL
-        self.api_key = settings.LLM_API_KEY
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, model: Optional[str] = None):
+        self.base_url = base_url or settings.LLM_BASE_URL
+        self.model = model or settings.LLM_MODEL
+        self.api_key = api_key or settings.LLM_API_KEY
 
     @property
     def client(self):
-        if self._client is None:
-            if not self.api_key:
-                raise ValueError("LLM_API_KEY is not set. Please configure it in your environment.")
-            self._client = openai.AsyncOpenAI(
-                api_key=self.api_key,
-                base_url=settings.LLM_BASE_URL
-            )
-        return self._client
+        if not self.api_key:
+            raise ValueError("LLM_API_KEY is not set. Please configure it in your environment.")
+        return get_async_openai_client(self.base_url, self.api_key)
+
+    def _completion_kwargs(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        response_format: Optional[Dict[str, str]],
+        model: str,
+        timeout: Optional[float],
+    ) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return kwargs
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict[str, str]] = None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Single chat completion on the shared client, throttled by the
+        provider/model rate limiter. Returns the raw response.
+        """
+        model = model or self.model
+        kwargs = self._completion_kwargs(messages, temperature, max_tokens, response_format, model, timeout)
+
+        limiter_key = f"{self.base_url}|{model}"
+        estimated = estimate_tokens(messages, max_tokens)
+        async with llm_rate_limiter.limit(limiter_key, model, estimated, max_wait=timeout):
+            response = await self.client.chat.completions.create(**kwargs)
+        if response.usage:
+            await llm_rate_limiter.record_usage(limiter_key, estimated, response.usage.total_tokens)
+        return response
+
+    async def stream_complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict[str, str]] = None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of complete(): yields content deltas as the provider
+        produces them. The rate-limiter slot is held until the stream ends;
+        `timeout` bounds the wait for budget and each read from the provider.
+        """
+        model = model or self.model
+        kwargs = self._completion_kwargs(messages, temperature, max_tokens, response_format, model, timeout)
+        kwargs["stream"] = True
+        kwargs["stream_options"] = {"include_usage": True}
+
+        limiter_key = f"{self.base_url}|{model}"
+        estimated = estimate_tokens(messages, max_tokens)
+        usage = None
+        async with llm_rate_limiter.limit(limiter_key, model, estimated, max_wait=timeout):
+            stream = await self.client.chat.completions.create(**kwargs)
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage.total_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        if usage:
+            await llm_rate_limiter.record_usage(limiter_key, estimated, usage)
 
     async def analyze_resume(self, resume_text: str, job_description: str = "") -> Dict[str, Any]:
         """
@@ -56,9 +131,14 @@ class UniversalLLMProvider(LLMProvider):
         Do not output markdown code blocks. Just the raw JSON string.
         """
         
+        cache_key = llm_cache.make_key("analyze_resume", self.model, 0.2, resume_text[:20000], job_description[:5000])
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            cached["_usage"] = 0
+            return cached
+
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            response = await self.complete(
                 messages=[
                     {"role": "system", "content": "You are a helpful AI career assistant. Output strict JSON."},
                     {"role": "user", "content": prompt}
@@ -83,6 +163,12 @@ class UniversalLLMProvider(LLMProvider):
             
             # Attach metadata about who answered
             result["_provider_model"] = self.model
+
+            await llm_cache.set(
+                cache_key,
+                {k: v for k, v in result.items() if k != "_usage"},
+                tokens=result.get("_usage", 0)
+            )
                 
             return result
             
@@ -91,7 +177,11 @@ class UniversalLLMProvider(LLMProvider):
             raise e
 
     async def match_jobs(self, resume_text: str, jobs_data: List[Dict]) -> List[Dict]:
-        jobs_summary = json.dumps([{ "id": str(j["id"]), "title": j["title"], "desc": j["description"][:200] } for j in jobs_data])
+        # The jobs are a pre-filtered shortlist, so each can carry more of its description
+        jobs_summary = json.dumps([
+            { "id": str(j["id"]), "title": j["title"], "skills": j.get("skills") or [], "desc": j["description"][:600] }
+            for j in jobs_data
+        ])
         
         prompt = f"""
         Rank the following jobs for this candidate based on their resume.
@@ -108,9 +198,13 @@ class UniversalLLMProvider(LLMProvider):
         ]
         """
         
+        cache_key = llm_cache.make_key("match_jobs", self.model, 0.2, resume_text[:10000], jobs_summary)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            response = await self.complete(
                 messages=[
                     {"role": "system", "content": "Rank jobs for the candidate. JSON only."},
                     {"role": "user", "content": prompt}
@@ -130,12 +224,68 @@ class UniversalLLMProvider(LLMProvider):
             # Robust extraction
             if isinstance(result, dict):
                 values = list(result.values())
-                if values and isinstance(values[0], list):
-                    return values[0]
-                return []
-                
-            return result if isinstance(result, list) else []
+                matches = values[0] if values and isinstance(values[0], list) else []
+            else:
+                matches = result if isinstance(result, list) else []
+
+            await llm_cache.set(cache_key, matches, tokens=response.usage.total_tokens if response.usage else 0)
+            return matches
 
         except Exception as e:
             logger.error(f"Universal LLM Matching Failed: {e}")
             raise e
+
+    async def score_candidates(self, job_description: str, candidates: List[Dict]) -> List[Dict]:
+        """
+        Scores several resumes against one job in a single call.
+        candidates: [{"id": ..., "resume": ...}]
+        """
+        candidates_summary = json.dumps([{ "id": str(c["id"]), "resume": c["resume"][:3000] } for c in candidates])
+
+        prompt = f"""
+        Score each candidate's fit for this job.
+
+        Job:
+        {job_description[:4000]}
+
+        Candidates:
+        {candidates_summary}
+
+        Return JSON object:
+        {{ "scores": [ {{ "id": "...", "match_score": 0-100, "reason": "..." }} ] }}
+        """
+
+        cache_key = llm_cache.make_key("score_candidates", self.model, 0.1, job_description[:4000], candidates_summary)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.complete(
+                messages=[
+                    {"role": "system", "content": "Score candidates for the job. JSON only."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={ "type": "json_object" },
+                temperature=0.1
+            )
+
+            content = response.choices[0].message.content
+            try:
+                result = json.loads(content)
+            except json.JSONDecodeError:
+                content = content.replace("```json", "").replace("```", "")
+                result = json.loads(content)
+
+            if isinstance(result, dict):
+                values = list(result.values())
+                scores = values[0] if values and isinstance(values[0], list) else []
+            else:
+                scores = result if isinstance(result, list) else []
+
+            await llm_cache.set(cache_key, scores, tokens=response.usage.total_tokens if response.usage else 0)
+            return scores
+
+        except Exception as e:
+            logger.error(f"Universal LLM Candidate Scoring Failed: {e}")
+            raise e
@@ -1,5 +1,6 @@
 from app.services.llm.factory import get_llm_provider
-from typing import Dict, Any, List
+from app.services.llm.cache import llm_cache
+from typing import AsyncIterator, Dict, Any, List
 import logging
 import json
 
@@ -30,9 +31,13 @@ class ResumeTailorService:
         }}
         """
 
+        cache_key = llm_cache.make_key("analyze_job_description", self.llm.model, 0.1, jd_text[:10000])
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response = await self.llm.client.chat.completions.create(
-                model=self.llm.model,
+            response = await self.llm.complete(
                 messages=[
                     {"role": "system", "content": "You are an expert ATS analyzer. Output JSON only."},
                     {"role": "user", "content": prompt}
@@ -42,15 +47,14 @@ class ResumeTailorService:
             )
             
             content = response.choices[0].message.content
-            return json.loads(content)
+            result = json.loads(content)
+            await llm_cache.set(cache_key, result, tokens=response.usage.total_tokens if response.usage else 0)
+            return result
         except Exception as e:
             logger.error(f"JD Analysis Failed: {e}")
             raise e
 
-    async def tailor_resume(self, resume_text: str, jd_analysis: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Rewrites the resume content to align with the analyzed Job Description.
-        """
+    def _tailor_messages(self, resume_text: str, jd_analysis: Dict[str, Any]) -> List[Dict[str, str]]:
         jd_summary = json.dumps(jd_analysis)
         
         prompt = f"""
@@ -87,14 +91,20 @@ class ResumeTailorService:
             "improvements_made": ["Changed X to Y to match keyword Z", ...]
         }}
         """
+        return [
+            {"role": "system", "content": "You are a Resume Optimizer. Output JSON only."},
+            {"role": "user", "content": prompt}
+        ]
+
+    async def tailor_resume(self, resume_text: str, jd_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Rewrites the resume content to align with the analyzed Job Description.
+        """
+        messages = self._tailor_messages(resume_text, jd_analysis)
 
         try:
-            response = await self.llm.client.chat.completions.create(
-                model=self.llm.model,
-                messages=[
-                    {"role": "system", "content": "You are a Resume Optimizer. Output JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = await self.llm.complete(
+                messages=messages,
                 response_format={ "type": "json_object" },
                 temperature=0.3
             )
@@ -105,4 +115,14 @@ class ResumeTailorService:
             logger.error(f"Resume Tailoring Failed: {e}")
             raise e
 
+    def tailor_resume_stream(self, resume_text: str, jd_analysis: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Same rewrite as tailor_resume(), streamed as raw JSON text deltas.
+        """
+        return self.llm.stream_complete(
+            messages=self._tailor_messages(resume_text, jd_analysis),
+            response_format={ "type": "json_object" },
+            temperature=0.3
+        )
+
 resume_tailor_service = ResumeTailorService()
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import re
+import uuid
+from typing import Any, Container, Dict, FrozenSet, Iterable, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.redis import get_redis
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "skills_index"
+
+# alias -> canonical name. Keys and values are already normalized (see _normalize).
+SKILL_ALIASES = {
+    "js": "javascript",
+    "ecmascript": "javascript",
+    "es6": "javascript",
+    "ts": "typescript",
+    "react.js": "react",
+    "reactjs": "react",
+    "react js": "react",
+    "node": "node.js",
+    "nodejs": "node.js",
+    "node js": "node.js",
+    "vue.js": "vue",
+    "vuejs": "vue",
+    "next.js": "nextjs",
+    "next": "nextjs",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "mongo": "mongodb",
+    "k8s": "kubernetes",
+    "golang": "go",
+    "py": "python",
+    "python3": "python",
+    "tailwind": "tailwind css",
+    "tailwindcss": "tailwind css",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "ai": "artificial intelligence",
+    "nlp": "natural language processing",
+    "gcp": "google cloud",
+    "google cloud platform": "google cloud",
+    "aws": "amazon web services",
+    "ux": "ui/ux",
+    "ui": "ui/ux",
+    "ui ux": "ui/ux",
+    "c sharp": "c#",
+    "csharp": "c#",
+    "cpp": "c++",
+    "sklearn": "scikit-learn",
+    "scikit learn": "scikit-learn",
+    "ci/cd": "ci cd",
+    "rest": "rest api",
+    "restful": "rest api",
+}
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+
+def _normalize(name: str) -> str:
+    return _SEPARATORS.sub(" ", name.strip().lower()).strip(" .,;:")
+
+def canonical_skill(name: str) -> str:
+    """
+    "JS", "js", "JavaScript" -> "javascript". Unknown skills are only normalized.
+    """
+    normalized = _normalize(name)
+    return SKILL_ALIASES.get(normalized, normalized)
+
+def canonical_skills(names: Iterable[Any]) -> FrozenSet[str]:
+    return frozenset(s for s in (canonical_skill(str(n)) for n in names or []) if s)
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#./]*")
+
+# Single words that name a skill (or alias one) in a skills list but are
+# ordinary English in prose ("next steps", "the rest", "go to market"). Free
+# text only counts them as part of a longer phrase such as "node js".
+PROSE_AMBIGUOUS = frozenset({
+    "ai", "c", "express", "go", "next", "node", "r", "rest", "rust", "spring", "swift", "ui",
+})
+
+def mentioned_skills(text: str, known: Container[str], max_words: int = 3) -> FrozenSet[str]:
+    """
+    Canonical skills from `known` mentioned in free text, e.g. a resume.
+    """
+    # Sentence punctuation is not part of the word ("node." is still "node")
+    words = [w.rstrip("./") for w in _WORD_RE.findall(text.lower())]
+    found = set()
+    for n in range(1, max_words + 1):
+        for i in range(len(words) - n + 1):
+            if n == 1 and words[i] in PROSE_AMBIGUOUS:
+                continue
+            skill = canonical_skill(" ".join(words[i:i + n]))
+            if skill in known:
+                found.add(skill)
+    return frozenset(found)
+
+class SkillsIndex:
+    """
+    In-memory inverted index canonical skill -> job ids, plus the forward map
+    job id -> skills, for set-based overlap queries without touching Postgres.
+
+    Built from the jobs table on startup and kept current incrementally:
+    whoever creates or changes jobs calls publish_upsert(), which applies the
+    change locally and broadcasts it on the skills_index Redis channel so
+    every other API/worker process applies it too. A process that loses its
+    subscription reloads from the database on next use.
+    """
+    def __init__(self):
+        self._postings: Dict[str, Set[uuid.UUID]] = {}
+        self._job_skills: Dict[uuid.UUID, FrozenSet[str]] = {}
+        self._loaded = False
+        self._listener: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _apply(self, job_id: uuid.UUID, skills: Iterable[Any]):
+        new = canonical_skills(skills)
+        old = self._job_skills.get(job_id, frozenset())
+        for skill in old - new:
+            postings = self._postings.get(skill)
+            if postings is not None:
+                postings.discard(job_id)
+                if not postings:
+                    del self._postings[skill]
+        for skill in new - old:
+            self._postings.setdefault(skill, set()).add(job_id)
+        if new:
+            self._job_skills[job_id] = new
+        else:
+            self._job_skills.pop(job_id, None)
+
+    async def load(self, db: AsyncSession):
+        """
+        (Re)builds the whole index from the jobs table.
+        """
+        async with self._lock:
+            rows = (await db.execute(select(Job.id, Job.skills))).all()
+            self._postings = {}
+            self._job_skills = {}
+            for job_id, skills in rows:
+                self._apply(job_id, skills)
+            self._loaded = True
+            logger.info(f"Skills index built: {len(self._job_skills)} jobs, {len(self._postings)} skills")
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if not self._loaded:
+            await self.load(db)
+
+    # --- Queries ---
+
+    def job_skills(self, job_id: uuid.UUID) -> FrozenSet[str]:
+        return self._job_skills.get(job_id, frozenset())
+
+    def overlap(self, skills: Iterable[Any]) -> Dict[uuid.UUID, int]:
+        """
+        job id -> number of the given skills the job lists, for every job
+        sharing at least one.
+        """
+        counts: Dict[uuid.UUID, int] = {}
+        for skill in canonical_skills(skills):
+            for job_id in self._postings.get(skill, ()):
+                counts[job_id] = counts.get(job_id, 0) + 1
+        return counts
+
+    def extract(self, text: str, max_words: int = 3) -> FrozenSet[str]:
+        """
+        Known skills (or their aliases) mentioned in free text, e.g. a resume.
+        """
+        return mentioned_skills(text, self._postings, max_words)
+
+    # --- Cross-process maintenance ---
+
+    async def _broadcast(self, message: Dict[str, Any]):
+        client = get_redis()
+        if not client:
+            return
+        try:
+            await client.publish(CHANNEL, json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Failed to broadcast skills index update: {e}")
+
+    async def publish_upsert(self, jobs: Iterable[Job]):
+        """
+        Call after committing new or changed jobs.
+        """
+        items = [{"id": str(job.id), "skills": list(job.skills or [])} for job in jobs]
+        for item in items:
+            self._apply(uuid.UUID(item["id"]), item["skills"])
+        await self._broadcast({"op": "upsert", "jobs": items})
+
+    def _handle(self, message: Dict[str, Any]):
+        # Imported here: the retrieval indexes pull in numpy and import this module
+        from app.services.job_index import job_index
+        from app.services.job_vectors import job_vector_index
+
+        op = message.get("op")
+        if op == "upsert":
+            for item in message.get("jobs", []):
+                self._apply(uuid.UUID(item["id"]), item["skills"])
+        # The retrieval indexes derive from the same rows
+        job_index.invalidate()
+        job_vector_index.invalidate()
+
+    async def _listen(self):
+        while True:
+            client = get_redis()
+            if not client:
+                return
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._handle(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Skills index listener disconnected: {e}")
+                # Updates may have been missed while disconnected
+                self._loaded = False
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def start(self, db: AsyncSession):
+        """
+        Builds the index and subscribes to updates from other processes.
+        """
+        if get_redis() is not None and (self._listener is None or self._listener.done()):
+            # Listen before loading so updates racing the load are not lost
+            self._listener = asyncio.create_task(self._listen())
+        await self.load(db)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+skills_index = SkillsIndex()
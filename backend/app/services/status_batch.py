@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, case, func, true, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+async def fetch_status_batch(
+    db: AsyncSession,
+    model: Any,
+    columns: Sequence[Any],
+    user_id: uuid.UUID,
+    ids: List[uuid.UUID],
+    versions: Dict[uuid.UUID, int],
+    updated_after: Optional[datetime],
+    changed_only_columns: Sequence[Any] = (),
+) -> Tuple[List[Dict[str, Any]], List[uuid.UUID]]:
+    """
+    Resolves many rows of `model` (which needs id, user_id, version and
+    updated_at) in one `id = ANY(:ids)` query scoped to the owner.
+
+    Returns (changed rows, ids not found or not owned). A row with a known
+    version is changed if its version is above it; any other row if it was
+    updated after `updated_after` (or always, without one). updated_at is the
+    writer's transaction start, so it can commit behind a time the client
+    already saw: versions are the reliable watermark. changed_only_columns
+    (e.g. result_json) are only read for changed rows.
+    """
+    ids = list(dict.fromkeys(ids))
+    known = {k: v for k, v in versions.items() if k in set(ids)}
+    unknown = model.updated_at > updated_after if updated_after is not None else true()
+    # The version comparison is NULL for ids without a known version
+    changed = func.coalesce(model.version > case(known, value=model.id), unknown) if known else unknown
+
+    stmt = (
+        select(
+            model.id,
+            model.updated_at,
+            *columns,
+            *[case((changed, column), else_=None).label(column.key) for column in changed_only_columns],
+            changed.label("changed"),
+        )
+        # One array parameter, so the statement is the same whatever the batch size
+        .where(model.id == any_(bindparam("ids", ids, type_=ARRAY(model.id.type))))
+        .where(model.user_id == user_id)
+    )
+    rows = (await db.execute(stmt)).mappings().all()
+
+    found = {row["id"] for row in rows}
+    changed_rows = [{k: v for k, v in row.items() if k != "changed"} for row in rows if row["changed"]]
+    return changed_rows, [i for i in ids if i not in found]
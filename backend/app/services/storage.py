@@ -1,112 +1,221 @@
 import os
 import uuid
-import hashlib
-from typing import Optional, Dict
+import asyncio
+import functools
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, AsyncIterator, Optional, Dict
 from datetime import timedelta
 from app.core.config import settings
 
 # Try updating imports, if failed use mocks
 try:
     from google.cloud import storage
+    from google.api_core.exceptions import PreconditionFailed
+    from google.auth.credentials import AnonymousCredentials
     GCS_AVAILABLE = True
 except ImportError:
     GCS_AVAILABLE = False
     print("Warning: google-cloud-storage not installed. Storage will default to Local.")
 
 class StorageService:
+    """
+    Async facade over GCS or the local filesystem.
+
+    Both clients are blocking, so every call runs on a small dedicated thread
+    pool (STORAGE_IO_THREADS) instead of the event loop or the default
+    executor. Large objects are streamed in STORAGE_CHUNK_SIZE pieces
+    (put_blob() from a file object, download_stream()) so they are never
+    held in memory whole.
+
+    Uploaded files are content-addressed (put_blob): one object per distinct
+    sha256, shared by every UploadedFile row with that hash.
+    """
     def __init__(self):
         self.storage_type = settings.STORAGE_TYPE
         self.local_path = settings.LOCAL_STORAGE_PATH
         self.bucket_name = settings.GCS_BUCKET_NAME
+        self.chunk_size = settings.STORAGE_CHUNK_SIZE
         self.client = None
-        
-        if self.storage_type == "gcs" and GCS_AVAILABLE and settings.GOOGLE_APPLICATION_CREDENTIALS:
+        self._io = ThreadPoolExecutor(max_workers=settings.STORAGE_IO_THREADS, thread_name_prefix="storage-io")
+
+        if self.storage_type == "gcs" and GCS_AVAILABLE and settings.STORAGE_EMULATOR_HOST:
+            # fake-gcs-server (tests/local dev): the client reads this env var
+            os.environ["STORAGE_EMULATOR_HOST"] = settings.STORAGE_EMULATOR_HOST
+            try:
+                self.client = storage.Client(credentials=AnonymousCredentials(), project="emulator")
+            except Exception as e:
+                print(f"Failed to init GCS emulator client: {e}")
+        elif self.storage_type == "gcs" and GCS_AVAILABLE and settings.GOOGLE_APPLICATION_CREDENTIALS:
             try:
                 self.client = storage.Client()
             except Exception as e:
                 print(f"Failed to init GCS client: {e}")
-        
+
         # Ensure local storage path exists
         if self.storage_type == "local":
             if not os.path.exists(self.local_path):
                 os.makedirs(self.local_path)
                 print(f"Created local storage directory: {self.local_path}")
 
+    @property
+    def _use_gcs(self) -> bool:
+        return self.storage_type == "gcs" and self.client is not None
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._io, functools.partial(fn, *args, **kwargs))
+
+    def _blob(self, bucket_path: str):
+        return self.client.bucket(self.bucket_name).blob(bucket_path, chunk_size=self.chunk_size)
+
+    def _local_file(self, bucket_path: str) -> str:
+        return os.path.join(self.local_path, bucket_path)
+
+    def _write_local(self, bucket_path: str, file_bytes: bytes):
+        # Write to a temp name and rename, so readers never see a partial file
+        file_path = self._local_file(bucket_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(file_bytes)
+        os.replace(tmp_path, file_path)
+
+    def _read_local(self, bucket_path: str) -> bytes:
+        file_path = self._local_file(bucket_path)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found in storage: {bucket_path}")
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    def _delete_local(self, bucket_path: str) -> bool:
+        file_path = self._local_file(bucket_path)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            return True
+        return False
+
     async def upload_file(self, file_bytes: bytes, filename: str, content_type: str) -> Dict[str, str]:
         """
-        Uploads file to GCS (or mocks it).
+        Uploads file to GCS (or local storage).
         Returns dict with 'bucket_path'.
         """
         unique_name = f"{uuid.uuid4().hex}-{filename}"
-        
-        if self.storage_type == "gcs" and self.client:
+
+        if self._use_gcs:
             try:
-                bucket = self.client.bucket(self.bucket_name)
-                blob = bucket.blob(unique_name)
-                
-                # Upload
-                blob.upload_from_string(
-                    file_bytes,
-                    content_type=content_type
-                )
-                
-                return {
-                    "bucket_path": unique_name
-                }
+                await self._run(self._blob(unique_name).upload_from_string, file_bytes, content_type=content_type)
             except Exception as e:
                 print(f"GCS Upload Error: {e}")
                 raise e
-        
-        # Local Storage behavior
-        file_path = os.path.join(self.local_path, unique_name)
-        with open(file_path, "wb") as f:
-            f.write(file_bytes)
-            
+        else:
+            await self._run(self._write_local, unique_name, file_bytes)
+
         return {
             "bucket_path": unique_name
         }
 
-    async def download_file(self, bucket_path: str) -> bytes:
+    @staticmethod
+    def blob_path(content_hash: str) -> str:
+        return f"blobs/{content_hash[:2]}/{content_hash}"
+
+    def _put_gcs_blob(self, bucket_path: str, source: IO[bytes], content_type: str) -> bool:
+        try:
+            # Resumable upload in chunk_size pieces; only creates the object if it does not exist yet
+            self._blob(bucket_path).upload_from_file(source, content_type=content_type, if_generation_match=0)
+            return True
+        except PreconditionFailed:
+            return False
+
+    def _put_local_blob(self, bucket_path: str, source: IO[bytes]) -> bool:
+        file_path = self._local_file(bucket_path)
+        if os.path.exists(file_path):
+            return False
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(source, f, self.chunk_size)
+        os.replace(tmp_path, file_path)
+        return True
+
+    async def blob_exists(self, bucket_path: str) -> bool:
+        if self._use_gcs:
+            return await self._run(self._blob(bucket_path).exists)
+        return await self._run(os.path.exists, self._local_file(bucket_path))
+
+    async def put_blob(self, content_hash: str, source: IO[bytes], content_type: str) -> Dict[str, Any]:
         """
-        Download file from storage.
+        Streams the content from source (a file object positioned at the
+        start) to its sha256-derived path, skipping the transfer when that
+        blob already exists.
+        Returns dict with 'bucket_path' and 'uploaded'.
         """
-        if self.storage_type == "gcs" and self.client and not bucket_path.startswith("mock/"):
+        bucket_path = self.blob_path(content_hash)
+        if await self.blob_exists(bucket_path):
+            return {"bucket_path": bucket_path, "uploaded": False}
+
+        if self._use_gcs:
             try:
-                bucket = self.client.bucket(self.bucket_name)
-                blob = bucket.blob(bucket_path)
-                return blob.download_as_bytes()
+                uploaded = await self._run(self._put_gcs_blob, bucket_path, source, content_type)
             except Exception as e:
+                print(f"GCS Upload Error: {e}")
                 raise e
-        
-        # Local Storage behavior
-        file_path = os.path.join(self.local_path, bucket_path)
-        if os.path.exists(file_path):
-            with open(file_path, "rb") as f:
-                return f.read()
-        
-        raise FileNotFoundError(f"File not found in storage: {bucket_path}")
+        else:
+            uploaded = await self._run(self._put_local_blob, bucket_path, source)
+        return {"bucket_path": bucket_path, "uploaded": uploaded}
+
+    async def download_file(self, bucket_path: str) -> bytes:
+        """
+        Download file from storage.
+        """
+        if self._use_gcs and not bucket_path.startswith("mock/"):
+            return await self._run(self._blob(bucket_path).download_as_bytes)
+
+        return await self._run(self._read_local, bucket_path)
 
-    def generate_signed_url(self, bucket_path: str, expires_minutes: int = 15) -> Optional[str]:
+    async def download_stream(self, bucket_path: str) -> AsyncIterator[bytes]:
+        """
+        Yields the object in chunk_size pieces.
+        """
+        if self._use_gcs and not bucket_path.startswith("mock/"):
+            reader = await self._run(self._blob(bucket_path).open, "rb")
+        else:
+            file_path = self._local_file(bucket_path)
+            if not await self._run(os.path.exists, file_path):
+                raise FileNotFoundError(f"File not found in storage: {bucket_path}")
+            reader = await self._run(open, file_path, "rb")
+
+        try:
+            while True:
+                chunk = await self._run(reader.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await self._run(reader.close)
+
+    def generate_signed_url(self, bucket_path: str, expires_minutes: int = 15, filename: Optional[str] = None) -> Optional[str]:
         """
         Generates a V4 Signed URL for temporary access.
+        Signing is local (no network call), so this stays synchronous.
+        Shared blobs have no filename of their own, so pass the user's.
         """
-        if self.storage_type == "gcs" and self.client:
+        if self._use_gcs and not settings.STORAGE_EMULATOR_HOST:
             try:
                 bucket = self.client.bucket(self.bucket_name)
                 blob = bucket.blob(bucket_path)
-                
+
                 url = blob.generate_signed_url(
                     version="v4",
                     expiration=timedelta(minutes=expires_minutes),
                     method="GET",
                     # allows browsers to display inline if content-type matches
-                    response_disposition="inline" 
+                    response_disposition=f'inline; filename="{filename}"' if filename else "inline"
                 )
                 return url
             except Exception as e:
                 print(f"Signed URL Generation Error: {e}")
                 return None
-        
+
         # Local Storage behavior: Return a simple local path or a relative URL
         # We return a path that our backend can serve
         # If the frontend is on 5173 and backend on 8000, we can point to /api/v1/files/download/{bucket_path}
@@ -114,24 +223,19 @@ class StorageService:
 
     async def delete_file(self, bucket_path: str) -> bool:
         """
-        Deletes file from GCS.
+        Deletes file from storage.
         """
-        if self.storage_type == "gcs" and self.client:
+        if self._use_gcs:
             try:
-                bucket = self.client.bucket(self.bucket_name)
-                blob = bucket.blob(bucket_path)
-                blob.delete()
+                await self._run(self._blob(bucket_path).delete)
                 return True
             except Exception as e:
                 print(f"GCS Delete Error: {e}")
                 return False
-        
-        # Local Storage behavior
-        file_path = os.path.join(self.local_path, bucket_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            return True
-            
-        return False
+
+        return await self._run(self._delete_local, bucket_path)
+
+    def shutdown(self):
+        self._io.shutdown(wait=False)
 
 storage_service = StorageService()
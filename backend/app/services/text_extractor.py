@@ -2,61 +2,98 @@ import io
 import pypdf
 import docx
 import logging
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_CHARS = settings.EXTRACTION_MAX_CHARS
+
+@dataclass
+class ExtractionResult:
+    text: str
+    # False if the char budget or the page cap cut the document short
+    complete: bool
+    page_count: int = 0
+
+def _collect(chunks: Iterable[str], max_chars: int) -> ExtractionResult:
+    """
+    Whitespace-normalizes and joins chunks, stopping as soon as max_chars is reached.
+    """
+    parts = []
+    size = 0
+    for chunk in chunks:
+        chunk = " ".join(chunk.split())
+        if not chunk:
+            continue
+        parts.append(chunk)
+        size += len(chunk) + 1
+        if size > max_chars:
+            return ExtractionResult(" ".join(parts)[:max_chars], complete=False)
+    return ExtractionResult(" ".join(parts), complete=True)
+
 class TextExtractor:
-    def extract_text(self, file_bytes: bytes, filename: str) -> str:
+    def __init__(self, max_pages: int = 60):
+        self.max_pages = max_pages
+
+    def extract_text(self, file_bytes: bytes, filename: str, max_chars: int = DEFAULT_MAX_CHARS) -> str:
         """
         Extracts text from PDF or DOCX bytes.
         Cleanups whitespace.
-        Enforces 50k char limit.
+        Stops once max_chars (default 50k) have been collected.
+        """
+        return self.extract(file_bytes, filename, max_chars).text
+
+    def extract(
+        self,
+        file_bytes: bytes,
+        filename: str,
+        max_chars: int = DEFAULT_MAX_CHARS,
+        page_start: int = 0,
+        page_stop: Optional[int] = None,
+    ) -> ExtractionResult:
+        """
+        Like extract_text(), but reports whether the text is complete. For PDFs,
+        only pages [page_start, page_stop) are read, so long documents can be
+        split across workers.
         """
-        text = ""
         filename_lower = filename.lower()
-        
+
         try:
             if filename_lower.endswith(".pdf"):
-                text = self._extract_pdf(file_bytes)
+                return self._extract_pdf(file_bytes, max_chars, page_start, page_stop)
             elif filename_lower.endswith(".docx"):
-                text = self._extract_docx(file_bytes)
+                return self._extract_docx(file_bytes, max_chars)
             elif filename_lower.endswith(".txt"):
-                text = file_bytes.decode("utf-8", errors="ignore")
+                return _collect([file_bytes.decode("utf-8", errors="ignore")], max_chars)
             else:
                 raise ValueError("Unsupported file format for text extraction")
-                
-            # Cleanup
-            text = " ".join(text.split()) # Normalize whitespace
-            
-            # Limit length
-            if len(text) > 50000:
-                logger.warning(f"Text too long ({len(text)} chars). Truncating to 50k.")
-                text = text[:50000]
-                
-            return text
-            
+
         except Exception as e:
             logger.error(f"Text extraction failed: {e}")
             raise e
 
-    def _extract_pdf(self, file_bytes: bytes) -> str:
-        text = ""
+    def _extract_pdf(self, file_bytes: bytes, max_chars: int, page_start: int, page_stop: Optional[int]) -> ExtractionResult:
         try:
             reader = pypdf.PdfReader(io.BytesIO(file_bytes))
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+            page_count = len(reader.pages)
+            stop = min(page_count, self.max_pages, page_stop if page_stop is not None else page_count)
+            # Pages are parsed lazily, so nothing past the budget is ever read
+            result = _collect((reader.pages[i].extract_text() or "" for i in range(page_start, stop)), max_chars)
         except Exception as e:
             raise ValueError(f"PDF extraction error: {e}")
-        return text
+        if stop < page_count and (page_stop is None or page_stop > stop):
+            logger.warning(f"PDF has {page_count} pages; only the first {self.max_pages} are extracted.")
+            result.complete = False
+        result.page_count = page_count
+        return result
 
-    def _extract_docx(self, file_bytes: bytes) -> str:
-        text = ""
+    def _extract_docx(self, file_bytes: bytes, max_chars: int) -> ExtractionResult:
         try:
             doc = docx.Document(io.BytesIO(file_bytes))
-            for para in doc.paragraphs:
-                text += para.text + "\n"
+            return _collect((para.text for para in doc.paragraphs), max_chars)
         except Exception as e:
              raise ValueError(f"DOCX extraction error: {e}")
-        return text
 
-text_extractor = TextExtractor()
+text_extractor = TextExtractor(max_pages=settings.EXTRACTION_MAX_PAGES)
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass
+import json
+from typing import IO, Dict
+from fastapi import UploadFile
+from app.core.config import settings
+
+class UploadTooLarge(ValueError):
+    """The upload exceeded its byte limit; reading stopped at the limit."""
+    status_code = 413
+
+@dataclass
+class IngestedUpload:
+    file: IO[bytes]  # rewound, ready to be streamed to storage
+    size: int
+    sha256: str
+
+    def close(self):
+        self.file.close()
+
+async def ingest_upload(upload: UploadFile, max_bytes: int) -> IngestedUpload:
+    """
+    Reads an upload in UPLOAD_CHUNK_SIZE chunks, hashing as it goes and
+    stopping as soon as max_bytes is exceeded. Starlette has already received
+    the whole body by now (UploadSizeLimitMiddleware refuses oversized ones
+    earlier), so this bounds memory rather than network reads: the content
+    is kept in a spooled temp file that moves to disk past
+    UPLOAD_SPOOL_MAX_BYTES, about one chunk plus the spool threshold.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"File too large. Max size is {max_bytes // (1024 * 1024)}MB.")
+            digest.update(chunk)
+            if size > settings.UPLOAD_SPOOL_MAX_BYTES:
+                # On disk now: keep the write off the event loop
+                await asyncio.to_thread(spool.write, chunk)
+            else:
+                spool.write(chunk)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return IngestedUpload(file=spool, size=size, sha256=digest.hexdigest())
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects oversized multipart uploads from their Content-Length header,
+    before Starlette reads and spools the body for the handler's UploadFile.
+    `limits` maps a path to its file limit; UPLOAD_FORM_OVERHEAD_BYTES is
+    allowed on top for the other form fields and multipart framing.
+    ingest_upload() still enforces the exact file size.
+    """
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def _reject(self, send, status: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope.get("path")) if scope["type"] == "http" and scope.get("method") == "POST" else None
+        if max_bytes is None:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        length = headers.get(b"content-length")
+        if length is None or not length.isdigit():
+            # Chunked bodies would have to be read to be measured
+            return await self._reject(send, 411, "Content-Length required.")
+        if int(length) > max_bytes + settings.UPLOAD_FORM_OVERHEAD_BYTES:
+            return await self._reject(send, 413, f"File too large. Max size is {max_bytes // (1024 * 1024)}MB.")
+        await self.app(scope, receive, send)
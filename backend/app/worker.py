@@ -2,12 +2,18 @@ import asyncio
 import time
 import json
 import uuid
+from typing import Dict, List, Tuple
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
-from app.core.database import SessionLocal
+from sqlalchemy import select, update, func, text
+from datetime import datetime, timedelta, timezone
+from app.core.database import SessionLocal, use_worker_pool
 from app.core.config import settings
 from app.models.ai_job import AIJob, JobStatus
 from app.services.ai_queue import queue_service
+from app.core.redis import close_redis
+from app.services.ai_retry import get_retry_policy, is_retryable
+from app.services.job_events import job_event_service, ai_job_event, application_event
 
 import logging
 from app.core.logging import setup_logging
@@ -15,14 +21,33 @@ from app.core.logging import setup_logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
-from app.services.llm.factory import get_llm_provider
-from app.services.text_extractor import text_extractor
+from app.services.llm.factory import get_llm_provider, close_llm_providers
+from app.services.llm.cache import llm_cache
+from app.services.extraction_pool import extraction_pool
+from app.services.document_text import document_text_service
 from app.services.storage import storage_service
+from app.services.blob_cache import blob_cache
+from app.services.job_index import job_index
+from app.services.skills_index import skills_index, canonical_skills
+from app.services.job_vectors import job_vector_index
+from app.services.application_ranks import application_rank_service
 from app.models.file import UploadedFile
 from app.models.job import Job
 from app.models.application import Application
 from app.models.resume import Resume
 
+async def resume_text_for(uploaded_file: UploadedFile, max_chars: int) -> str:
+    async def download() -> bytes:
+        return await blob_cache.fetch(
+            uploaded_file.bucket_path,
+            lambda: storage_service.download_file(uploaded_file.bucket_path),
+            uploaded_file.content_hash,
+        )
+
+    if not uploaded_file.content_hash:
+        return await document_text_service.get_text_for_bytes(await download(), uploaded_file.original_filename, max_chars=max_chars)
+    return await document_text_service.get_text(uploaded_file.content_hash, uploaded_file.original_filename, download, max_chars)
+
 async def process_resume_analysis(job: AIJob, db: AsyncSession) -> dict:
     """
     1. Fetch File path from DB (via input_ref = file_id)
@@ -37,11 +62,9 @@ async def process_resume_analysis(job: AIJob, db: AsyncSession) -> dict:
     if not uploaded_file:
         raise ValueError("Referenced file not found in DB")
         
-    # Download
-    file_bytes = await storage_service.download_file(uploaded_file.bucket_path)
-    
-    # Extract
-    text = text_extractor.extract_text(file_bytes, uploaded_file.original_filename)
+    # Extract (downloads from storage only if this content was never parsed)
+    # analyze_resume reads the first 20k characters
+    text = await resume_text_for(uploaded_file, max_chars=20000)
     
     # LLM
     llm = get_llm_provider()
@@ -62,6 +85,9 @@ async def process_application_scoring(job: AIJob, db: AsyncSession) -> dict:
     result = await db.execute(select(Application).where(Application.id == app_id))
     application = result.scalars().first()
     if not application: raise ValueError("Application not found")
+    if application.processing_state == "scored":
+        # Already scored by a bulk run for the job (re-scoring sets "processing" first)
+        return {"skipped": True, "processing_state": application.processing_state}
 
     # 2. Fetch Resume Text
     resume_result = await db.execute(select(Resume).where(Resume.id == application.resume_id))
@@ -96,20 +122,145 @@ async def process_application_scoring(job: AIJob, db: AsyncSession) -> dict:
     if not match_result:
         score = 0
     else:
-        score = match_result[0].get("score", 0)
+        # The prompt asks for "match_score"; older cached results used "score"
+        score = int(match_result[0].get("match_score", match_result[0].get("score", 0)) or 0)
 
-    # 5. Update Application
+    # 5. Update Application; its rank is exact among the job's scored applicants
+    ranks = await application_rank_service.record(db, application.job_id, {application.id: score})
+    db.info.setdefault("rank_dirty_jobs", set()).add(application.job_id)
     application.match_score = score
-    # Simple rank estimation: 100 - score (just for demo logic, real rank involves comparing peers)
-    application.rank = max(1, 101 - score) 
+    application.rank = ranks[application.id]
     application.processing_state = "scored"
     application.updated_at = func.now()
+    application.version += 1
     
     db.add(application)
-    # Commit happens in the main loop
+    # Commit happens in the main loop; the event is published once it lands
+    db.info.setdefault("job_events", []).append(application_event(application))
+    # Peers it overtook are re-ranked by the materializer (or now, without Redis)
+    db.info["job_events"].extend(application_event(row) for row in await application_rank_service.settle(db, application.job_id))
     
     return {"score": score, "analysis": match_result}
 
+_BULK_SCORE_UPDATE = text("""
+    UPDATE applications AS a
+    SET match_score = v.score, processing_state = 'scored', last_error = NULL,
+        updated_at = now(), version = a.version + 1
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:scores AS integer[]), CAST(:versions AS integer[]))
+        AS v(id, score, version)
+    WHERE a.id = v.id AND a.version = v.version
+    RETURNING a.id, a.match_score
+""")
+
+# Same transaction as _BULK_SCORE_UPDATE, so the version is not bumped twice
+_BULK_RANK_UPDATE = text("""
+    UPDATE applications AS a
+    SET rank = v.rank
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:ranks AS integer[])) AS v(id, rank)
+    WHERE a.id = v.id
+    RETURNING a.id, a.user_id, a.status, a.processing_state, a.match_score, a.rank, a.last_error, a.version
+""")
+
+def _calibrate_local_scores(local: Dict[uuid.UUID, float], llm: Dict[uuid.UUID, int]) -> Dict[uuid.UUID, int]:
+    """
+    Maps local pre-scores onto the LLM's 0-100 scale with a monotone linear
+    fit over the applicants that have both.
+    """
+    x = np.array([local[app_id] for app_id in llm], dtype=np.float64)
+    y = np.array(list(llm.values()), dtype=np.float64)
+    slope = float(np.polyfit(x, y, 1)[0]) if len(x) >= 2 and x.std() > 0 else 0.0
+    if slope <= 0:
+        # Too few or uninformative pairs: keep the local spread, shift it to the LLM's mean
+        slope = 1.0
+    intercept = y.mean() - slope * x.mean()
+    return {app_id: max(0, min(100, int(round(slope * score + intercept)))) for app_id, score in local.items()}
+
+async def process_bulk_application_scoring(job: AIJob, db: AsyncSession) -> dict:
+    """
+    Scores every pending application for one job (input_ref = Job id):
+    1. One joined query for the applications and their resumes
+    2. Local pre-score (skill overlap + embedding similarity) for all of them
+    3. The top BULK_SCORING_LLM_TOP_N are re-scored by the LLM, several resumes per
+       call; the rest get their pre-score calibrated to the LLM's scale
+    4. One UPDATE writes every score back, a second their ranks
+    """
+    target_job = (await db.execute(select(Job).where(Job.id == uuid.UUID(job.input_ref)))).scalars().first()
+    if not target_job: raise ValueError("Job not found")
+
+    rows = (await db.execute(
+        select(Application.id, Application.version, Resume.content)
+        .join(Resume, Resume.id == Application.resume_id)
+        .where(Application.job_id == target_job.id, Application.processing_state == "pending")
+    )).all()
+    if not rows:
+        return {"scored": 0}
+
+    jd_text = f"{target_job.title}\n{target_job.description}\n{target_job.skills}"
+    resumes = [json.dumps(row.content) for row in rows]
+
+    # 2. Local pre-score, vectorized over all applicants
+    await skills_index.ensure_loaded(db)
+    job_skills = canonical_skills(target_job.skills)
+    vectors = await job_vector_index.embed_texts([jd_text] + resumes)
+    similarity = np.clip(vectors[1:] @ vectors[0], 0.0, 1.0)
+    overlap = np.array([
+        len(job_skills & skills_index.extract(resume)) / max(len(job_skills), 1) for resume in resumes
+    ])
+    local = {row.id: 100 * (0.5 * overlap[i] + 0.5 * similarity[i]) for i, row in enumerate(rows)}
+
+    # 3. LLM re-score of the strongest applicants, BULK_SCORING_BATCH_SIZE resumes per call
+    llm_scores = {}
+    if settings.BULK_SCORING_LLM_RERANK:
+        order = sorted(range(len(rows)), key=lambda i: -local[rows[i].id])[:settings.BULK_SCORING_LLM_TOP_N]
+        size = settings.BULK_SCORING_BATCH_SIZE
+        batches = [order[i:i + size] for i in range(0, len(order), size)]
+        llm = get_llm_provider()
+        slots = asyncio.Semaphore(settings.BULK_SCORING_LLM_CONCURRENCY)
+
+        async def score_batch(batch):
+            async with slots:
+                return await llm.score_candidates(jd_text, [{"id": str(rows[i].id), "resume": resumes[i]} for i in batch])
+
+        for batch, result in zip(batches, await asyncio.gather(*[score_batch(b) for b in batches], return_exceptions=True)):
+            if isinstance(result, Exception):
+                # These applicants keep a calibrated pre-score rather than failing the whole job
+                logger.warning(f"Bulk scoring batch failed for job {target_job.id}: {result}")
+                continue
+            by_id = {str(item.get("id")): item for item in result if isinstance(item, dict)}
+            for i in batch:
+                item = by_id.get(str(rows[i].id))
+                if item is not None and item.get("match_score") is not None:
+                    llm_scores[rows[i].id] = max(0, min(100, int(item["match_score"])))
+
+    # Everyone else keeps a local score mapped onto the LLM's scale, so all of
+    # them can share match_score and the ranks built from it
+    if llm_scores:
+        scores = {**_calibrate_local_scores(local, llm_scores), **llm_scores}
+    else:
+        scores = {app_id: int(round(score)) for app_id, score in local.items()}
+
+    # 4. One bulk UPDATE; rows changed concurrently (version moved on) are skipped.
+    # Only the rows it wrote enter the rank index, then get their ranks.
+    ids = [row.id for row in rows]
+    written = (await db.execute(_BULK_SCORE_UPDATE, {
+        "ids": ids,
+        "scores": [scores[i] for i in ids],
+        "versions": [row.version for row in rows],
+    })).all()
+    updated = []
+    if written:
+        ranks = await application_rank_service.record(db, target_job.id, {row.id: row.match_score for row in written})
+        db.info.setdefault("rank_dirty_jobs", set()).add(target_job.id)
+        updated = (await db.execute(_BULK_RANK_UPDATE, {
+            "ids": list(ranks),
+            "ranks": list(ranks.values()),
+        })).all()
+    # Commit happens in the main loop; the events are published once it lands
+    db.info.setdefault("job_events", []).extend(application_event(row) for row in updated)
+    db.info["job_events"].extend(application_event(row) for row in await application_rank_service.settle(db, target_job.id))
+
+    return {"scored": len(updated), "llm_scored": len(llm_scores), "skipped": len(rows) - len(updated)}
+
 async def process_job_matching(job: AIJob, db: AsyncSession) -> dict:
     # 1. Fetch File (resume)
     # This logic assumes input_ref points to a resume payload or ID.
@@ -123,21 +274,63 @@ async def process_job_matching(job: AIJob, db: AsyncSession) -> dict:
          result = await db.execute(select(UploadedFile).where(UploadedFile.id == file_id))
          uploaded_file = result.scalars().first()
          if not uploaded_file: raise ValueError("Resume not found")
-         file_bytes = await storage_service.download_file(uploaded_file.bucket_path)
-         resume_text = text_extractor.extract_text(file_bytes, uploaded_file.original_filename)
+         # match_jobs reads the first 10k characters
+         resume_text = await resume_text_for(uploaded_file, max_chars=10000)
     else:
         resume_text = "Placeholder resume text" 
         
-    # Fetch Jobs
-    jobs_result = await db.execute(select(Job).limit(20)) # Fetch 20 jobs
-    jobs = jobs_result.scalars().all()
-    jobs_data = [{"id": str(j.id), "title": j.title, "description": j.description} for j in jobs]
+    # Retrieve and score the most relevant jobs locally; the LLM at most re-ranks this shortlist
+    candidates = await hybrid_candidates(db, resume_text, settings.JOB_MATCH_CANDIDATES)
+    if not candidates:
+        # Nothing overlaps the resume (or no text): fall back to the newest jobs
+        jobs_result = await db.execute(select(Job).order_by(Job.created_at.desc()).limit(settings.JOB_MATCH_CANDIDATES))
+        candidates = [(j, 0.0) for j in jobs_result.scalars().all()]
+    await skills_index.ensure_loaded(db)
+    resume_skills = skills_index.extract(resume_text)
+    jobs_data = [
+        {
+            "id": str(j.id), "title": j.title, "description": j.description, "skills": j.skills,
+            "retrieval_score": round(score, 4),
+            "matched_skills": sorted(skills_index.job_skills(j.id) & resume_skills),
+        }
+        for j, score in candidates
+    ]
+
+    if not settings.JOB_MATCH_LLM_RERANK:
+        matches = [
+            {
+                "job_id": j["id"],
+                "match_score": round(j["retrieval_score"] * 100),
+                "reason": f"Matching skills: {', '.join(j['matched_skills'])}" if j["matched_skills"] else "Similar role and description",
+            }
+            for j in jobs_data
+        ]
+        return {"matches": matches, "ranked_by": "local"}
     
     llm = get_llm_provider()
     matches = await llm.match_jobs(resume_text, jobs_data)
     
     return {"matches": matches}
 
+async def hybrid_candidates(db: AsyncSession, text: str, k: int) -> List[Tuple[Job, float]]:
+    """
+    Top-k jobs by a blend of lexical (BM25 + skill overlap) and semantic
+    (embedding cosine) scores, best first.
+    """
+    lexical = dict(await job_index.search(db, text, k))
+    semantic = dict(await job_vector_index.search_text(text, k))
+    weight = settings.JOB_MATCH_SEMANTIC_WEIGHT
+    scores = {
+        job_id: (1 - weight) * lexical.get(job_id, 0.0) + weight * max(semantic.get(job_id, 0.0), 0.0)
+        for job_id in lexical.keys() | semantic.keys()
+    }
+    ranked = sorted((job_id for job_id in scores if scores[job_id] > 0), key=lambda job_id: -scores[job_id])[:k]
+    if not ranked:
+        return []
+    result = await db.execute(select(Job).where(Job.id.in_(ranked)))
+    by_id = {job.id: job for job in result.scalars().all()}
+    return [(by_id[job_id], scores[job_id]) for job_id in ranked if job_id in by_id]
+
 def is_uuid(val):
     try:
         uuid.UUID(str(val))
@@ -145,72 +338,371 @@ def is_uuid(val):
     except:
         return False
 
-async def worker_loop():
-    logger.info("Worker started. Listening for jobs...")
+JOB_HANDLERS = {
+    "resume_analysis": process_resume_analysis,
+    "application_scoring": process_application_scoring,
+    "bulk_application_scoring": process_bulk_application_scoring,
+    "job_matching": process_job_matching,
+}
+
+async def process_job(job_data: dict):
+    """
+    Claims and runs a single dequeued job in its own DB session.
+    """
+    job_id = job_data.get("job_id")
+    job_type = job_data.get("job_type")
+
+    logger.info(f"Picked Job {job_id} ({job_type})", extra={"job_id": job_id})
+
+    async with SessionLocal() as db:
+        stmt = (
+            update(AIJob)
+            .where(AIJob.id == job_id)
+            .where(AIJob.status == JobStatus.PENDING)
+            .values(status=JobStatus.PROCESSING, version=AIJob.version + 1, started_at=func.now())
+            .execution_options(synchronize_session="fetch")
+        )
+        result = await db.execute(stmt)
+        await db.commit()
+
+        if result.rowcount == 0:
+            return
+
+        # Fetch fresh job
+        job_result = await db.execute(select(AIJob).where(AIJob.id == job_id))
+        job = job_result.scalars().first()
+        await job_event_service.publish(ai_job_event(job))
+
+        try:
+            start_time = time.time()
+
+            handler = JOB_HANDLERS.get(job_type)
+            if handler is None:
+                raise ValueError("Unknown job type")
+            result_data = await handler(job, db)
+
+            duration = time.time() - start_time
+
+            job.status = JobStatus.COMPLETED
+            job.result_json = result_data
+            job.version += 1
+            job.finished_at = func.now()
+
+            logger.info(f"Job {job_id} Completed", extra={"job_id": job_id, "duration": duration})
+
+        except Exception as e:
+            # Discard whatever the handler half-wrote before recording the failure.
+            await db.rollback()
+            db.info.pop("job_events", None)
+            await application_rank_service.invalidate(db.info.pop("rank_dirty_jobs", ()))
+            await db.refresh(job)
+            await handle_job_failure(job, job_data, e, db)
+            return
+
+        await db.commit()
+        await job_event_service.publish(ai_job_event(job))
+        await job_event_service.publish_many(db.info.pop("job_events", []))
+        # Only now can the materializer see the new scores
+        await application_rank_service.mark_dirty(db.info.pop("rank_dirty_jobs", ()))
+
+async def handle_job_failure(job: AIJob, job_data: dict, error: Exception, db: AsyncSession):
+    """
+    Retryable errors go back to PENDING and into the delayed queue with backoff.
+    Fatal errors, or retryable ones past the policy's max_attempts, mark the
+    job FAILED and dead-letter it.
+    """
+    job_id = job_data.get("job_id")
+    attempt = int(job_data.get("attempt", 1))
+    policy = get_retry_policy(job.job_type)
+
+    if is_retryable(error) and attempt < policy.max_attempts:
+        delay = policy.backoff(attempt)
+        logger.warning(
+            f"Job {job_id} attempt {attempt}/{policy.max_attempts} failed: {error}. Retrying in {delay:.1f}s",
+            extra={"job_id": job_id}
+        )
+        job.status = JobStatus.PENDING
+        job.error = f"Attempt {attempt} failed: {error}"
+        job.started_at = None
+        job.version += 1
+        await db.commit()
+        await job_event_service.publish(ai_job_event(job))
+        await queue_service.schedule_retry({**job_data, "attempt": attempt + 1}, delay)
+        return
+
+    reason = "retries_exhausted" if is_retryable(error) else "fatal"
+    logger.error(f"Job Failed ({reason}): {error}", exc_info=error, extra={"job_id": job_id})
+    job.status = JobStatus.FAILED
+    job.error = str(error)
+    job.version += 1
+    job.finished_at = func.now()
+    await db.commit()
+    await job_event_service.publish(ai_job_event(job))
+    await queue_service.dead_letter(job_data, str(error), reason)
+
+class JobConcurrencyLimiter:
+    """
+    Bounds in-flight jobs: a global cap for the process plus a cap per job_type.
+    The global slot is taken before dequeueing so the worker never pulls more
+    jobs off the queue than it can run; a job whose type is at its cap is
+    deferred instead of holding a global slot while it waits.
+    """
+    def __init__(self, max_concurrency: int, per_type: dict):
+        self.max_concurrency = max(1, max_concurrency)
+        self.global_slots = asyncio.Semaphore(self.max_concurrency)
+        self.type_slots = {
+            job_type: asyncio.Semaphore(max(1, min(limit, self.max_concurrency)))
+            for job_type, limit in per_type.items()
+        }
+        self._default_type_slots = asyncio.Semaphore(self.max_concurrency)
+
+    def for_type(self, job_type: str) -> asyncio.Semaphore:
+        return self.type_slots.get(job_type, self._default_type_slots)
+
+async def run_job(job_data: dict, limiter: JobConcurrencyLimiter, type_slots: asyncio.Semaphore):
+    """
+    Runs a job holding a global and a per-type slot, both acquired by the caller.
+    """
+    job_id = job_data.get("job_id")
+    try:
+        await process_job(job_data)
+        await queue_service.ack_job(job_id)
+    except Exception as e:
+        # Not acked: the lease lapses and the reaper re-delivers the job.
+        logger.error(f"Worker Error: {e}", exc_info=True, extra={"job_id": job_id})
+        queue_service.release_job(job_id)
+    finally:
+        type_slots.release()
+        limiter.global_slots.release()
+
+async def reap_stale_jobs():
+    """
+    Re-delivers jobs whose lease expired and resets ai_jobs rows left in
+    PROCESSING by a worker that died before committing.
+    """
+    reclaimed = []
+    exhausted = []
+    for job_data in await queue_service.reclaim_expired():
+        # A delivery that outlived its lease counts as an attempt, so a job that
+        # keeps killing workers ends up dead-lettered instead of looping forever.
+        attempt = int(job_data.get("attempt", 1))
+        if attempt >= get_retry_policy(job_data.get("job_type")).max_attempts:
+            exhausted.append(job_data)
+        else:
+            reclaimed.append({**job_data, "attempt": attempt + 1})
+
+    async with SessionLocal() as db:
+        if exhausted:
+            failed = await db.execute(
+                update(AIJob)
+                .where(AIJob.id.in_([uuid.UUID(str(j["job_id"])) for j in exhausted]))
+                .where(AIJob.status == JobStatus.PROCESSING)
+                .values(
+                    status=JobStatus.FAILED,
+                    error="Worker lease expired too many times",
+                    version=AIJob.version + 1,
+                    finished_at=func.now()
+                )
+                .returning(AIJob.id, AIJob.user_id, AIJob.status, AIJob.version, AIJob.error)
+                .execution_options(synchronize_session=False)
+            )
+            failed_rows = failed.all()
+            await db.commit()
+            await job_event_service.publish_many([ai_job_event(row) for row in failed_rows])
+            # A job that finished as its lease expired is no longer PROCESSING;
+            # only rows the guarded UPDATE failed go to the dead-letter queue.
+            failed_ids = {str(row.id) for row in failed_rows}
+            for job_data in exhausted:
+                if str(job_data["job_id"]) not in failed_ids:
+                    continue
+                await queue_service.dead_letter(job_data, "Worker lease expired too many times", "retries_exhausted")
+
+        if reclaimed:
+            # Reset rows before the payload is visible again, otherwise the claim would skip it.
+            reset = await db.execute(
+                update(AIJob)
+                .where(AIJob.id.in_([uuid.UUID(str(j["job_id"])) for j in reclaimed]))
+                .where(AIJob.status == JobStatus.PROCESSING)
+                .values(status=JobStatus.PENDING, version=AIJob.version + 1, started_at=None)
+                .returning(AIJob.id, AIJob.user_id, AIJob.status, AIJob.version, AIJob.error)
+                .execution_options(synchronize_session=False)
+            )
+            reset_rows = reset.all()
+            await db.commit()
+            await job_event_service.publish_many([ai_job_event(row) for row in reset_rows])
+            reset_ids = {str(row.id) for row in reset_rows}
+            redelivered = [j for j in reclaimed if str(j["job_id"]) in reset_ids]
+            for job_data in redelivered:
+                await queue_service.requeue_job(job_data)
+            logger.warning(f"Reaper: re-delivered {len(redelivered)} jobs with expired leases")
+
+        # Rows stuck in PROCESSING with no live lease lost their queue payload entirely.
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.AI_JOB_STALE_AFTER_SECONDS)
+        result = await db.execute(
+            select(AIJob.id)
+            .where(AIJob.status == JobStatus.PROCESSING)
+            .where(AIJob.started_at < cutoff)
+            .limit(500)
+        )
+        stale_ids = [i for i in result.scalars().all() if not await queue_service.is_in_flight(str(i))]
+        if stale_ids:
+            # Same guard: a row that completed since the SELECT is left alone.
+            reset = await db.execute(
+                update(AIJob)
+                .where(AIJob.id.in_(stale_ids))
+                .where(AIJob.status == JobStatus.PROCESSING)
+                .values(status=JobStatus.PENDING, version=AIJob.version + 1, started_at=None)
+                .returning(
+                    AIJob.id, AIJob.user_id, AIJob.status, AIJob.version, AIJob.error,
+                    AIJob.job_type, AIJob.input_ref
+                )
+                .execution_options(synchronize_session=False)
+            )
+            stale_jobs = reset.all()
+            await db.commit()
+            await job_event_service.publish_many([ai_job_event(row) for row in stale_jobs])
+            for job in stale_jobs:
+                await queue_service.requeue_job({
+                    "job_id": str(job.id),
+                    "job_type": job.job_type,
+                    "input_ref": job.input_ref
+                })
+            logger.warning(f"Reaper: reset {len(stale_jobs)} stale PROCESSING jobs")
+
+async def heartbeat_loop():
+    interval = max(1, settings.QUEUE_VISIBILITY_TIMEOUT_SECONDS // 3)
+    while True:
+        try:
+            await queue_service.heartbeat()
+        except Exception as e:
+            logger.error(f"Heartbeat Error: {e}", exc_info=True)
+        await asyncio.sleep(interval)
+
+async def reaper_loop():
+    interval = settings.QUEUE_REAPER_INTERVAL_SECONDS
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await queue_service.acquire_reaper_lock(ttl=interval):
+                await reap_stale_jobs()
+        except Exception as e:
+            logger.error(f"Reaper Error: {e}", exc_info=True)
+
+async def retry_scheduler_loop():
     while True:
         try:
-            job_data = queue_service.dequeue_job()
-            
-            if job_data:
-                job_id = job_data.get("job_id")
-                job_type = job_data.get("job_type")
-                input_ref = job_data.get("input_ref")
-                
-                logger.info(f"Picked Job {job_id} ({job_type})", extra={"job_id": job_id})
-                
-                async with SessionLocal() as db:
-                    stmt = (
-                        update(AIJob)
-                        .where(AIJob.id == job_id)
-                        .where(AIJob.status == JobStatus.PENDING)
-                        .values(status=JobStatus.PROCESSING, version=AIJob.version + 1, started_at=func.now())
-                        .execution_options(synchronize_session="fetch")
-                    )
-                    result = await db.execute(stmt)
-                    await db.commit()
-                    
-                    if result.rowcount == 0:
-                        continue
-                        
-                    # Fetch fresh job
-                    job_result = await db.execute(select(AIJob).where(AIJob.id == job_id))
-                    job = job_result.scalars().first()
-                    
-                    try:
-                        start_time = time.time()
-                        
-                        if job_type == "resume_analysis":
-                            result_data = await process_resume_analysis(job, db)
-                        elif job_type == "application_scoring":
-                            result_data = await process_application_scoring(job, db)
-                        elif job_type == "job_matching":
-                            result_data = await process_job_matching(job, db)
-                        else:
-                            raise ValueError("Unknown job type")
-                        
-                        duration = time.time() - start_time
-                        
-                        job.status = JobStatus.COMPLETED
-                        job.result_json = result_data
-                        job.version += 1
-                        job.finished_at = func.now()
-                        
-                        logger.info(f"Job {job_id} Completed", extra={"job_id": job_id, "duration": duration})
-                        
-                    except Exception as e:
-                        logger.error(f"Job Failed: {e}", exc_info=True, extra={"job_id": job_id})
-                        job.status = JobStatus.FAILED
-                        job.error = str(e)
-                        job.version += 1
-                        job.finished_at = func.now()
-                        
-                    await db.commit()
-            
-            await asyncio.sleep(0.1)
-            
+            if not await queue_service.promote_due_retries():
+                await asyncio.sleep(1)
         except Exception as e:
-            logger.error(f"Worker Error: {e}", exc_info=True)
+            logger.error(f"Retry Scheduler Error: {e}", exc_info=True)
             await asyncio.sleep(5)
 
+async def embedding_backfill_loop():
+    """
+    Embeds jobs inserted without an embedding (or from another model), so
+    request paths only ever read the vector index.
+    """
+    while True:
+        try:
+            await job_vector_index.backfill()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Embedding Backfill Error: {e}", exc_info=True)
+        await asyncio.sleep(settings.JOB_INDEX_REFRESH_SECONDS)
+
+async def rank_materializer_loop():
+    """
+    Rewrites applications.rank for jobs whose scores changed, in batches.
+    """
+    while True:
+        job_ids = []
+        try:
+            job_ids = await application_rank_service.pop_dirty()
+            if not job_ids:
+                await asyncio.sleep(settings.APPLICATION_RANK_MATERIALIZE_SECONDS)
+                continue
+            async with SessionLocal() as db:
+                rows = await application_rank_service.materialize(db, job_ids)
+                await db.commit()
+            await job_event_service.publish_many([application_event(row) for row in rows])
+            logger.info(f"Materialized ranks for {len(job_ids)} jobs ({len(rows)} applications changed)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Rank Materializer Error: {e}", exc_info=True)
+            try:
+                await application_rank_service.mark_dirty(job_ids)
+            except Exception:
+                pass
+            await asyncio.sleep(5)
+
+async def worker_loop():
+    use_worker_pool()
+    limiter = JobConcurrencyLimiter(settings.WORKER_MAX_CONCURRENCY, settings.WORKER_JOB_CONCURRENCY)
+    in_flight: set = set()
+    logger.info(f"Worker started (max concurrency {limiter.max_concurrency}). Listening for jobs...")
+    await queue_service.ping()
+    await extraction_pool.warm_up()
+    llm_cache.start()
+    try:
+        async with SessionLocal() as db:
+            await skills_index.start(db)
+    except Exception as e:
+        logger.error(f"Skills index build failed (retried on first use): {e}")
+    background = [
+        asyncio.create_task(heartbeat_loop()),
+        asyncio.create_task(reaper_loop()),
+        asyncio.create_task(retry_scheduler_loop()),
+        asyncio.create_task(rank_materializer_loop()),
+        asyncio.create_task(embedding_backfill_loop()),
+    ]
+
+    try:
+        while True:
+            await limiter.global_slots.acquire()
+            try:
+                job_data = await queue_service.dequeue_job()
+            except Exception as e:
+                limiter.global_slots.release()
+                logger.error(f"Worker Error: {e}", exc_info=True)
+                await asyncio.sleep(5)
+                continue
+
+            if not job_data:
+                limiter.global_slots.release()
+                await asyncio.sleep(0.1)
+                continue
+
+            type_slots = limiter.for_type(job_data.get("job_type"))
+            if type_slots.locked():
+                # Its type is at its limit: hand it back rather than let it sit
+                # on a global slot that other job types could use
+                limiter.global_slots.release()
+                try:
+                    await queue_service.defer_job(job_data)
+                except Exception as e:
+                    # Still leased: the reaper re-delivers it once the lease lapses
+                    queue_service.release_job(job_data.get("job_id"))
+                    logger.error(f"Worker Error: {e}", exc_info=True)
+                await asyncio.sleep(0.1)
+                continue
+
+            await type_slots.acquire()
+            task = asyncio.create_task(run_job(job_data, limiter, type_slots))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    finally:
+        if in_flight:
+            logger.info(f"Worker stopping. Waiting for {len(in_flight)} in-flight jobs...")
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        for task in background:
+            task.cancel()
+        extraction_pool.shutdown()
+        await skills_index.close()
+        await llm_cache.close()
+        await close_llm_providers()
+        await close_redis()
+
 if __name__ == "__main__":
     asyncio.run(worker_loop())
@@ -0,0 +1,62 @@
+import os
+import uuid
+import pytest
+import pytest_asyncio
+import redis.asyncio as aioredis
+from app.services.llm import rate_limiter
+from app.services.llm.rate_limiter import KEY_PREFIX, _ACQUIRE_SCRIPT, LLMRateLimiter
+
+# The bucket scripts run inside Redis, so these tests need a real server
+REDIS_URL = os.environ.get("TEST_REDIS_URL", "redis://localhost:6379/15")
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    client = aioredis.from_url(REDIS_URL)
+    try:
+        await client.ping()
+    except Exception:
+        await client.aclose()
+        pytest.skip(f"Redis not reachable at {REDIS_URL}")
+    monkeypatch.setattr(rate_limiter, "get_redis", lambda: client)
+    yield client
+    await client.aclose()
+
+@pytest.fixture
+def key():
+    return f"test-{uuid.uuid4().hex}"
+
+@pytest.mark.asyncio
+async def test_record_usage_does_not_recreate_expired_bucket(client, key):
+    limiter = LLMRateLimiter()
+    tpm_key = f"{KEY_PREFIX}:{key}:tpm"
+
+    # The bucket expired before the usage came back
+    await limiter.record_usage(key, estimated=1000, actual=200)
+
+    assert not await client.exists(tpm_key)
+    assert await limiter._acquire_budget(key, "test-model", 100) == 0
+    await client.delete(tpm_key, f"{KEY_PREFIX}:{key}:rpm")
+
+@pytest.mark.asyncio
+async def test_record_usage_keeps_ts_and_ttl(client, key):
+    limiter = LLMRateLimiter()
+    tpm_key = f"{KEY_PREFIX}:{key}:tpm"
+    assert await limiter._acquire_budget(key, "test-model", 500) == 0
+
+    await limiter.record_usage(key, estimated=500, actual=100)
+
+    assert await client.hget(tpm_key, "ts") is not None
+    assert 0 < await client.ttl(tpm_key) <= 120
+    await client.delete(tpm_key, f"{KEY_PREFIX}:{key}:rpm")
+
+@pytest.mark.asyncio
+async def test_bucket_without_ts_counts_as_full(client, key):
+    rpm_key, tpm_key = f"{KEY_PREFIX}:{key}:rpm", f"{KEY_PREFIX}:{key}:tpm"
+    # What the old HINCRBYFLOAT reconcile left behind after an expiry
+    await client.hset(tpm_key, "level", 400)
+
+    wait = await client.eval(_ACQUIRE_SCRIPT, 2, rpm_key, tpm_key, 60, 1000, 100, 1_000_000)
+
+    assert float(wait) == 0
+    assert float(await client.hget(tpm_key, "level")) == 900
+    await client.delete(rpm_key, tpm_key)